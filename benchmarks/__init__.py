@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Hive的离线基准测试与负载测试。所有测试都使用脚本化的假模型与stub搜索后端，不访问网络。"""
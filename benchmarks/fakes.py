@@ -0,0 +1,120 @@
+# benchmarks/fakes.py
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Iterator, AsyncIterator, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+ToolCall = Tuple[str, Dict[str, Any]]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    按脚本回复的离线聊天模型。script的第i项是对话中第i个AI回合的回复：
+    字符串表示最终文本回答，(工具名, 参数) 元组的列表表示一轮工具调用。
+    回合序号由输入消息中已有的AI消息数量决定，因此同一个实例可以被多个并发会话安全地共享。
+    脚本用完后总是返回final_answer。
+    """
+    script: List[Any] = []
+    final_answer: str = "已完成全部分析。"
+    latency_ms: float = 0.0          # 首个chunk (或整个回复) 之前的模拟延迟
+    chunk_latency_ms: float = 0.0    # 流式输出时相邻chunk之间的模拟延迟
+    chunk_size: int = 8
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _turn(self, messages: List[BaseMessage]) -> int:
+        return sum(1 for m in messages if isinstance(m, AIMessage))
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        turn = self._turn(messages)
+        step = self.script[turn] if turn < len(self.script) else self.final_answer
+        if isinstance(step, str):
+            return AIMessage(content=step)
+        tool_calls = [{"name": name, "args": args, "id": f"call_{turn}_{i}", "type": "tool_call"}
+                      for i, (name, args) in enumerate(step)]
+        return AIMessage(content="", tool_calls=tool_calls)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        if message.tool_calls:
+            return [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"], ensure_ascii=False), "id": tc["id"], "index": i}
+                for i, tc in enumerate(message.tool_calls)])]
+        text = message.content
+        return [AIMessageChunk(content=text[i:i + self.chunk_size]) for i in range(0, len(text), self.chunk_size)] or [AIMessageChunk(content="")]
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        for i, chunk in enumerate(self._chunks(self._reply(messages))):
+            if i and self.chunk_latency_ms:
+                time.sleep(self.chunk_latency_ms / 1000)
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        for i, chunk in enumerate(self._chunks(self._reply(messages))):
+            if i and self.chunk_latency_ms:
+                await asyncio.sleep(self.chunk_latency_ms / 1000)
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+def prepare_offline_environment(workdir: str, search_latency_ms: float = 0.0):
+    """
+    在导入hive之前调用：把搜索、索引、缓存与CoreMemory都指向workdir下的临时文件，
+    使用stub搜索后端并关闭响应缓存与磁带，保证测试不访问网络、不污染项目根目录下的数据库。
+    """
+    os.makedirs(workdir, exist_ok=True)
+    os.environ.update({
+        "SEARCH_BACKEND": "stub",
+        "SEARCH_STUB_LATENCY_MS": str(search_latency_ms),
+        "SEARCH_RATE_LIMIT": "0",
+        "SEARCH_CACHE_PATH": os.path.join(workdir, "search_cache.db"),
+        "HIVE_INDEX_DB_PATH": os.path.join(workdir, "content_index.db"),
+        "LLM_CACHE_ENABLED": "false",
+        "CASSETTE_MODE": "off",
+        # 预路由只使用规则分类，避免去连接真实的轻量级模型
+        "FAST_PATH_LLM": "false",
+    })
+    os.environ.setdefault("DEEPSEEK_API_KEY", "offline")
+    from hive.core.memory import CoreMemory
+    # CoreMemory是单例，先用临时路径创建，之后executor等模块拿到的都是这个实例
+    return CoreMemory(os.path.join(workdir, "hive_memory.db"))
+
+
+def install_fake_llms(models: Dict[str, BaseChatModel]):
+    """用假模型替换Nexus图中的get_llm；未列出的层级使用heavyweight对应的模型。"""
+    import hive.nexus.executor as executor
+    executor.get_llm = lambda tier: models.get(tier, models["heavyweight"])
+
+
+def quiet_logging(level: int = logging.WARNING):
+    logging.getLogger().setLevel(level)
+    for handler in logging.getLogger().handlers:
+        handler.setLevel(max(handler.level, level))
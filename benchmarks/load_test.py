@@ -0,0 +1,367 @@
+# benchmarks/load_test.py
+"""
+/nexus/stream_events SSE端点的并发负载测试。
+
+    # 进程内直接驱动ASGI应用 (不经过网络)，并发从1逐级增加到32
+    python -m benchmarks.load_test --sweep 1,2,4,8,16,32 --requests 200
+
+    # 在本进程中以stub后端启动uvicorn，经localhost压测；按每秒20个请求的泊松到达
+    python -m benchmarks.load_test --serve 8765 --rate 20 --duration 30
+
+    # 压测一个已经在运行的服务 (需自行以stub后端启动)，并采样其进程的CPU与内存
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 16 --server-pid 12345
+
+--rate为0 (默认) 时为闭环模式：concurrency个虚拟用户各自连续发送请求；
+--rate大于0时为开环模式：请求按泊松过程到达，concurrency作为在途请求数的上限。
+进程内与--serve模式下客户端与服务端共享同一进程，CPU与内存数据包含客户端自身的开销。
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.fakes import ScriptedChatModel, install_fake_llms, prepare_offline_environment, quiet_logging
+
+ENDPOINT = "/nexus/stream_events"
+
+
+class ProcessSampler:
+    """通过/proc周期性采样进程的CPU时间与常驻内存；没有/proc时只能采样本进程。"""
+
+    def __init__(self, pid: Optional[int] = None, interval: float = 0.25):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.rss_samples: List[float] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._cpu_start = self._wall_start = 0.0
+        self.cpu_seconds = self.wall_seconds = 0.0
+
+    def _cpu(self) -> float:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, IndexError, ValueError):
+            return time.process_time() if self.pid == os.getpid() else 0.0
+
+    def _rss_mb(self) -> float:
+        try:
+            with open(f"/proc/{self.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        except (OSError, IndexError, ValueError):
+            return 0.0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.rss_samples.append(self._rss_mb())
+
+    def __enter__(self):
+        self._cpu_start, self._wall_start = self._cpu(), time.perf_counter()
+        self.rss_samples.append(self._rss_mb())
+        self._thread = threading.Thread(target=self._run, name="load-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.rss_samples.append(self._rss_mb())
+        self.cpu_seconds = self._cpu() - self._cpu_start
+        self.wall_seconds = time.perf_counter() - self._wall_start
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "cpu_percent": round(self.cpu_seconds / self.wall_seconds * 100, 1) if self.wall_seconds else 0.0,
+            "rss_mb_peak": round(max(self.rss_samples), 1) if self.rss_samples else 0.0,
+            "rss_mb_end": round(self.rss_samples[-1], 1) if self.rss_samples else 0.0,
+        }
+
+
+async def _asgi_stream(app, path: str, body: bytes) -> Tuple[int, AsyncIterator[bytes]]:
+    """
+    直接调用ASGI应用并逐块返回响应体。httpx的ASGITransport会先缓冲整个响应，
+    无法测量首字节时间，因此进程内模式不经过它。
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    request_sent = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        await queue.put(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"loadtest")],
+        "client": ("127.0.0.1", 0), "server": ("loadtest", 80),
+    }
+
+    async def run_app():
+        try:
+            await app(scope, receive, send)
+        finally:
+            await queue.put(None)
+
+    task = asyncio.ensure_future(run_app())
+    start = await queue.get()
+    status = start["status"] if start else 500
+
+    async def chunks():
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    return
+                if message["type"] == "http.response.body":
+                    if message.get("body"):
+                        yield message["body"]
+                    if not message.get("more_body", False):
+                        return
+        finally:
+            finished.set()
+            await task
+    return status, chunks()
+
+
+class LoadClient:
+    """发送单个SSE请求并测量首字节、首token与完成时间。"""
+
+    def __init__(self, app=None, url: Optional[str] = None, timeout: float = 300.0):
+        self.app = app
+        self.url = url.rstrip("/") if url else None
+        self._client = None
+        if self.url:
+            import httpx
+            self._client = httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=None, max_keepalive_connections=None))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def _stream(self, body: bytes):
+        if self._client is None:
+            status, chunks = await _asgi_stream(self.app, ENDPOINT, body)
+            return status, chunks, None
+        request = self._client.build_request("POST", self.url + ENDPOINT, content=body, headers={"content-type": "application/json"})
+        response = await self._client.send(request, stream=True)
+        return response.status_code, response.aiter_bytes(), response
+
+    async def request(self, prompt: str) -> Dict[str, Any]:
+        body = json.dumps({"input": {"messages": [["human", prompt]]}}).encode('utf-8')
+        result = {"ok": False, "ttfb": None, "ttft": None, "total": None, "events": 0, "bytes": 0, "error": None}
+        started = time.perf_counter()
+        response = None
+        try:
+            status, chunks, response = await self._stream(body)
+            buffer = b""
+            async for chunk in chunks:
+                now = time.perf_counter()
+                if result["ttfb"] is None:
+                    result["ttfb"] = now - started
+                result["bytes"] += len(chunk)
+                buffer += chunk
+                while b"\n\n" in buffer:
+                    frame, buffer = buffer.split(b"\n\n", 1)
+                    if not frame.startswith(b"data: "):
+                        continue
+                    result["events"] += 1
+                    event = json.loads(frame[6:])
+                    if event.get("event") == "error":
+                        result["error"] = str(event.get("data"))
+                    elif result["ttft"] is None and event.get("event") == "on_chat_model_stream" \
+                            and (event.get("data", {}).get("chunk") or {}).get("content"):
+                        result["ttft"] = now - started
+            result["total"] = time.perf_counter() - started
+            if status != 200:
+                result["error"] = result["error"] or f"HTTP {status}"
+            result["ok"] = result["error"] is None
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            if response is not None:
+                await response.aclose()
+        return result
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ms = np.asarray(values) * 1000
+    return {f"p{q}": round(float(np.percentile(ms, q)), 2) for q in (50, 95, 99)} | {"max": round(float(ms.max()), 2)}
+
+
+def summarize(results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    ok = [r for r in results if r["ok"]]
+    errors = [r["error"] for r in results if not r["ok"]]
+    return {
+        "requests": len(results),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(results), 4) if results else 0.0,
+        "throughput_rps": round(len(ok) / wall_seconds, 2) if wall_seconds else 0.0,
+        "events_per_sec": round(sum(r["events"] for r in results) / wall_seconds, 1) if wall_seconds else 0.0,
+        "mb_per_sec": round(sum(r["bytes"] for r in results) / wall_seconds / 1e6, 3) if wall_seconds else 0.0,
+        "ttfb_ms": _percentiles([r["ttfb"] for r in ok if r["ttfb"] is not None]),
+        "ttft_ms": _percentiles([r["ttft"] for r in ok if r["ttft"] is not None]),
+        "total_ms": _percentiles([r["total"] for r in ok]),
+        "sample_errors": sorted(set(errors))[:5],
+    }
+
+
+async def run_level(client: LoadClient, concurrency: int, rate: float, requests: Optional[int],
+                    duration: Optional[float], seed: int) -> Tuple[List[Dict[str, Any]], float]:
+    """运行一个负载级别。requests与duration至少给出一个，先达到者结束发压。"""
+    rng = random.Random(seed)
+    results: List[Dict[str, Any]] = []
+    deadline = time.perf_counter() + duration if duration else None
+    issued = 0
+
+    def more() -> bool:
+        if requests is not None and issued >= requests:
+            return False
+        return deadline is None or time.perf_counter() < deadline
+
+    async def one(index: int):
+        results.append(await client.request(f"负载测试请求 #{index}"))
+
+    started = time.perf_counter()
+    if rate <= 0:
+        async def user():
+            nonlocal issued
+            while more():
+                issued += 1
+                await one(issued)
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    else:
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = []
+
+        async def bounded(index: int):
+            async with semaphore:
+                await one(index)
+        while more():
+            issued += 1
+            tasks.append(asyncio.ensure_future(bounded(issued)))
+            await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*tasks)
+    return results, time.perf_counter() - started
+
+
+def _start_uvicorn(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_config=None, access_log=False))
+    thread = threading.Thread(target=server.run, name="loadtest-server", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def print_table(levels: List[Dict[str, Any]]):
+    header = f"{'并发':>6} {'请求':>6} {'错误率':>7} {'吞吐(rps)':>10} {'事件/s':>9} {'TTFB p50/p95/p99 (ms)':>26} {'TTFT p50/p95/p99 (ms)':>26} {'完成 p50/p95/p99 (ms)':>26} {'CPU%':>7} {'RSS峰值MB':>10}"
+    print("\n" + header)
+    for level in levels:
+        s = level["summary"]
+        ttfb = "/".join(str(s["ttfb_ms"][k]) for k in ("p50", "p95", "p99"))
+        ttft = "/".join(str(s["ttft_ms"][k]) for k in ("p50", "p95", "p99"))
+        total = "/".join(str(s["total_ms"][k]) for k in ("p50", "p95", "p99"))
+        proc = level.get("process", {})
+        print(f"{level['concurrency']:>6} {s['requests']:>6} {s['error_rate']:>7.2%} {s['throughput_rps']:>10} {s['events_per_sec']:>9} "
+              f"{ttfb:>26} {ttft:>26} {total:>26} {proc.get('cpu_percent', '-'):>7} {proc.get('rss_mb_peak', '-'):>10}")
+        for error in s["sample_errors"]:
+            print(f"        错误示例: {error}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="/nexus/stream_events 并发负载测试")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="压测已在运行的服务，如 http://localhost:8000 (默认进程内直接调用ASGI应用)")
+    target.add_argument("--serve", type=int, metavar="PORT", help="在本进程中以stub后端启动uvicorn并经localhost压测")
+    parser.add_argument("--concurrency", type=int, default=8, help="闭环模式下的虚拟用户数 / 开环模式下的在途请求上限")
+    parser.add_argument("--sweep", help="逐级运行多个并发数，逗号分隔，如 1,2,4,8,16")
+    parser.add_argument("--rate", type=float, default=0.0, help="开环模式的平均到达率 (请求/秒)，0表示闭环")
+    parser.add_argument("--requests", type=int, help="每个级别的请求总数")
+    parser.add_argument("--duration", type=float, help="每个级别的发压时长 (秒)")
+    parser.add_argument("--warmup", type=int, default=2, help="正式测量前的预热请求数")
+    parser.add_argument("--server-pid", type=int, help="--url模式下采样该进程的CPU与内存")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="假模型的首token延迟")
+    parser.add_argument("--chunk-latency-ms", type=float, default=5.0, help="假模型相邻流式chunk的间隔")
+    parser.add_argument("--search-latency-ms", type=float, default=20.0, help="stub搜索后端的模拟延迟")
+    parser.add_argument("--tool-rounds", type=int, default=2, help="每个请求中模型发起的工具调用轮数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="把各级别的结果保存为JSON")
+    args = parser.parse_args(argv)
+    if args.requests is None and args.duration is None:
+        args.requests = 100
+
+    if not args.url:
+        prepare_offline_environment(tempfile.mkdtemp(prefix="hive-load-"), search_latency_ms=args.search_latency_ms)
+        from server import app
+        quiet_logging()
+        script = [[("seeker", {"query": f"负载测试 第{r + 1}轮"})] for r in range(args.tool_rounds)]
+        install_fake_llms({
+            "heavyweight": ScriptedChatModel(script=script, final_answer="这是根据搜索结果整理的最终回答。" * 4,
+                                             latency_ms=args.llm_latency_ms, chunk_latency_ms=args.chunk_latency_ms),
+            "lightweight": ScriptedChatModel(final_answer="摘要。", latency_ms=args.llm_latency_ms),
+        })
+
+    server = None
+    if args.serve:
+        server, _ = _start_uvicorn(app, args.serve)
+        url = f"http://127.0.0.1:{args.serve}"
+    else:
+        url = args.url
+
+    levels = [int(c) for c in args.sweep.split(",")] if args.sweep else [args.concurrency]
+    report = {"config": {k: v for k, v in vars(args).items()}, "levels": []}
+
+    async def run_all():
+        client = LoadClient(app=None if url else app, url=url)
+        try:
+            for _ in range(args.warmup):
+                await client.request("预热")
+            for i, concurrency in enumerate(levels):
+                print(f"▶ 并发 {concurrency} ...", flush=True)
+                sampler = ProcessSampler(args.server_pid if args.url else None)
+                with sampler:
+                    results, wall = await run_level(client, concurrency, args.rate, args.requests, args.duration, args.seed + i)
+                level = {"concurrency": concurrency, "wall_seconds": round(wall, 3), "summary": summarize(results, wall)}
+                if not args.url or args.server_pid:
+                    level["process"] = sampler.summary()
+                report["levels"].append(level)
+        finally:
+            await client.close()
+
+    try:
+        asyncio.run(run_all())
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    print_table(report["levels"])
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+    return 0 if all(level["summary"]["errors"] == 0 for level in report["levels"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
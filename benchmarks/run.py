@@ -0,0 +1,354 @@
+# benchmarks/run.py
+"""
+Nexus流水线的离线基准测试。
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --output bench.json --baseline baseline.json --threshold 0.2
+
+所有LLM调用由ScriptedChatModel完成，工具使用stub搜索后端，不访问网络。
+指定--baseline时会与之前保存的结果逐项比较，任一指标退化超过阈值则以非零状态退出。
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.fakes import ScriptedChatModel, install_fake_llms, prepare_offline_environment, quiet_logging
+
+BENCHMARKS: Dict[str, Callable[["BenchContext"], Dict[str, Dict[str, Any]]]] = {}
+
+
+def benchmark(name: str):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def metric(value: float, unit: str, better: str = "lower") -> Dict[str, Any]:
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def _timed(func: Callable[[], Any], repeats: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _p95(samples: List[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+
+def _p99(samples: List[float]) -> float:
+    ordered = sorted(samples) or [0.0]
+    return ordered[min(len(ordered) - 1, int(round(0.99 * (len(ordered) - 1))))]
+
+
+class BenchContext:
+    def __init__(self, quick: bool, log_level: int = logging.WARNING):
+        self.quick = quick
+        self.log_level = log_level
+        self.loop = asyncio.new_event_loop()
+
+    def scale(self, full: int, quick: int) -> int:
+        return quick if self.quick else full
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+
+def _tool_rounds(rounds: int, calls_per_round: int = 1) -> List[Any]:
+    return [[("abacus", {"expression": f"{r} * 1.5 + {i}"}) for i in range(calls_per_round)] for r in range(rounds)]
+
+
+@benchmark("graph_iteration")
+def bench_graph_iteration(ctx: BenchContext) -> Dict[str, Dict[str, Any]]:
+    """一次完整的agent → execute_tools → reflect循环的框架开销 (模型零延迟，工具为本地计算)。"""
+    from hive.nexus.executor import nexus_graph
+    from langchain_core.messages import HumanMessage
+
+    rounds = 5
+    install_fake_llms({"heavyweight": ScriptedChatModel(script=_tool_rounds(rounds))})
+    graph_input = {"messages": [HumanMessage(content="计算一组数值")]}
+    samples = _timed(lambda: ctx.run(nexus_graph.ainvoke(graph_input)), ctx.scale(30, 5))
+    per_iteration = [s / (rounds + 1) for s in samples]
+    return {
+        "ms_per_iteration": metric(statistics.median(per_iteration), "ms"),
+        "ms_per_iteration_p95": metric(_p95(per_iteration), "ms"),
+        "ms_per_run": metric(statistics.median(samples), "ms"),
+    }
+
+
+@benchmark("execute_tools_parallelism")
+def bench_execute_tools(ctx: BenchContext) -> Dict[str, Dict[str, Any]]:
+    """同一轮中多个有延迟的工具调用的总耗时，与逐个调用之和相比得到并行加速比。"""
+    from hive.nexus.executor import execute_tools_node
+    from langchain_core.messages import AIMessage
+
+    fanout = 8
+    counter = iter(range(10 ** 9))
+
+    def state(calls: int):
+        # 每次使用新的查询，避免命中搜索缓存
+        tool_calls = [{"name": "seeker", "args": {"query": f"benchmark query {next(counter)}"}, "id": f"c{i}", "type": "tool_call"}
+                      for i in range(calls)]
+        return {"messages": [AIMessage(content="", tool_calls=tool_calls)]}
+
+    repeats = ctx.scale(10, 3)
+    single = statistics.median(_timed(lambda: ctx.loop.run_until_complete(execute_tools_node(state(1))), repeats))
+    batch = statistics.median(_timed(lambda: ctx.loop.run_until_complete(execute_tools_node(state(fanout))), repeats))
+    return {
+        "single_call_ms": metric(single, "ms"),
+        "fanout_ms": metric(batch, "ms"),
+        "speedup": metric(single * fanout / batch if batch else 0.0, "x", "higher"),
+    }
+
+
+@benchmark("reflect_large_payload")
+def bench_reflect(ctx: BenchContext) -> Dict[str, Dict[str, Any]]:
+    """reflect_node处理超长工具输出 (超过REFLECTOR_MAX_TEXT_LENGTH) 的耗时，按精炼方式分别测量；摘要模型为零延迟的假模型。"""
+    from hive.nexus.executor import reflect_node
+    from hive.utils.config import config
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    install_fake_llms({
+        "heavyweight": ScriptedChatModel(),
+        "lightweight": ScriptedChatModel(final_answer="摘要：核心数据点。"),
+    })
+    paragraph = "Hive的ReflectorNode会在工具输出过长时触发信息精炼。营业收入同比增长12.5%，净利润为3.2亿元。"
+    results = {}
+    original_mode = config.reflector_mode
+    try:
+        for mode in ("extractive", "hybrid", "llm"):
+            config.reflector_mode = mode
+            for size in (50_000, 500_000):
+                text = (paragraph * (size // len(paragraph) + 1))[:size]
+                state = {"messages": [
+                    HumanMessage(content="总结财报"),
+                    AIMessage(content="", tool_calls=[{"name": "seeker", "args": {"query": "财报"}, "id": "c1", "type": "tool_call"}]),
+                    ToolMessage(content=text, tool_call_id="c1", id="t1"),
+                ]}
+                samples = _timed(lambda: ctx.run(reflect_node(state)), ctx.scale(20, 3))
+                results[f"{mode}_ms_{size // 1000}k_chars"] = metric(statistics.median(samples), "ms")
+    finally:
+        config.reflector_mode = original_mode
+    return results
+
+
+@benchmark("sse_serialization")
+def bench_sse(ctx: BenchContext) -> Dict[str, Dict[str, Any]]:
+    """把一次三轮工具调用的astream_events事件按server.py的方式序列化为SSE帧的吞吐量。"""
+    from hive.nexus.executor import nexus_graph
+    from langchain_core.messages import HumanMessage
+    from server import safe_serialize
+    quiet_logging(ctx.log_level)
+
+    install_fake_llms({"heavyweight": ScriptedChatModel(script=_tool_rounds(3), final_answer="这是最终的分析报告。" * 20)})
+
+    async def collect():
+        return [event async for event in nexus_graph.astream_events(
+            {"messages": [HumanMessage(content="计算")]}, version="v2")]
+    events = ctx.run(collect())
+
+    def serialize_all():
+        return sum(len(f"data: {json.dumps(safe_serialize(e))}\n\n".encode('utf-8')) for e in events)
+    total_bytes = serialize_all()
+    samples = _timed(serialize_all, ctx.scale(50, 5))
+    seconds = statistics.median(samples) / 1000
+    return {
+        "events_per_run": metric(len(events), "events"),
+        "events_per_sec": metric(len(events) / seconds, "events/s", "higher"),
+        "mb_per_sec": metric(total_bytes / seconds / 1e6, "MB/s", "higher"),
+    }
+
+
+@benchmark("memory_logging")
+def bench_memory(ctx: BenchContext) -> Dict[str, Dict[str, Any]]:
+    """CoreMemory.log_agent_invocation的单条写入吞吐量 (每条一次事务)。"""
+    from hive.core.memory import CoreMemory
+    memory = CoreMemory()
+    count = ctx.scale(2000, 200)
+    payload_in, payload_out = {"query": "benchmark" * 10}, {"result": "x" * 500}
+    started = time.perf_counter()
+    for _ in range(count):
+        now = datetime.now()
+        memory.log_agent_invocation("benchmark", "BenchAgent", payload_in, payload_out, "SUCCESS", now, now)
+    elapsed = time.perf_counter() - started
+    return {
+        "inserts_per_sec": metric(count / elapsed, "rows/s", "higher"),
+        "us_per_insert": metric(elapsed / count * 1e6, "us"),
+    }
+
+
+@benchmark("sandbox_loop_lag")
+def bench_sandbox_loop_lag(ctx: BenchContext) -> Dict[str, Dict[str, Any]]:
+    """Abacus在大CSV上做列式聚合时事件循环的调度延迟：就地执行 (占用主进程GIL) 与在沙箱工作进程中执行的对比。"""
+    from hive.nexus.executor import arun_tool_call
+    from hive.utils.config import config
+
+    rows = ctx.scale(400_000, 100_000)
+    path = os.path.join(tempfile.mkdtemp(prefix="hive_bench_"), "sales.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("region,price,qty\n")
+        f.writelines(f"r{i % 7},{i % 100 + 0.5},{i % 13}\n" for i in range(rows))
+    args = {"dataset": {"path": path, "aggregates": [{"op": "sum", "expr": "price * qty"}], "group_by": "region"}}
+    calls = 4
+
+    async def measure():
+        lags: List[float] = []
+        done = asyncio.Event()
+
+        async def ticker(interval: float = 0.005):
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(interval)
+                lags.append((time.perf_counter() - started - interval) * 1000)
+
+        tick = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        await asyncio.gather(*(arun_tool_call("abacus", args, f"lag{i}") for i in range(calls)))
+        elapsed = (time.perf_counter() - started) * 1000
+        done.set()
+        await tick
+        return _p99(lags), elapsed
+
+    results = {}
+    enabled = config.sandbox_enabled
+    try:
+        for mode, flag in (("inline", False), ("sandbox", True)):
+            config.sandbox_enabled = flag
+            ctx.run(measure())  # 预热 (含工作进程的启动)
+            lag, elapsed = ctx.run(measure())
+            results[f"loop_lag_p99_{mode}_ms"] = metric(lag, "ms")
+            results[f"batch_{mode}_ms"] = metric(elapsed, "ms")
+    finally:
+        config.sandbox_enabled = enabled
+    return results
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_benchmarks(names: List[str], quick: bool, log_level: int) -> Dict[str, Any]:
+    ctx = BenchContext(quick, log_level)
+    results: Dict[str, Any] = {}
+    try:
+        for name in names:
+            quiet_logging(log_level)
+            print(f"▶ {name} ...", flush=True)
+            started = time.perf_counter()
+            results[name] = BENCHMARKS[name](ctx)
+            print(f"  完成 ({time.perf_counter() - started:.1f}s)", flush=True)
+    finally:
+        ctx.loop.close()
+    results["process"] = {"peak_rss_mb": metric(peak_rss_mb(), "MB")}
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """逐项比较两次结果。退化幅度按指标方向计算，超过threshold (相对变化) 记为regression。"""
+    rows = []
+    for bench, metrics in current["results"].items():
+        for name, entry in metrics.items():
+            base = baseline.get("results", {}).get(bench, {}).get(name)
+            if not base or not base.get("value"):
+                continue
+            change = (entry["value"] - base["value"]) / base["value"]
+            worse = change if entry.get("better", "lower") == "lower" else -change
+            status = "regression" if worse > threshold else "improved" if worse < -threshold else "ok"
+            rows.append({"metric": f"{bench}.{name}", "baseline": base["value"], "current": entry["value"],
+                         "unit": entry.get("unit", ""), "change_pct": round(change * 100, 1), "status": status})
+    return rows
+
+
+def print_results(report: Dict[str, Any]):
+    for bench, metrics in report["results"].items():
+        print(f"\n[{bench}]")
+        for name, entry in metrics.items():
+            print(f"  {name:<28} {entry['value']:>14,.3f} {entry['unit']}")
+
+
+def print_comparison(rows: List[Dict[str, Any]]):
+    marks = {"regression": "✗", "improved": "✓", "ok": " "}
+    print("\n与基线对比:")
+    for row in rows:
+        print(f"  {marks[row['status']]} {row['metric']:<45} {row['baseline']:>12,.3f} → {row['current']:>12,.3f} {row['unit']:<9} ({row['change_pct']:+.1f}%)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Hive Nexus离线基准测试")
+    parser.add_argument("--output", help="结果JSON的保存路径")
+    parser.add_argument("--baseline", help="用于比较的基线结果JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定退化的相对变化阈值 (默认0.2，即20%%)")
+    parser.add_argument("--only", help="只运行指定的基准测试，逗号分隔。可选: " + ",".join(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="减少重复次数，用于快速冒烟测试")
+    parser.add_argument("--search-latency-ms", type=float, default=20.0, help="stub搜索后端的模拟延迟")
+    parser.add_argument("--workdir", help="临时数据库目录 (默认使用系统临时目录)")
+    parser.add_argument("--log-level", default="WARNING", help="基准测试期间的日志级别")
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的基准测试: {unknown}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="hive-bench-")
+    prepare_offline_environment(workdir, search_latency_ms=args.search_latency_ms)
+    report = run_benchmarks(names, args.quick, getattr(logging, args.log_level.upper(), logging.WARNING))
+    report["meta"]["search_latency_ms"] = args.search_latency_ms
+    print_results(report)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print_comparison(rows)
+        regressions = [r for r in rows if r["status"] == "regression"]
+        if regressions:
+            print(f"\n检测到 {len(regressions)} 项性能退化 (阈值 {args.threshold:.0%})。")
+            return 1
+        print("\n未检测到性能退化。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
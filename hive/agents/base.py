@@ -1,7 +1,7 @@
 # hive/agents/base.py
 from abc import ABC, abstractmethod
 from pydantic import BaseModel, Field
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from hive.core.memory import CoreMemory
 
@@ -12,6 +12,10 @@ class AgentManifest(BaseModel):
     # 正式添加参数定义字段，并提供一个默认的空对象
     parameters_json_schema: Dict[str, Any] = Field(default_factory=dict, description="一个JSON Schema对象，定义了invoke方法需要的参数。")
     version: str = "1.0"
+    # 计算密集、可能长时间占用GIL的部分是否在沙箱工作进程中执行 (见hive/utils/sandbox.py)
+    cpu_bound: bool = False
+    sandbox_timeout: Optional[float] = Field(default=None, description="沙箱中单次调用的墙钟超时 (秒)，默认取SANDBOX_TIMEOUT。")
+    sandbox_memory_mb: Optional[int] = Field(default=None, description="沙箱中单次调用的内存上限 (MB)，默认取SANDBOX_MEMORY_MB。")
 
 class BaseAgent(ABC):
     manifest: AgentManifest
@@ -1,17 +1,146 @@
 # hive/agents/calculator_agent.py (Super-powered Version)
 
+import os
+import math
 import logging
 import numexpr
+import numpy as np
 import re
 import json
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, Union
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 
 from hive.agents.base import BaseAgent, AgentManifest
 from hive.core.memory import CoreMemory
+from hive.utils.columnar import compute_dataset, SUPPORTED_AGGREGATES
+from hive.utils.sandbox import run_for
+from hive.utils.tracing import current_run_id
 
 logger = logging.getLogger(__name__)
 
+# 预编译的清理规则，避免每次调用都重新编译正则
+_CURRENCY_PATTERN = re.compile(r'[,\$€£¥元]')
+# 注意处理顺序，从大单位到小单位，防止"万亿"被先替换为"e4亿"
+_UNIT_PATTERNS = (
+    (re.compile(r'万亿\s*|\s*trillion', re.IGNORECASE), 'e12'),
+    (re.compile(r'亿\s*|\s*billion', re.IGNORECASE), 'e8'),
+    (re.compile(r'万\s*|\s*million', re.IGNORECASE), 'e4'),  # 使用e4代表万
+)
+# 数字（包括浮点数和科学计数法）和基本数学运算符，允许数字和运算符之间有空格
+_TOKEN_PATTERN = re.compile(r'\d+\.?\d*(?:e[+\-]?\d+)?|[\+\-\*\/\(\)\s]')
+_NUMBER_PATTERN = re.compile(r'\d+\.?\d*(?:e[+\-]?\d+)?')
+_INT64_LIMIT = 2 ** 63
+
+
+@lru_cache(maxsize=4096)
+def _clean_expression(text: str) -> str:
+    """从文本中提取出可供计算的纯数学表达式 (结果按原始文本缓存)。"""
+    text = _CURRENCY_PATTERN.sub('', text)
+    for pattern, replacement in _UNIT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    parts = _TOKEN_PATTERN.findall(text)
+    return "".join(parts).replace(" ", "")
+
+
+def _to_template(cleaned_expression: str) -> Tuple[str, List[Any]]:
+    """
+    将表达式中的数字常量替换为变量，得到结构模板和常量向量。
+    例: '3.21e12*0.05' -> ('c0*c1', [3.21e12, 0.05])
+    结构相同的表达式共享同一个模板，可以合并为一次向量化计算。整数常量保留为int，以便按整数精确计算。
+    """
+    constants: List[Any] = []
+
+    def _replace(match: re.Match) -> str:
+        literal = match.group(0)
+        constants.append(float(literal) if "." in literal or "e" in literal else int(literal))
+        return f"c{len(constants) - 1}"
+
+    return _NUMBER_PATTERN.sub(_replace, cleaned_expression), constants
+
+
+@lru_cache(maxsize=512)
+def _compile_template(template: str, n_vars: int, dtype: str = "float64") -> numexpr.NumExpr:
+    """编译后的numexpr程序的LRU缓存，键为表达式模板与常量类型。"""
+    return numexpr.NumExpr(template, signature=[(f"c{i}", np.dtype(dtype).type) for i in range(n_vars)])
+
+
+def _evaluate_template(template: str, constant_rows: List[List[Any]]) -> List[Any]:
+    """对同一模板的一组常量向量做一次向量化计算，返回每个表达式的结果 (int或float)。"""
+    n = len(constant_rows)
+    float_columns = np.array(constant_rows, dtype=np.float64).reshape(n, -1).T
+    values = np.broadcast_to(_compile_template(template, float_columns.shape[0])(*float_columns), (n,))
+    results = values.tolist()
+    # 常量全部是整数的表达式再按int64计算一次，避免大整数经过float64丢失精度。
+    # int64会静默溢出 (负指数的乘方也会得到0)，与float64结果不一致时以float64为准
+    int_rows = [k for k, row in enumerate(constant_rows) if all(isinstance(c, int) and abs(c) < _INT64_LIMIT for c in row)]
+    if not int_rows:
+        return results
+    int_columns = np.array([constant_rows[k] for k in int_rows], dtype=np.int64).reshape(len(int_rows), -1).T
+    int_values = np.broadcast_to(_compile_template(template, int_columns.shape[0], "int64")(*int_columns), (len(int_rows),))
+    if int_values.dtype.kind != "i":
+        return results
+    for k, exact in zip(int_rows, int_values.tolist()):
+        if abs(exact - results[k]) <= 1e-12 * abs(results[k]) + 1e-9:
+            results[k] = int(exact)
+    return results
+
+
+def _evaluate_batch(expressions: List[str]) -> List[Dict[str, Any]]:
+    """
+    批量计算：先清理所有表达式，再按结构模板分组，每组只做一次numexpr向量化计算。
+    模块级函数，可以在沙箱工作进程中执行 (编译缓存在每个工作进程内复用)。
+    """
+    results: List[Dict[str, Any]] = [{} for _ in expressions]
+    groups: "OrderedDict[str, List[Tuple[int, List[Any]]]]" = OrderedDict()
+
+    for i, expression in enumerate(expressions):
+        if not isinstance(expression, str):
+            results[i] = {"error": "表达式必须是一个字符串。", "original_expression": expression}
+            continue
+        # 移除货币符号和千位分隔符，并将中英文的数字单位转换为科学计数法
+        cleaned_expression = _clean_expression(expression)
+        logger.debug("表达式 '%s' 被清理为 '%s'", expression, cleaned_expression)
+        if not cleaned_expression:
+            results[i] = {"error": "从输入中未能提取出有效的数学表达式。", "original_expression": expression}
+            continue
+        template, constants = _to_template(cleaned_expression)
+        groups.setdefault(template, []).append((i, constants))
+
+    for template, members in groups.items():
+        if "//" in template:
+            # 编译后的numexpr程序不支持变量之间的整除，逐个按常量表达式计算
+            values = []
+            for i, _ in members:
+                try:
+                    values.append(numexpr.evaluate(_clean_expression(expressions[i])).item())
+                except Exception as e:
+                    values.append(e)
+        else:
+            try:
+                values = _evaluate_template(template, [constants for _, constants in members])
+            except Exception as e:
+                logger.warning("Abacus 计算模板 '%s' 失败: %s", template, e)
+                values = [e] * len(members)
+        for (i, _), value in zip(members, values):
+            if isinstance(value, Exception):
+                message = str(value)
+            elif not math.isfinite(value):
+                # 除以零等情况在向量化计算中得到inf/nan，不能作为结果返回 (也不是合法的JSON)
+                message = "结果不是有限数 (可能除以零)"
+            else:
+                results[i] = {"result": value, "original_expression": expressions[i]}
+                continue
+            results[i] = {
+                "error": f"计算错误: {message}. 清理后的表达式为: '{_clean_expression(expressions[i])}'.",
+                "original_expression": expressions[i],
+            }
+
+    logger.info("Abacus 批量计算完成: %d 个表达式, %d 个结构模板", len(expressions), len(groups))
+    return results
+
+
 class CalculatorAgent(BaseAgent):
     """
     L2专家 - 计算专家, 代号'Abacus'。
@@ -20,85 +149,107 @@ class CalculatorAgent(BaseAgent):
     manifest = AgentManifest(
         name="CalculatorAgent",
         display_name="Abacus",
-        description="用于执行精确的数学计算。可以直接处理包含数字、单位（万、亿、万亿）和货币符号的表达式。",
+        description="用于执行精确的数学计算。可以直接处理包含数字、单位（万、亿、万亿）和货币符号的表达式。"
+                    "也可以通过'dataset'直接在本地CSV/TSV文件上做列式计算 (过滤、派生列、分组聚合)，数据无需经过对话上下文。",
         parameters_json_schema={
             "type": "object",
             "properties": {
                 "expression": {
                     "type": "string",
                     "description": "一个需要计算的数学问题字符串，例如 '3.21万亿 * 0.05' 或 '($1,234.56 + ￥500) / 2'"
+                },
+                "expressions": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "批量模式：多个需要计算的表达式，一次调用全部返回。例如对比多家公司的指标时使用。"
+                },
+                "dataset": {
+                    "type": "object",
+                    "description": "数据集模式：直接在本地CSV/TSV文件上计算，只返回聚合结果。列名中的非字母数字字符在表达式中以'_'代替。",
+                    "properties": {
+                        "path": {"type": "string", "description": "CSV/TSV文件路径。"},
+                        "aggregates": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "op": {"type": "string", "enum": list(SUPPORTED_AGGREGATES)},
+                                    "expr": {"type": "string", "description": "被聚合的列或表达式，如 'price * qty'。count可省略。"},
+                                    "as": {"type": "string", "description": "结果名称。"}
+                                },
+                                "required": ["op"]
+                            }
+                        },
+                        "columns": {"type": "object", "description": "派生列，如 {\"revenue\": \"price * qty\"}。"},
+                        "filter": {"type": "string", "description": "过滤条件，如 \"(year == 2024) & (region == 'east')\"；字符串列只支持 == 与 != 比较。"},
+                        "group_by": {"type": "string", "description": "分组列名。"},
+                        "delimiter": {"type": "string", "description": "分隔符，默认按扩展名推断。"}
+                    },
+                    "required": ["path", "aggregates"]
                 }
             },
-            "required": ["expression"]
-        }
+            # expression、expressions与dataset三选一。部分服务商的函数调用不支持顶层的anyOf/oneOf，
+            # 因此这里不声明required，由invoke在三者都缺失时返回明确的错误
+        },
+        # numexpr计算与数据集扫描在沙箱工作进程中执行，超大或恶意的表达式会被超时终止
+        cpu_bound=True,
+        sandbox_timeout=10.0,
     )
 
-    def _extract_and_clean_expression(self, text: str) -> str:
-        """
-        一个强大的内部方法，用于从文本中提取并清理出可供计算的纯数学表达式。
-        【核心能力】
-        1. 移除常见的货币符号和千位分隔符。
-        2. 将中英文的数字单位转换为科学计数法。
-        """
-        # 移除货币符号（$, €, £, ¥）和逗号
-        text = re.sub(r'[,\$€£¥元]', '', text)
-        
-        # 替换单位为科学计数法 (大小写不敏感)
-        # 注意处理顺序，从大单位到小单位，防止"万亿"被先替换为"e6亿"
-        text = re.sub(r'万亿\s*|\s*trillion', 'e12', text, flags=re.IGNORECASE)
-        text = re.sub(r'亿\s*|\s*billion', 'e8', text, flags=re.IGNORECASE)
-        text = re.sub(r'万\s*|\s*million', 'e4', text, flags=re.IGNORECASE) # 使用e4代表万
-        
-        # 提取所有数字（包括浮点数和科学计数法）和基本数学运算符
-        # 这个正则表达式现在允许数字和运算符之间有空格
-        parts = re.findall(r'\d+\.?\d*(?:e[+\-]?\d+)?|[\+\-\*\/\(\)\s]', text)
-        
-        if not parts:
-            return ""
-        
-        # 将所有部分连接起来，并移除所有空格，形成一个紧凑的表达式
-        cleaned_expression = "".join(parts).replace(" ", "")
-
-        logger.info(f"表达式 '{text}' 被清理为 '{cleaned_expression}'")
-        return cleaned_expression
-
-    def invoke(self, expression: str, **kwargs) -> str:
+    def invoke(self, expression: Optional[str] = None, expressions: Optional[List[str]] = None,
+               dataset: Optional[Dict[str, Any]] = None, **kwargs) -> str:
         """
         执行计算任务的核心方法。
+        传入 'expression' 时返回单个结果；传入 'expressions' 时批量计算并返回结果列表；
+        传入 'dataset' 时在本地数据文件上做列式聚合。
         """
-        session_id = kwargs.get("session_id", "default_session")
+        session_id = kwargs.get("session_id") or current_run_id("default_session")
         start_time = datetime.now()
         status = "FAILURE"
         output_data = {}
         error_message = None
-        cleaned_expression = ""
         
         try:
-            if not isinstance(expression, str):
-                raise TypeError("输入参数 'expression' 必须是一个字符串。")
-            
-            logger.info(f"Abacus 接收到原始表达式: '{expression}'")
-            
-            cleaned_expression = self._extract_and_clean_expression(expression)
-            
-            if not cleaned_expression:
-                raise ValueError("从输入中未能提取出有效的数学表达式。")
-            
-            # 使用numexpr进行安全的表达式计算
-            result_val: Union[float, int] = numexpr.evaluate(cleaned_expression).item()
-            output_data = {"result": float(result_val), "original_expression": expression}
+            if dataset:
+                logger.info("Abacus 正在对数据集 '%s' 进行列式计算", dataset.get("path"))
+                # 工作进程是复用的，相对路径在主进程中解析为绝对路径
+                dataset_path = dataset.get("path") or ""
+                output_data = run_for(
+                    self.manifest, compute_dataset,
+                    path=os.path.abspath(os.path.expanduser(dataset_path)) if dataset_path else "",
+                    aggregates=dataset.get("aggregates") or [],
+                    columns=dataset.get("columns"),
+                    filter=dataset.get("filter"),
+                    group_by=dataset.get("group_by"),
+                    delimiter=dataset.get("delimiter"),
+                )
+            elif expressions:
+                if not isinstance(expressions, list):
+                    raise TypeError("输入参数 'expressions' 必须是一个字符串列表。")
+                results = run_for(self.manifest, _evaluate_batch, expressions)
+                failed = sum(1 for r in results if "error" in r)
+                output_data = {"results": results, "succeeded": len(results) - failed, "failed": failed}
+            else:
+                if expression is None:
+                    raise ValueError("需要提供 'expression'、'expressions' 或 'dataset' 之一。")
+                if not isinstance(expression, str):
+                    raise TypeError("输入参数 'expression' 必须是一个字符串。")
+                logger.info("Abacus 接收到原始表达式: '%s'", expression)
+                output_data = run_for(self.manifest, _evaluate_batch, [expression])[0]
+                if "error" in output_data:
+                    raise ValueError(output_data["error"])
             status = "SUCCESS"
             
         except Exception as e:
-            logger.error(f"Abacus 在计算 '{expression}' 时失败: {e}", exc_info=True)
-            error_message = f"计算错误: {str(e)}. 清理后的表达式为: '{cleaned_expression}'."
+            logger.error("Abacus 在计算 '%s' 时失败: %s", expression or expressions or dataset, e, exc_info=True)
+            error_message = str(e) if str(e).startswith("计算错误") else f"计算错误: {str(e)}"
             output_data = {"error": error_message}
         finally:
             end_time = datetime.now()
             self.memory.log_agent_invocation(
                 session_id=session_id,
                 agent_name=self.manifest.name,
-                input_data={"expression": expression},
+                input_data={"dataset": dataset} if dataset else ({"expressions": expressions} if expressions else {"expression": expression}),
                 output_data=output_data,
                 status=status,
                 start_time=start_time,
@@ -106,4 +257,4 @@ class CalculatorAgent(BaseAgent):
                 error_message=error_message
             )
         
-        return json.dumps(output_data, ensure_ascii=False)
\ No newline at end of file
+        return json.dumps(output_data, ensure_ascii=False)
@@ -1,49 +1,247 @@
 # hive/agents/file_system_agent.py (Sanitized & Patched Version)
 
 import os
+import glob
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from hive.agents.base import BaseAgent, AgentManifest
 from hive.core.memory import CoreMemory
+from hive.core.workspace_index import WorkspaceIndex
+from hive.core.content_index import ContentIndex, grep_files
+from hive.utils.config import config
+from hive.utils.text_patch import atomic_write, apply_unified_diff, replace_line_range
+from hive.utils.sandbox import run_for
+from hive.utils.tracing import current_run_id
 
 logger = logging.getLogger(__name__)
 
+SUPPORTED_OPERATIONS = [
+    "read_file", "write_file", "append_file", "patch_file", "list_directory",
+    "find", "search_content", "read_files", "write_files",
+]
+# 批量操作通过 'paths' / 'files' 指定目标，不需要 'path'
+_BATCH_OPERATIONS = ("read_files", "write_files")
+
+
+def _patch_file(path: str, parameters: dict) -> Dict[str, Any]:
+    """按行号替换或应用unified diff后原子写回。模块级函数，可以在沙箱工作进程中执行。"""
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"文件不存在: {path}")
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        original = f.read()
+
+    if parameters.get("diff"):
+        patched = apply_unified_diff(original, parameters["diff"])
+    elif parameters.get("start_line") is not None:
+        start_line = int(parameters["start_line"])
+        end_line = int(parameters.get("end_line", start_line))
+        patched = replace_line_range(original, start_line, end_line, parameters.get("content", ""))
+    else:
+        raise ValueError("操作 'patch_file' 需要参数 'parameters.diff'，或 'parameters.start_line' 与 'parameters.content'。")
+
+    atomic_write(path, patched)
+    return {
+        "patch_status": "success",
+        "path": path,
+        "lines_before": len(original.splitlines()),
+        "lines_after": len(patched.splitlines()),
+    }
+
+
 class FileSystemAgent(BaseAgent):
     """L2专家 - 文件管家, 代号Steward"""
     manifest = AgentManifest(
         name="FileSystemAgent",
         display_name="Steward",
-        description="用于操作本地文件，支持'read_file', 'write_file', 'list_directory'。",
+        description="用于操作本地文件，支持" + ", ".join(f"'{op}'" for op in SUPPORTED_OPERATIONS) + "。"
+                    "修改已有文件时优先使用'append_file'(追加)或'patch_file'(按行号替换或应用unified diff)，无需重新输出整个文件；"
+                    "'find'基于持久化的工作区索引，一次调用即可在整个目录树中按glob/大小/修改时间查找文件；"
+                    "'search_content'基于全文倒排索引，按相关度返回包含关键词的文件及带行号的片段；"
+                    "'read_files'/'write_files'在一次调用中并行读写多个文件。",
         parameters_json_schema={
             "type": "object",
             "properties": {
                 "operation": {
                     "type": "string",
-                    "description": "要执行的操作，可选值为 'read_file', 'write_file', 'list_directory'。",
-                    "enum": ["read_file", "write_file", "list_directory"]
+                    "description": "要执行的操作，可选值为 " + ", ".join(f"'{op}'" for op in SUPPORTED_OPERATIONS) + "。",
+                    "enum": SUPPORTED_OPERATIONS
                 },
                 "parameters": {
                     "type": "object",
                     "properties": {
-                        "path": {"type": "string", "description": "目标文件或目录的路径。为了安全，推荐使用相对路径。"},
-                        "content": {"type": "string", "description": "当操作为 'write_file' 时，要写入的内容。"}
+                        "path": {"type": "string", "description": "目标文件或目录的路径。为了安全，推荐使用相对路径。'find'/'search_content' 操作中为搜索的根目录，默认是工作区根目录。"},
+                        "content": {"type": "string", "description": "当操作为 'write_file'/'append_file' 时，要写入或追加的内容；当操作为 'patch_file' 且按行号替换时，用于替换的新内容。"},
+                        "start_line": {"type": "integer", "description": "当操作为 'patch_file' 时，被替换区间的起始行号 (从1开始)。"},
+                        "end_line": {"type": "integer", "description": "当操作为 'patch_file' 时，被替换区间的结束行号 (包含)。设为 start_line - 1 表示在start_line之前插入。"},
+                        "diff": {"type": "string", "description": "当操作为 'patch_file' 时，可改为提供一个unified diff (含 '@@ -a,b +c,d @@' hunk头)。"},
+                        "pattern": {"type": "string", "description": "当操作为 'find' 时，文件名glob (如 '*.pdf')；包含'/'时按相对路径匹配 (如 'reports/**/*.md')。当操作为 'search_content' 时，用于限定文件名的glob。"},
+                        "query": {"type": "string", "description": "当操作为 'search_content' 时，要检索的关键词或短语 (支持中文)；regex为true时为正则表达式。"},
+                        "regex": {"type": "boolean", "description": "当操作为 'search_content' 时，是否按正则表达式逐行扫描 (不使用索引，较慢)，默认false。"},
+                        "file_type": {"type": "string", "enum": ["file", "dir"], "description": "当操作为 'find' 时，仅返回文件或目录。"},
+                        "min_size": {"type": "integer", "description": "当操作为 'find' 时，最小文件大小 (字节)。"},
+                        "max_size": {"type": "integer", "description": "当操作为 'find' 时，最大文件大小 (字节)。"},
+                        "modified_after": {"type": "string", "description": "当操作为 'find' 时，只返回此时间之后修改的条目 (ISO日期或Unix时间戳)。"},
+                        "modified_before": {"type": "string", "description": "当操作为 'find' 时，只返回此时间之前修改的条目 (ISO日期或Unix时间戳)。"},
+                        "limit": {"type": "integer", "description": "当操作为 'find'/'search_content' 时，最多返回的条目数，默认分别为200/20。"},
+                        "refresh": {"type": "boolean", "description": "当操作为 'find' 时，是否先增量刷新索引，默认true。"},
+                        "paths": {
+                            "type": "array", "items": {"type": "string"},
+                            "description": "当操作为 'read_files' 时，要读取的文件路径或glob模式列表 (如 ['notes/*.md', 'report.txt'])。"
+                        },
+                        "files": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {"path": {"type": "string"}, "content": {"type": "string"}},
+                                "required": ["path", "content"]
+                            },
+                            "description": "当操作为 'write_files' 时，要写入的文件列表。"
+                        },
+                        "max_bytes_per_file": {"type": "integer", "description": "当操作为 'read_files' 时，每个文件最多读取的字节数，超出部分会被截断。"}
                     },
-                    "required": ["path"]
+                    "required": []
                 }
             },
             "required": ["operation", "parameters"]
-        }
+        },
+        # patch_file与正则search_content在沙箱工作进程中执行
+        cpu_bound=True,
     )
     
+    def __init__(self, memory: CoreMemory):
+        super().__init__(memory)
+        self.index = WorkspaceIndex()
+        self.content_index = ContentIndex()
+
+    @staticmethod
+    def _parse_time(value: Any) -> Optional[float]:
+        """将ISO日期字符串或Unix时间戳统一转换为时间戳。"""
+        if value is None or value == "":
+            return None
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            return float(value)
+        except ValueError:
+            return datetime.fromisoformat(str(value)).timestamp()
+
+    def _find(self, path: str, parameters: dict) -> Dict[str, Any]:
+        index_stats = self.index.refresh(path) if parameters.get("refresh", True) else {"skipped": True}
+        result = self.index.find(
+            path,
+            pattern=parameters.get("pattern"),
+            file_type=parameters.get("file_type"),
+            min_size=parameters.get("min_size"),
+            max_size=parameters.get("max_size"),
+            modified_after=self._parse_time(parameters.get("modified_after")),
+            modified_before=self._parse_time(parameters.get("modified_before")),
+            limit=int(parameters.get("limit", 200)),
+        )
+        result["index_stats"] = index_stats
+        return result
+
+    def _search_content(self, path: str, parameters: dict) -> Dict[str, Any]:
+        query = parameters.get("query")
+        if not query:
+            raise ValueError("操作 'search_content' 需要参数 'parameters.query'。")
+        if parameters.get("regex"):
+            # 索引查询留在本进程，正则扫描交给沙箱，病态的正则表达式会被超时终止
+            root, paths = self.content_index.grep_candidates(path, parameters.get("pattern"))
+            return run_for(self.manifest, grep_files, root, paths, query, limit=int(parameters.get("limit", 200)),
+                           max_bytes=config.content_index_max_file_bytes)
+        index_stats = self.content_index.update(path)
+        result = self.content_index.search(path, query, limit=int(parameters.get("limit", 20)),
+                                           file_pattern=parameters.get("pattern"))
+        result["index_stats"] = index_stats
+        return result
+
+    @staticmethod
+    def _expand_paths(patterns: List[str]) -> List[str]:
+        """展开路径列表中的'~'和glob模式，保持顺序并去重。"""
+        expanded: Dict[str, None] = {}
+        for pattern in patterns:
+            pattern = os.path.expanduser(pattern)
+            if any(ch in pattern for ch in "*?["):
+                for match in sorted(glob.glob(pattern, recursive=True)):
+                    if os.path.isfile(match):
+                        expanded[match] = None
+            else:
+                expanded[pattern] = None
+        return list(expanded)
+
+    @staticmethod
+    def _read_one(path: str, max_bytes: int) -> Dict[str, Any]:
+        try:
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"文件不存在: {path}")
+            with open(path, 'rb') as f:
+                raw = f.read(max_bytes + 1)
+            return {
+                "path": path,
+                "file_content": raw[:max_bytes].decode('utf-8', errors='replace'),
+                "truncated": len(raw) > max_bytes,
+            }
+        except Exception as e:
+            return {"path": path, "error": str(e)}
+
+    @staticmethod
+    def _write_one(path: str, content: str) -> Dict[str, Any]:
+        try:
+            path = os.path.expanduser(path)
+            atomic_write(path, content)
+            return {"path": path, "write_status": "success", "content_length": len(content)}
+        except Exception as e:
+            return {"path": path, "error": str(e)}
+
+    def _read_files(self, parameters: dict) -> Dict[str, Any]:
+        patterns = parameters.get("paths") or []
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        if not patterns:
+            raise ValueError("操作 'read_files' 需要参数 'parameters.paths'。")
+        paths = self._expand_paths(patterns)
+        if len(paths) > config.steward_batch_max_files:
+            raise ValueError(f"匹配到 {len(paths)} 个文件，超过单次批量上限 {config.steward_batch_max_files}。请缩小范围。")
+        max_bytes = int(parameters.get("max_bytes_per_file", config.steward_max_read_bytes))
+
+        with ThreadPoolExecutor(max_workers=config.io_max_workers) as pool:
+            results = list(pool.map(lambda p: self._read_one(p, max_bytes), paths))
+        failed = sum(1 for r in results if "error" in r)
+        return {"files": results, "succeeded": len(results) - failed, "failed": failed}
+
+    def _write_files(self, parameters: dict) -> Dict[str, Any]:
+        files = parameters.get("files") or []
+        if not files:
+            raise ValueError("操作 'write_files' 需要参数 'parameters.files'。")
+        if len(files) > config.steward_batch_max_files:
+            raise ValueError(f"共 {len(files)} 个文件，超过单次批量上限 {config.steward_batch_max_files}。")
+        # 各文件并发写入，同一路径出现多次时最终内容不确定，直接拒绝
+        seen, duplicates = set(), []
+        for f in files:
+            target = os.path.abspath(os.path.expanduser(f.get("path", "")))
+            if target in seen and target not in duplicates:
+                duplicates.append(target)
+            seen.add(target)
+        if duplicates:
+            raise ValueError(f"'write_files' 中存在重复的路径: {', '.join(duplicates)}。请把同一文件的内容合并为一项。")
+
+        with ThreadPoolExecutor(max_workers=config.io_max_workers) as pool:
+            results = list(pool.map(lambda f: self._write_one(f.get("path", ""), f.get("content", "")), files))
+        failed = sum(1 for r in results if "error" in r)
+        return {"files": results, "succeeded": len(results) - failed, "failed": failed}
+
     def invoke(self, operation: str, parameters: dict, **kwargs) -> str:
         """
         执行文件系统操作的核心方法。
         """
-        session_id = kwargs.get("session_id", "default_session")
+        session_id = kwargs.get("session_id") or current_run_id("default_session")
         path = parameters.get("path")
+        if not path and operation in ("find", "search_content"):
+            path = config.workspace_root
         
         if path:
             # 自动展开用户主目录符号 '~'
@@ -55,12 +253,20 @@ class FileSystemAgent(BaseAgent):
         output_data = {}
 
         try:
-            if not operation or not path:
+            if not operation or (not path and operation not in _BATCH_OPERATIONS):
                 raise ValueError("参数 'operation' 和 'parameters.path' 是必需的。")
 
-            logger.info(f"Steward 正在对路径 '{path}' 执行操作: '{operation}'")
+            logger.info("Steward 正在对路径 '%s' 执行操作: '%s'", path, operation)
             
-            if operation == "list_directory":
+            if operation == "read_files":
+                output_data = self._read_files(parameters)
+            elif operation == "write_files":
+                output_data = self._write_files(parameters)
+            elif operation == "find":
+                output_data = self._find(path, parameters)
+            elif operation == "search_content":
+                output_data = self._search_content(path, parameters)
+            elif operation == "list_directory":
                 if not os.path.isdir(path):
                     raise FileNotFoundError(f"目录不存在: {path}")
                 output_data = {"directory_listing": os.listdir(path)}
@@ -71,26 +277,27 @@ class FileSystemAgent(BaseAgent):
                     output_data = {"file_content": f.read()}
             elif operation == "write_file":
                 content = parameters.get("content", "")
-                
-                # --- 【核心Bug修复】 ---
-                # 获取目录路径
+                # 先写临时文件再原子替换，写入中途崩溃不会留下半截文件
+                atomic_write(path, content)
+                output_data = {"write_status": "success", "path": path, "content_length": len(content)}
+            elif operation == "append_file":
+                content = parameters.get("content", "")
                 dir_path = os.path.dirname(path)
-                
-                # 仅当目录路径非空时才创建目录，这可以防止对当前目录进行无效的makedirs操作
                 if dir_path:
                     os.makedirs(dir_path, exist_ok=True)
-                # --- 修复结束 ---
-                
-                with open(path, 'w', encoding='utf-8') as f:
+                with open(path, 'a', encoding='utf-8') as f:
                     f.write(content)
-                output_data = {"write_status": "success", "path": path, "content_length": len(content)}
+                output_data = {"append_status": "success", "path": path, "appended_length": len(content)}
+            elif operation == "patch_file":
+                # 对大文件应用diff是纯计算，在沙箱中执行；工作进程是复用的，传入绝对路径避免受其工作目录影响
+                output_data = run_for(self.manifest, _patch_file, os.path.abspath(path), parameters)
             else:
-                raise ValueError(f"Steward不支持的操作: {operation}。有效操作为 'read_file', 'write_file', 'list_directory'。")
+                raise ValueError(f"Steward不支持的操作: {operation}。有效操作为 {', '.join(SUPPORTED_OPERATIONS)}。")
             
             status = "SUCCESS"
 
         except Exception as e:
-            logger.error(f"Steward在操作 '{path}' 时失败: {e}", exc_info=True)
+            logger.error("Steward在操作 '%s' 时失败: %s", path, e, exc_info=True)
             error_message = str(e)
             output_data = {"error": error_message}
         finally:
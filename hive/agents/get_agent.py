@@ -1,9 +1,12 @@
 # hive/agents/get_agent.py
 
+import os
 import logging
 import json
+import codecs
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, Field
@@ -12,6 +15,9 @@ from langchain_core.output_parsers import JsonOutputParser
 from hive.agents.base import BaseAgent, AgentManifest
 from hive.core.memory import CoreMemory
 from hive.utils.llm_factory import get_llm
+from hive.utils.config import config
+from hive.utils.rule_extraction import compile_plan
+from hive.utils.tracing import current_run_id
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +25,75 @@ logger = logging.getLogger(__name__)
 class ExtractedData(BaseModel):
     data: Dict[str, Any] = Field(description="The extracted data, conforming to the user's requested schema.")
 
+
+def split_into_chunks(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    将长文本切分为相互重叠的块。块的结尾优先落在换行或句末标点处，避免把一句话截成两半；
+    相邻块重叠overlap个字符，保证跨越边界的信息至少完整出现在一个块中。
+    """
+    if len(text) <= chunk_size:
+        return [text]
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            window = text[start + chunk_size // 2:end]
+            cut = max(window.rfind(sep) for sep in ("\n", "。", "！", "？", ". ", "! ", "? "))
+            if cut != -1:
+                end = start + chunk_size // 2 + cut + 1
+        chunks.append(text[start:end])
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def merge_extractions(results: List[Any], schema: Optional[Dict[str, Any]] = None,
+                      path: str = "", notes: Optional[List[Dict[str, Any]]] = None) -> Any:
+    """
+    按schema合并多个块的提取结果：
+    - 数组: 按出现顺序取并集并去重；
+    - 对象: 逐字段递归合并；
+    - 标量: 取第一个非null值，其余不同的非null值记录为冲突说明。
+    """
+    notes = notes if notes is not None else []
+    schema = schema or {}
+    present = [r for r in results if r is not None]
+    if not present:
+        return None
+
+    if schema.get("type") == "array" or all(isinstance(r, list) for r in present):
+        merged, seen = [], set()
+        for r in present:
+            for item in (r if isinstance(r, list) else [r]):
+                key = _canonical(item)
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(item)
+        return merged
+
+    if schema.get("type") == "object" or all(isinstance(r, dict) for r in present):
+        properties = schema.get("properties", {})
+        keys = list(dict.fromkeys([k for k in properties] + [k for r in present if isinstance(r, dict) for k in r]))
+        return {
+            k: merge_extractions([r.get(k) for r in present if isinstance(r, dict)], properties.get(k),
+                                 f"{path}.{k}" if path else k, notes)
+            for k in keys
+        }
+
+    first = present[0]
+    conflicting = [r for r in present[1:] if _canonical(r) != _canonical(first)]
+    if conflicting:
+        values = list({_canonical(v): v for v in [first] + conflicting}.values())
+        notes.append({"field": path or "$", "values": values, "chosen": first})
+    return first
+
+
 class GetAgent(BaseAgent):
     """
     L2专家 - 信息提取专家, 代号'Get'。
@@ -27,7 +102,8 @@ class GetAgent(BaseAgent):
     manifest = AgentManifest(
         name="GetAgent",
         display_name="Get",
-        description="从一段文本中提取结构化的JSON数据。你需要提供原始文本和描述所需数据结构的JSON Schema。",
+        description="从一段文本中提取结构化的JSON数据。你需要提供原始文本和描述所需数据结构的JSON Schema。"
+                    "需要对多个文本或文件按同一个Schema提取时，请通过'texts'或'file_paths'一次性批量提交。",
         parameters_json_schema={
             "type": "object",
             "properties": {
@@ -35,12 +111,26 @@ class GetAgent(BaseAgent):
                     "type": "string",
                     "description": "需要从中提取信息的原始文本。"
                 },
+                "texts": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "批量模式：多段需要按同一个Schema提取的文本，例如多条搜索结果。"
+                },
+                "file_paths": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "批量模式：多个本地文件路径，直接读取文件内容进行提取，无需先通过Steward读取。"
+                },
+                "as_table": {
+                    "type": "boolean",
+                    "description": "批量模式下，是否额外以表格形式 (columns + rows) 返回结果。"
+                },
                 "extraction_schema": {
                     "type": "object",
                     "description": "一个JSON Schema对象，用于描述你希望提取的数据的结构。"
                 }
             },
-            "required": ["text_to_process", "extraction_schema"]
+            "required": ["extraction_schema"]
         }
     )
 
@@ -64,37 +154,217 @@ class GetAgent(BaseAgent):
         # 4. 组装处理链
         self.chain = self.prompt | self.llm | self.parser
 
-    def invoke(self, text_to_process: str, extraction_schema: Dict[str, Any], **kwargs) -> str:
+        # LLM提取耗时的指数移动平均，用于估算确定性快速路径节省的延迟
+        self._llm_latency_ema_ms: Optional[float] = None
+
+    def _extract(self, text: str, extraction_schema: Dict[str, Any], format_instructions: str) -> Dict[str, Any]:
+        """
+        短文本直接调用一次处理链；长文本切分为重叠的块，通过chain.batch在有并发上限的线程池中并发提取，
+        再按schema合并各块的结果。这样提取延迟取决于块大小而不是文本总长度。
+        """
+        chunks = split_into_chunks(text, config.get_chunk_size, config.get_chunk_overlap)
+        if len(chunks) == 1:
+            return self.chain.invoke({"text": text, "format_instructions": format_instructions})
+
+        logger.info("GetAgent 将 %d 字符的文本切分为 %d 个块并发提取", len(text), len(chunks))
+        responses = self.chain.batch(
+            [{"text": chunk, "format_instructions": format_instructions} for chunk in chunks],
+            config={"max_concurrency": config.get_max_concurrency},
+            return_exceptions=True,
+        )
+        succeeded = [r for r in responses if not isinstance(r, Exception)]
+        failed = [str(r) for r in responses if isinstance(r, Exception)]
+        if not succeeded:
+            raise RuntimeError(f"所有 {len(chunks)} 个文本块的提取均失败: {failed[0]}")
+
+        notes: List[Dict[str, Any]] = []
+        merged = merge_extractions(succeeded, extraction_schema, notes=notes)
+        if notes or failed:
+            if not isinstance(merged, dict):
+                merged = {"data": merged}
+            merged["_merge_notes"] = {"chunks": len(chunks), "failed_chunks": failed, "conflicts": notes}
+        return merged
+
+    def _extract_via_llm(self, text: str, extraction_schema: Dict[str, Any]) -> Dict[str, Any]:
+        # 将schema作为格式化指令的一部分，这是告诉LLM我们想要的具体结构
+        format_instructions = json.dumps(extraction_schema, indent=2)
+        started = time.perf_counter()
+        result = self._extract(text, extraction_schema, format_instructions)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._llm_latency_ema_ms = elapsed_ms if self._llm_latency_ema_ms is None else 0.8 * self._llm_latency_ema_ms + 0.2 * elapsed_ms
+        return result
+
+    def _extract_with_fast_path(self, text: str, extraction_schema: Dict[str, Any]):
+        """
+        先用由schema编译出的确定性提取计划 (JSON字段查找、邮箱/网址/日期/带中文单位的数字等正则) 在本地填充字段，
+        只把无法确定的字段交给LLM。返回 (提取结果, 快速路径统计)。
+        """
+        if not config.get_fast_path or not isinstance(extraction_schema, dict) or not extraction_schema.get("properties"):
+            return self._extract_via_llm(text, extraction_schema), None
+
+        plan = compile_plan(extraction_schema)
+        resolved, unresolved = plan.apply(text)
+        llm_result: Dict[str, Any] = {}
+        if unresolved:
+            llm_result = self._extract_via_llm(text, plan.reduced_schema(unresolved))
+
+        stats = self._fast_path_stats(extraction_schema, [(resolved, unresolved)])
+        logger.info("GetAgent 快速路径: 本地解析 %d/%d 个字段, 跳过LLM=%s", len(resolved), stats["fields_total"], not unresolved)
+        return self._assemble(extraction_schema, resolved, llm_result), stats
+
+    @staticmethod
+    def _assemble(extraction_schema: Dict[str, Any], resolved: Dict[str, Any], llm_result: Any) -> Dict[str, Any]:
+        """按schema的字段顺序合并本地解析结果与LLM结果，LLM返回的额外字段 (如_merge_notes) 保留在末尾。"""
+        llm_result = llm_result if isinstance(llm_result, dict) else {}
+        output = {name: resolved[name] if name in resolved else llm_result.get(name) for name in extraction_schema["properties"]}
+        output.update({k: v for k, v in llm_result.items() if k not in output})
+        return output
+
+    def _fast_path_stats(self, extraction_schema: Dict[str, Any], outcomes: List[tuple]) -> Dict[str, Any]:
+        per_doc = len(extraction_schema.get("properties") or {})
+        local = sum(len(resolved) for resolved, _ in outcomes)
+        skipped = sum(1 for _, unresolved in outcomes if not unresolved)
+        return {
+            "fields_total": per_doc * len(outcomes),
+            "fields_local": local,
+            "hit_rate": round(local / (per_doc * len(outcomes)), 4) if per_doc and outcomes else 0.0,
+            "llm_skipped": skipped == len(outcomes),
+            "estimated_latency_saved_ms": round((self._llm_latency_ema_ms or 0.0) * skipped),
+        }
+
+    @staticmethod
+    def _load_documents(texts: Optional[List[str]], file_paths: Optional[List[str]]) -> List[Dict[str, Any]]:
+        documents = [{"source": f"texts[{i}]", "text": t} for i, t in enumerate(texts or [])]
+        for path in file_paths or []:
+            expanded = os.path.expanduser(path)
+            try:
+                # 按字节限制读取量，多读一个字节用于判断是否被截断
+                with open(expanded, 'rb') as f:
+                    raw = f.read(config.steward_max_read_bytes + 1)
+                truncated = len(raw) > config.steward_max_read_bytes
+                # 增量解码器 (final=False) 丢弃截断处不完整的多字节字符
+                text = codecs.getincrementaldecoder('utf-8')(errors='replace').decode(raw[:config.steward_max_read_bytes], final=not truncated)
+                documents.append({"source": path, "text": text, "truncated": truncated})
+            except OSError as e:
+                documents.append({"source": path, "error": f"读取文件失败: {e}"})
+        return documents
+
+    def _extract_batch(self, documents: List[Dict[str, Any]], extraction_schema: Dict[str, Any]):
+        """
+        批量提取：每个文档先走确定性快速路径；剩余的短文档共用缓存的格式化指令，
+        通过一次chain.batch (有并发上限) 提取，长文档仍按块并发处理。
+        返回 (每个文档的结果列表, 快速路径统计)。
+        """
+        use_plan = config.get_fast_path and bool(extraction_schema.get("properties"))
+        plan = compile_plan(extraction_schema) if use_plan else None
+        instructions_cache: Dict[str, str] = {}
+
+        def format_instructions(schema: Dict[str, Any]) -> str:
+            key = json.dumps(schema, sort_keys=True, ensure_ascii=False)
+            if key not in instructions_cache:
+                instructions_cache[key] = json.dumps(schema, indent=2)
+            return instructions_cache[key]
+
+        results: List[Dict[str, Any]] = [{} for _ in documents]
+        outcomes = []
+        short_jobs = []  # (文档序号, 已解析字段, 发送给LLM的schema)
+        long_jobs = []
+        for i, doc in enumerate(documents):
+            if "error" in doc:
+                results[i] = {"source": doc["source"], "error": doc["error"]}
+                continue
+            text = doc["text"]
+            if plan:
+                resolved, unresolved = plan.apply(text)
+                outcomes.append((resolved, unresolved))
+                llm_schema = plan.reduced_schema(unresolved) if unresolved else None
+            else:
+                resolved, llm_schema = {}, extraction_schema
+            if llm_schema is None:
+                results[i] = {"source": doc["source"], "data": self._assemble(extraction_schema, resolved, {})}
+            elif len(text) <= config.get_chunk_size:
+                short_jobs.append((i, resolved, llm_schema))
+            else:
+                long_jobs.append((i, resolved, llm_schema))
+
+        if short_jobs:
+            started = time.perf_counter()
+            responses = self.chain.batch(
+                [{"text": documents[i]["text"], "format_instructions": format_instructions(schema)} for i, _, schema in short_jobs],
+                config={"max_concurrency": config.get_max_concurrency},
+                return_exceptions=True,
+            )
+            per_doc_ms = (time.perf_counter() - started) * 1000 * min(config.get_max_concurrency, len(short_jobs)) / len(short_jobs)
+            self._llm_latency_ema_ms = per_doc_ms if self._llm_latency_ema_ms is None else 0.8 * self._llm_latency_ema_ms + 0.2 * per_doc_ms
+            for (i, resolved, _), response in zip(short_jobs, responses):
+                source = documents[i]["source"]
+                if isinstance(response, Exception):
+                    results[i] = {"source": source, "error": f"提取数据时发生错误: {response}"}
+                else:
+                    data = self._assemble(extraction_schema, resolved, response) if plan else response
+                    results[i] = {"source": source, "data": data}
+
+        for i, resolved, schema in long_jobs:
+            source = documents[i]["source"]
+            try:
+                response = self._extract(documents[i]["text"], schema, format_instructions(schema))
+                results[i] = {"source": source, "data": self._assemble(extraction_schema, resolved, response) if plan else response}
+            except Exception as e:
+                results[i] = {"source": source, "error": f"提取数据时发生错误: {e}"}
+
+        for doc, result in zip(documents, results):
+            if doc.get("truncated"):
+                # 只提取了文件的前STEWARD_MAX_READ_BYTES字节，结果可能不完整
+                result["truncated"] = True
+        return results, (self._fast_path_stats(extraction_schema, outcomes) if plan else None)
+
+    @staticmethod
+    def _to_table(extraction_schema: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        columns = list((extraction_schema.get("properties") or {}).keys())
+        if not columns:
+            columns = list(dict.fromkeys(k for r in results if isinstance(r.get("data"), dict) for k in r["data"]))
+        rows = [[r["source"]] + [(r.get("data") or {}).get(c) if isinstance(r.get("data"), dict) else None for c in columns]
+                for r in results]
+        return {"columns": ["source"] + columns, "rows": rows}
+
+    def invoke(self, text_to_process: str = "", extraction_schema: Optional[Dict[str, Any]] = None,
+               texts: Optional[List[str]] = None, file_paths: Optional[List[str]] = None,
+               as_table: bool = False, **kwargs) -> str:
         """
         执行信息提取任务的核心方法。
+        传入 'texts' 或 'file_paths' 时进入批量模式，对所有文档使用同一个Schema，并返回逐文档的结果列表。
         """
-        session_id = kwargs.get("session_id", "default_session")
+        session_id = kwargs.get("session_id") or current_run_id("default_session")
         start_time = datetime.now()
         status = "FAILURE"
         output_data = {}
         error_message = None
+        fast_path_stats = None
 
+        is_batch = bool(texts or file_paths)
         try:
-            if not text_to_process or not extraction_schema:
-                raise ValueError("参数 'text_to_process' 和 'extraction_schema' 是必需的。")
-            
-            logger.info(f"GetAgent 正在从文本中提取数据...")
-            
-            # 将用户提供的schema作为格式化指令的一部分
-            # 这是告诉LLM我们想要的具体结构
-            format_instructions = json.dumps(extraction_schema, indent=2)
-
-            # 调用处理链
-            response = self.chain.invoke({
-                "text": text_to_process,
-                "format_instructions": format_instructions
-            })
-            
-            output_data = response
+            if is_batch:
+                if not extraction_schema:
+                    raise ValueError("参数 'extraction_schema' 是必需的。")
+                documents = self._load_documents(texts, file_paths)
+                logger.info("GetAgent 正在对 %d 个文档进行批量提取...", len(documents))
+                results, fast_path_stats = self._extract_batch(documents, extraction_schema)
+                failed = sum(1 for r in results if "error" in r)
+                output_data = {"results": results, "succeeded": len(results) - failed, "failed": failed}
+                if as_table:
+                    output_data["table"] = self._to_table(extraction_schema, results)
+            else:
+                if not text_to_process or not extraction_schema:
+                    raise ValueError("参数 'text_to_process' 和 'extraction_schema' 是必需的。")
+
+                logger.info("GetAgent 正在从文本中提取数据...")
+
+                # 先走确定性快速路径，剩余字段再调用处理链 (长文本会被分块并发处理)
+                output_data, fast_path_stats = self._extract_with_fast_path(text_to_process, extraction_schema)
             status = "SUCCESS"
 
         except Exception as e:
-            logger.error(f"GetAgent 在提取数据时失败: {e}", exc_info=True)
+            logger.error("GetAgent 在提取数据时失败: %s", e, exc_info=True)
             error_message = f"提取数据时发生错误: {str(e)}."
             output_data = {"error": error_message}
         finally:
@@ -102,8 +372,10 @@ class GetAgent(BaseAgent):
             self.memory.log_agent_invocation(
                 session_id=session_id,
                 agent_name=self.manifest.name,
-                input_data={"text_length": len(text_to_process), "schema": extraction_schema},
-                output_data=output_data,
+                input_data={"documents": len(texts or []) + len(file_paths or []), "file_paths": file_paths, "schema": extraction_schema}
+                           if is_batch else {"text_length": len(text_to_process), "schema": extraction_schema},
+                # 快速路径的命中率与节省的延迟只记录在CoreMemory中，不返回给Nexus
+                output_data={**output_data, "_fast_path": fast_path_stats} if fast_path_stats else output_data,
                 status=status,
                 start_time=start_time,
                 end_time=end_time,
@@ -1,67 +1,162 @@
-# hive/agents/web_search_agent.py (v1.2 - Final Fix)
+# hive/agents/web_search_agent.py (v1.3)
 
 import logging
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any
-
-# --- 【核心修正】: 根据官方最新文档，直接从包顶层导入正确的类名 TavilySearch ---
-from langchain_tavily import TavilySearch
+from typing import Dict, Any, List, Optional
 
 from hive.agents.base import BaseAgent, AgentManifest
 from hive.core.memory import CoreMemory
+from hive.core.search_cache import SearchCache
 from hive.utils.config import config
+from hive.utils.search_backends import RateLimiter, create_search_backend, normalize_query, normalize_url
+from hive.utils.tracing import current_run_id
 
 logger = logging.getLogger(__name__)
 
+# 每个搜索服务商共享一个限流器，多个Seeker实例/并发查询不会突破服务商的速率限制
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def _get_rate_limiter(provider: str) -> RateLimiter:
+    with _rate_limiters_lock:
+        if provider not in _rate_limiters:
+            _rate_limiters[provider] = RateLimiter(config.search_rate_limit, config.search_rate_burst)
+        return _rate_limiters[provider]
+
+
 class WebSearchAgent(BaseAgent):
     """
     L2专家 - 网络探索者, 代号Seeker。
     已升级为使用Tavily搜索引擎，可以直接针对问题进行深入的网页信息整合和回答。
+    搜索后端可通过SEARCH_BACKEND切换 (如测试和基准测试使用的本地stub)，
+    结果按归一化查询缓存在磁盘上，多个查询可以通过 'queries' 并发执行。
     """
     manifest = AgentManifest(
         name="WebSearchAgent",
         display_name="Seeker",
-        description="使用Tavily搜索引擎在互联网上搜索实时信息，并返回可以直接回答问题的摘要。",
+        description="使用Tavily搜索引擎在互联网上搜索实时信息，并返回可以直接回答问题的摘要。"
+                    "需要对比研究多个问题时，请通过'queries'一次性并发提交，结果中重复的网页会被去除。",
         parameters_json_schema={
             "type": "object",
-            "properties": {"query": {"type": "string", "description": "你想要搜索或需要回答的问题。"}},
-            "required": ["query"]
+            "properties": {
+                "query": {"type": "string", "description": "你想要搜索或需要回答的问题。"},
+                "queries": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "批量模式：多个需要并发搜索的问题。"
+                }
+            },
+            "required": []
         }
     )
 
     def __init__(self, memory: CoreMemory):
         super().__init__(memory)
-        if not config.tavily_api_key:
-            raise ValueError("Tavily API Key (TAVILY_API_KEY) 未在 .env 文件中配置。Seeker Agent无法初始化。")
-        
-        # --- 【核心修正】: 使用正确的类名 TavilySearch 进行实例化 ---
-        self.search_tool = TavilySearch(max_results=5, tavily_api_key=config.tavily_api_key)
+        self.backend = create_search_backend()
+        self.rate_limiter = _get_rate_limiter(self.backend.name)
+        self.cache = SearchCache()
+        self.cache.purge_expired()
+
+    def _search(self, query: str) -> Dict[str, Any]:
+        """执行单个查询：先查磁盘缓存，未命中时经限流器调用搜索后端并写入缓存。"""
+        max_results = config.search_max_results
+        cached = self.cache.get(self.backend.name, query, max_results)
+        # 旧版本可能缓存过后端返回的错误，视为未命中
+        if cached is not None and not (isinstance(cached, dict) and "error" in cached):
+            logger.info("Seeker 缓存命中: '%s'", query)
+            return {"response": cached, "cached": True}
+        self.rate_limiter.acquire()
+        response = self.backend.search(query, max_results)
+        if isinstance(response, dict) and "error" in response:
+            # langchain_tavily在429、超时等情况下返回 {"error": ...} 而不是抛出异常；这类瞬时错误不能写入缓存
+            raise RuntimeError(f"搜索后端返回错误: {response['error']}")
+        self.cache.put(self.backend.name, query, max_results, response)
+        return {"response": response, "cached": False}
+
+    def _search_many(self, queries: List[str]) -> Dict[str, Any]:
+        """并发执行多个查询，并按归一化URL在所有结果间去重 (保留最先出现的一条)。"""
+        by_normalized: Dict[str, str] = {}
+        for q in queries:
+            if isinstance(q, str) and q.strip():
+                by_normalized.setdefault(normalize_query(q), q.strip())
+        unique_queries = list(by_normalized.values())
+        if not unique_queries:
+            raise ValueError("参数 'queries' 必须包含至少一个非空的字符串。")
 
-    def invoke(self, query: str, **kwargs) -> str:
+        def run(query: str) -> Dict[str, Any]:
+            try:
+                return self._search(query)
+            except Exception as e:
+                logger.error("Seeker 在研究 '%s' 时失败: %s", query, e)
+                return {"error": f"网络搜索时发生错误: {e}"}
+
+        workers = max(1, min(config.search_max_concurrency, len(unique_queries)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(run, unique_queries))
+
+        seen_urls = set()
+        duplicates = 0
+        results = []
+        for query, outcome in zip(unique_queries, outcomes):
+            if "error" in outcome:
+                results.append({"query": query, "error": outcome["error"]})
+                continue
+            response = outcome["response"]
+            if not isinstance(response, dict):
+                results.append({"query": query, "answer": response, "cached": outcome["cached"]})
+                continue
+            items = []
+            for item in response.get("results") or []:
+                key = normalize_url(item.get("url", "")) if isinstance(item, dict) and item.get("url") else None
+                if key is not None and key in seen_urls:
+                    duplicates += 1
+                    continue
+                if key is not None:
+                    seen_urls.add(key)
+                items.append(item)
+            results.append({"query": query, "answer": response.get("answer"), "results": items, "cached": outcome["cached"]})
+
+        failed = sum(1 for r in results if "error" in r)
+        return {
+            "results": results,
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "cache_hits": sum(1 for r in results if r.get("cached")),
+            "unique_urls": len(seen_urls),
+            "duplicates_removed": duplicates,
+        }
+
+    def invoke(self, query: str = "", queries: Optional[List[str]] = None, **kwargs) -> str:
         """
         执行网络搜索的核心方法。现在直接返回Tavily处理后的答案。
+        传入 'queries' 时进入批量模式，并发搜索多个问题并对结果去重。
         """
-        session_id = kwargs.get("session_id", "default_session")
+        session_id = kwargs.get("session_id") or current_run_id("default_session")
         start_time = datetime.now()
         status = "FAILURE"
         output_data = {}
         error_message = None
 
         try:
-            if not isinstance(query, str) or not query.strip():
-                raise ValueError("参数 'query' 必须是一个非空的字符串。")
-            
-            logger.info(f"Seeker (Tavily) 正在研究问题: '{query}'")
-            
-            # TavilySearch工具的返回结果已经是精炼过的，可以直接使用
-            raw_results = self.search_tool.invoke(query)
-            
-            output_data = {"answer": raw_results}
+            if queries:
+                logger.info("Seeker 正在并发研究 %d 个问题", len(queries))
+                output_data = self._search_many(queries)
+            else:
+                if not isinstance(query, str) or not query.strip():
+                    raise ValueError("参数 'query' 必须是一个非空的字符串。")
+
+                logger.info("Seeker 正在研究问题: '%s'", query)
+
+                # 搜索后端的返回结果已经是精炼过的，可以直接使用
+                output_data = {"answer": self._search(query)["response"]}
             status = "SUCCESS"
 
         except Exception as e:
-            logger.error(f"Seeker (Tavily) 在研究 '{query}' 时失败: {e}", exc_info=True)
+            logger.error("Seeker 在研究 '%s' 时失败: %s", query or queries, e, exc_info=True)
             error_message = f"网络搜索时发生错误: {str(e)}"
             output_data = {"error": error_message}
         finally:
@@ -69,7 +164,7 @@ class WebSearchAgent(BaseAgent):
             self.memory.log_agent_invocation(
                 session_id=session_id,
                 agent_name=self.manifest.name,
-                input_data={"query": query},
+                input_data={"queries": queries} if queries else {"query": query},
                 output_data=output_data,
                 status=status,
                 start_time=start_time,
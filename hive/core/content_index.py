@@ -0,0 +1,286 @@
+# hive/core/content_index.py
+
+import os
+import re
+import math
+import fnmatch
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from hive.core.workspace_index import WorkspaceIndex
+from hive.utils.config import config
+from hive.utils.text_tokenize import tokenize
+
+logger = logging.getLogger(__name__)
+
+# BM25 参数
+_K1 = 1.2
+_B = 0.75
+_MAX_SNIPPETS_PER_FILE = 3
+_SNIPPET_WIDTH = 200
+# 分词方式变化时递增；已有索引的版本不同时清空重建 (1: 文档额外索引CJK单字)
+_INDEX_VERSION = 1
+
+
+def _read_text(path: str, max_bytes: int) -> Optional[str]:
+    """读取文本文件；超过大小上限或看起来是二进制文件时返回None。"""
+    try:
+        if os.path.getsize(path) > max_bytes:
+            return None
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except OSError:
+        return None
+    if b'\x00' in raw[:8192]:
+        return None
+    return raw.decode('utf-8', errors='ignore')
+
+
+def _prepare_document(path: str, max_bytes: int) -> Tuple[str, str, Counter, int]:
+    """在线程池中执行：读取、计算哈希并分词。二进制文件记为空文档，避免每次更新都重新读取。"""
+    text = _read_text(path, max_bytes)
+    if text is None:
+        return path, "", Counter(), 0
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    terms = tokenize(text, unigrams=True)
+    return path, digest, Counter(terms), len(terms)
+
+
+class ContentIndex:
+    """
+    Steward的全文检索索引 (v1.0)。
+    在工作区文件索引之上维护一个倒排索引 (词项 -> 文档)，仅对mtime/大小变化且内容哈希变化的文件重新分词。
+    查询使用BM25排序，并返回带行号的片段；正则查询则走并行的暴力扫描。
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(ContentIndex, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, db_path: Optional[str] = None):
+        if hasattr(self, 'connection'):  # Prevent re-initialization
+            return
+        db_path = db_path or config.index_db_path
+        self.workspace_index = WorkspaceIndex()
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._initialize_db()
+
+    def _initialize_db(self):
+        with self.connection:
+            self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS content_docs (
+                doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL UNIQUE,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha1 TEXT NOT NULL,
+                length INTEGER NOT NULL
+            )
+            ''')
+            self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS content_postings (
+                term TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID
+            ''')
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_content_postings_doc ON content_postings(doc_id)")
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] != _INDEX_VERSION:
+                # 旧版本索引的词项与当前分词方式不一致，清空后由下一次update全部重新分词
+                self.connection.execute("DELETE FROM content_postings")
+                self.connection.execute("DELETE FROM content_docs")
+                self.connection.execute(f"PRAGMA user_version = {_INDEX_VERSION}")
+
+    def _candidate_files(self, root: str) -> List[str]:
+        return self.workspace_index.list_files(root)
+
+    @staticmethod
+    def _stat_files(paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        文件列表来自工作区索引，但文件内容被覆盖写入时其所在目录的mtime并不会变化，
+        因此这里逐个stat以获得最新的大小与修改时间。
+        """
+        current = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_size <= config.content_index_max_file_bytes:
+                current[path] = {"size": st.st_size, "mtime": st.st_mtime}
+        return current
+
+    def update(self, root: str) -> Dict[str, Any]:
+        """增量更新root下的倒排索引，返回本次更新的统计信息。"""
+        root = WorkspaceIndex.normalize_root(root)
+        self.workspace_index.refresh(root)
+        current = self._stat_files(self._candidate_files(root))
+
+        with self._lock:
+            low, high = WorkspaceIndex.subtree_bounds(root)
+            known = {
+                r["path"]: r for r in self.connection.execute(
+                    "SELECT doc_id, path, size, mtime, sha1 FROM content_docs WHERE path >= ? AND path < ?", (low, high)
+                )
+            }
+            changed = [path for path, meta in current.items()
+                       if path not in known
+                       or known[path]["size"] != meta["size"] or known[path]["mtime"] != meta["mtime"]]
+            removed = [doc for path, doc in known.items() if path not in current]
+
+            reindexed = unchanged_hash = 0
+            with ThreadPoolExecutor(max_workers=config.io_max_workers) as pool:
+                prepared = pool.map(lambda p: _prepare_document(p, config.content_index_max_file_bytes), changed)
+                with self.connection:
+                    for doc in removed:
+                        self._delete_doc(doc["doc_id"])
+                    for path, digest, counts, length in prepared:
+                        meta = current[path]
+                        old = known.get(path)
+                        if old and old["sha1"] == digest:
+                            # 仅元数据变化 (如touch)，无需重新分词
+                            unchanged_hash += 1
+                            self.connection.execute(
+                                "UPDATE content_docs SET size = ?, mtime = ? WHERE doc_id = ?",
+                                (meta["size"], meta["mtime"], old["doc_id"])
+                            )
+                            continue
+                        if old:
+                            self._delete_doc(old["doc_id"])
+                        cursor = self.connection.execute(
+                            "INSERT INTO content_docs (path, size, mtime, sha1, length) VALUES (?, ?, ?, ?, ?)",
+                            (path, meta["size"], meta["mtime"], digest, length)
+                        )
+                        self.connection.executemany(
+                            "INSERT INTO content_postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                            ((term, cursor.lastrowid, tf) for term, tf in counts.items())
+                        )
+                        reindexed += 1
+
+        stats = {"candidate_files": len(current), "reindexed": reindexed, "metadata_only": unchanged_hash, "removed": len(removed)}
+        logger.info("ContentIndex: 更新 '%s' 完成: %s", root, stats)
+        return stats
+
+    def _delete_doc(self, doc_id: int):
+        self.connection.execute("DELETE FROM content_postings WHERE doc_id = ?", (doc_id,))
+        self.connection.execute("DELETE FROM content_docs WHERE doc_id = ?", (doc_id,))
+
+    def search(self, root: str, query: str, limit: int = 20, file_pattern: Optional[str] = None) -> Dict[str, Any]:
+        """使用BM25对root下的文档排序，返回前limit个文件及其带行号的片段。"""
+        root = WorkspaceIndex.normalize_root(root)
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            raise ValueError("查询中没有可检索的词项。")
+
+        low, high = WorkspaceIndex.subtree_bounds(root)
+        with self._lock:
+            n_docs, avg_len = self.connection.execute(
+                "SELECT COUNT(*), AVG(length) FROM content_docs WHERE path >= ? AND path < ? AND length > 0", (low, high)
+            ).fetchone()
+            scores: Dict[int, float] = {}
+            doc_meta: Dict[int, sqlite3.Row] = {}
+            for term in terms:
+                rows = self.connection.execute(
+                    "SELECT p.doc_id, p.tf, d.path, d.length FROM content_postings p "
+                    "JOIN content_docs d ON d.doc_id = p.doc_id "
+                    "WHERE p.term = ? AND d.path >= ? AND d.path < ?",
+                    (term, low, high)
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                for r in rows:
+                    norm = r["tf"] * (_K1 + 1) / (r["tf"] + _K1 * (1 - _B + _B * r["length"] / (avg_len or 1)))
+                    scores[r["doc_id"]] = scores.get(r["doc_id"], 0.0) + idf * norm
+                    doc_meta[r["doc_id"]] = r
+
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        if file_pattern:
+            ranked = [kv for kv in ranked if fnmatch.fnmatch(os.path.basename(doc_meta[kv[0]]["path"]), file_pattern)]
+
+        results = []
+        for doc_id, score in ranked[:limit]:
+            path = doc_meta[doc_id]["path"]
+            results.append({"path": path, "score": round(score, 4), "snippets": self._snippets(path, terms)})
+        return {"root": root, "query": query, "total_matched": len(ranked), "results": results}
+
+    @staticmethod
+    def _snippets(path: str, terms: List[str]) -> List[Dict[str, Any]]:
+        text = _read_text(path, config.content_index_max_file_bytes) or ""
+        snippets = []
+        for lineno, line in enumerate(text.splitlines(), start=1):
+            lowered = line.lower()
+            if any(term in lowered for term in terms):
+                snippets.append({"line": lineno, "text": line.strip()[:_SNIPPET_WIDTH]})
+                if len(snippets) >= _MAX_SNIPPETS_PER_FILE:
+                    break
+        return snippets
+
+    def grep_candidates(self, root: str, file_pattern: Optional[str] = None) -> Tuple[str, List[str]]:
+        """正则扫描的候选文件 (来自文件索引)，返回规范化后的根目录与文件列表。"""
+        root = WorkspaceIndex.normalize_root(root)
+        self.workspace_index.refresh(root)
+        paths = [path for path in self._candidate_files(root)
+                 if not file_pattern or fnmatch.fnmatch(os.path.basename(path), file_pattern)]
+        return root, paths
+
+    def grep(self, root: str, pattern: str, limit: int = 200, file_pattern: Optional[str] = None,
+             ignore_case: bool = True) -> Dict[str, Any]:
+        """正则查询无法走倒排索引，回退为基于文件索引的并行暴力扫描。"""
+        root, paths = self.grep_candidates(root, file_pattern)
+        return grep_files(root, paths, pattern, limit=limit, ignore_case=ignore_case,
+                          max_bytes=config.content_index_max_file_bytes)
+
+
+def grep_files(root: str, paths: List[str], pattern: str, limit: int = 200, ignore_case: bool = True,
+               max_bytes: int = 2 * 1024 * 1024) -> Dict[str, Any]:
+    """
+    逐行正则扫描给定的文件。不依赖索引与数据库连接，可以放到沙箱工作进程中执行，
+    避免病态的正则表达式长时间占用主进程。匹配数超过limit后不再读取剩余的文件，
+    此时total_matched只是已扫描文件中的匹配数。
+    """
+    regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    stop = threading.Event()
+
+    def scan(path: str) -> Optional[List[Dict[str, Any]]]:
+        if stop.is_set():
+            return None
+        text = _read_text(path, max_bytes)
+        if not text:
+            return []
+        found = []
+        for lineno, line in enumerate(text.splitlines(), start=1):
+            if regex.search(line):
+                found.append({"path": path, "line": lineno, "text": line.strip()[:_SNIPPET_WIDTH]})
+                # 多取一条用于判断是否截断
+                if len(found) > limit:
+                    break
+        return found
+
+    matches: List[Dict[str, Any]] = []
+    total = scanned = 0
+    with ThreadPoolExecutor(max_workers=config.io_max_workers) as pool:
+        # 结果按paths的顺序消费，停止后被跳过的文件都排在已消费的文件之后，返回的匹配是确定的
+        for file_matches in pool.map(scan, paths):
+            if file_matches is None:
+                continue
+            scanned += 1
+            total += len(file_matches)
+            if len(matches) < limit:
+                matches.extend(file_matches[:limit - len(matches)])
+            if total > limit:
+                stop.set()
+    return {"root": root, "pattern": pattern, "files_scanned": scanned, "total_matched": total,
+            "truncated": total > len(matches), "matches": matches}
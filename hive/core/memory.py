@@ -2,9 +2,16 @@
 
 import sqlite3
 import os
+import io
+import csv
 from datetime import datetime
 import json
 import logging
+import threading
+from urllib.request import pathname2url
+
+from hive.utils.config import config
+from hive.utils.tracing import current_span_id
 
 # --- Configuration ---
 DB_FILE = "hive_memory.db"
@@ -12,6 +19,12 @@ DB_FILE = "hive_memory.db"
 # We will make this path more robust later.
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', DB_FILE)
 
+# agent_invocations中可以导出的列；input_data/output_data可能很大，默认不导出，需要时通过columns显式指定
+EXPORT_COLUMNS = ("id", "session_id", "agent_name", "input_data", "output_data", "status",
+                  "start_time", "end_time", "duration_ms", "error_message", "span_id")
+DEFAULT_EXPORT_COLUMNS = tuple(c for c in EXPORT_COLUMNS if c not in ("input_data", "output_data"))
+EXPORT_FORMATS = ("ndjson", "csv")
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class CoreMemory:
@@ -35,9 +48,15 @@ class CoreMemory:
         """
         if not hasattr(self, 'connection'): # Prevent re-initialization
             try:
+                self.db_path = db_path
                 self.connection = sqlite3.connect(db_path, check_same_thread=False)
                 self.connection.row_factory = sqlite3.Row # Access columns by name
+                # WAL模式下读者不阻塞写者：导出等长时间的读取使用独立连接，不影响调用日志与span的写入
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.execute("PRAGMA synchronous=NORMAL")
                 self.cursor = self.connection.cursor()
+                # 连接在多个线程间共享 (图节点线程池、span后台写入线程)，读写都需要串行化
+                self._lock = threading.Lock()
                 logging.info(f"CoreMemory: Successfully connected to database at {db_path}")
                 self._initialize_db()
             except sqlite3.Error as e:
@@ -65,6 +84,35 @@ class CoreMemory:
                 error_message TEXT
             )
             ''')
+            # 旧数据库没有span_id列，按需补上，用于把调用记录关联到请求链路中的span
+            columns = {row["name"] for row in self.cursor.execute("PRAGMA table_info(agent_invocations)")}
+            if "span_id" not in columns:
+                self.cursor.execute("ALTER TABLE agent_invocations ADD COLUMN span_id TEXT")
+
+            # Table for request tracing spans (written in batches by hive.utils.tracing)
+            self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS spans (
+                span_id TEXT PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                parent_id TEXT,
+                name TEXT NOT NULL,
+                start_time REAL NOT NULL,
+                duration_ms REAL,
+                status TEXT NOT NULL,
+                attributes TEXT
+            )
+            ''')
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_spans_run_id ON spans (run_id)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_spans_start_time ON spans (start_time)")
+
+            # 增量导出的水位线：每个导出名称记录上次完整导出到的最大调用id
+            self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS export_watermarks (
+                name TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                updated_at TIMESTAMP NOT NULL
+            )
+            ''')
             self.connection.commit()
             logging.info("CoreMemory: Database tables initialized successfully.")
         except sqlite3.Error as e:
@@ -85,11 +133,11 @@ class CoreMemory:
         duration = int((end_time - start_time).total_seconds() * 1000)
         try:
             # 使用新的cursor避免递归问题
-            with self.connection:
+            with self._lock, self.connection:
                 cursor = self.connection.cursor()
                 cursor.execute('''
-                INSERT INTO agent_invocations (session_id, agent_name, input_data, output_data, status, start_time, end_time, duration_ms, error_message)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO agent_invocations (session_id, agent_name, input_data, output_data, status, start_time, end_time, duration_ms, error_message, span_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     session_id,
                     agent_name,
@@ -99,14 +147,187 @@ class CoreMemory:
                     start_time,
                     end_time,
                     duration,
-                    error_message
+                    error_message,
+                    current_span_id()
                 ))
-            self.connection.commit()
-            logging.info(f"Logged invocation for agent: {agent_name}")
-            return self.cursor.lastrowid
+            logging.info("Logged invocation for agent: %s", agent_name)
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            logging.error("Failed to log agent invocation for %s: %s", agent_name, e)
+            return None
+
+    def log_spans(self, rows):
+        """
+        Writes a batch of finished spans in a single transaction.
+        Each row is (span_id, run_id, parent_id, name, start_time, duration_ms, status, attributes_json).
+        """
+        try:
+            with self._lock, self.connection:
+                self.connection.executemany('''
+                INSERT OR REPLACE INTO spans (span_id, run_id, parent_id, name, start_time, duration_ms, status, attributes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+            return len(rows)
+        except sqlite3.Error as e:
+            logging.error("Failed to write %d spans: %s", len(rows), e)
+            return None
+
+    def prune_spans(self, before, limit):
+        """
+        Deletes at most `limit` spans that started before the given epoch timestamp.
+        Returns the number of deleted rows.
+        """
+        try:
+            with self._lock, self.connection:
+                cursor = self.connection.execute(
+                    "DELETE FROM spans WHERE rowid IN (SELECT rowid FROM spans WHERE start_time < ? LIMIT ?)",
+                    (before, limit)
+                )
+            return cursor.rowcount
         except sqlite3.Error as e:
-            logging.error(f"Failed to log agent invocation for {agent_name}: {e}")
+            logging.error("Failed to prune spans: %s", e)
+            return 0
+
+    def get_run_spans(self, run_id):
+        """Returns all spans recorded for a run, ordered by start time."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT * FROM spans WHERE run_id = ? ORDER BY start_time", (run_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_run_invocations(self, run_id):
+        """Returns the agent invocations logged under a run (session_id is the run id)."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT id, agent_name, status, start_time, duration_ms, error_message, span_id FROM agent_invocations WHERE session_id = ? ORDER BY id",
+                (run_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_export_watermark(self, name):
+        """Returns the last invocation id exported under the given watermark name (0 if never exported)."""
+        with self._lock:
+            row = self.connection.execute("SELECT last_id FROM export_watermarks WHERE name = ?", (name,)).fetchone()
+        return row["last_id"] if row else 0
+
+    def set_export_watermark(self, name, last_id):
+        with self._lock, self.connection:
+            self.connection.execute('''
+            INSERT INTO export_watermarks (name, last_id, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+            ''', (name, last_id, datetime.now()))
+
+    def _export_connection(self):
+        # 导出使用独立的只读连接，分页读取期间不占用共享连接的锁；内存数据库无法被第二个连接打开，只能共用
+        if self.db_path == ":memory:":
             return None
+        uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def iter_invocations(self, columns=None, since=None, until=None, agent=None, status=None,
+                         after_id=0, max_id=None, batch_size=None):
+        """
+        Streams agent_invocations rows as tuples in id order using keyset pagination
+        (WHERE id > last_id ORDER BY id LIMIT n), so memory stays constant regardless of table size.
+        since/until filter start_time (inclusive/exclusive, datetime or ISO string); agent and status
+        accept a single value or a list. Rows inserted after max_id are not returned.
+        """
+        columns = list(columns or DEFAULT_EXPORT_COLUMNS)
+        unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"未知的导出列: {', '.join(unknown)} (可选: {', '.join(EXPORT_COLUMNS)})")
+        if "id" not in columns:
+            columns.insert(0, "id")  # 分页依赖id，总是导出
+        id_index = columns.index("id")
+
+        conditions, params = ["id > ?"], []
+        for column, op, value in (("start_time", ">=", since), ("start_time", "<", until)):
+            if value:
+                value = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+                # 与sqlite3默认的datetime适配器写入的文本格式一致，可以直接按字符串比较
+                conditions.append(f"{column} {op} ?")
+                params.append(str(value))
+        for column, value in (("agent_name", agent), ("status", status)):
+            if value:
+                values = [value] if isinstance(value, str) else list(value)
+                if column == "status":
+                    values = [v.upper() for v in values]
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if max_id is not None:
+            conditions.append("id <= ?")
+            params.append(max_id)
+        # 列名都来自EXPORT_COLUMNS白名单，可以安全地拼接
+        sql = f"SELECT {', '.join(columns)} FROM agent_invocations WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?"
+        batch_size = batch_size or config.export_batch_size
+
+        def generate():
+            connection = self._export_connection()
+            last_id = after_id or 0
+            try:
+                while True:
+                    # 每一页是一次独立的短读事务，页与页之间不持有任何锁
+                    if connection is None:
+                        with self._lock:
+                            page = self.connection.execute(sql, [last_id, *params, batch_size]).fetchall()
+                    else:
+                        page = connection.execute(sql, [last_id, *params, batch_size]).fetchall()
+                    for row in page:
+                        yield tuple(row)
+                    if len(page) < batch_size:
+                        return
+                    last_id = page[-1][id_index]
+            finally:
+                if connection is not None:
+                    connection.close()
+
+        return columns, generate()
+
+    def export_invocations(self, fmt="ndjson", columns=None, since=None, until=None, agent=None, status=None,
+                           after_id=0, watermark=None, batch_size=None):
+        """
+        Exports agent_invocations as NDJSON or CSV text chunks (one chunk per page) for streaming responses.
+        With a watermark name the export starts after the id recorded by the previous export under that name,
+        and the watermark advances to the last exported id only once the export has been fully consumed.
+        Arguments are validated eagerly, so errors surface before the first chunk is produced.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt} (可选: {', '.join(EXPORT_FORMATS)})")
+        batch_size = batch_size or config.export_batch_size
+        start_id = max(after_id or 0, self.get_export_watermark(watermark) if watermark else 0)
+        # 固定本次导出的上界：导出期间新写入的记录留给下一次增量导出
+        with self._lock:
+            max_id = self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM agent_invocations").fetchone()[0]
+        columns, rows = self.iter_invocations(columns, since, until, agent, status, start_id, max_id, batch_size)
+
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            if fmt == "csv":
+                writer.writerow(columns)
+            exported = 0
+            for row in rows:
+                if fmt == "csv":
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str))
+                    buffer.write("\n")
+                exported += 1
+                if exported % batch_size == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+            # 上界以内满足条件的记录都已导出，水位线直接推进到上界
+            if watermark and max_id > start_id:
+                self.set_export_watermark(watermark, max_id)
+            logging.info("CoreMemory: Exported %d invocations (format=%s, ids %d..%d)", exported, fmt, start_id, max_id)
+
+        return generate()
 
 if __name__ == '__main__':
     # A simple self-test to verify functionality when run directly
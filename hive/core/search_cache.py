@@ -0,0 +1,85 @@
+# hive/core/search_cache.py
+
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from hive.utils.config import config
+from hive.utils.search_backends import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class SearchCache:
+    """
+    Seeker的磁盘搜索结果缓存 (v1.0)。
+    以 (后端, 结果数量, 归一化查询) 为键保存完整的搜索结果，
+    在新鲜度窗口 (SEARCH_CACHE_TTL 秒) 内的重复研究直接命中本地，不再访问搜索服务。
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(SearchCache, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, db_path: Optional[str] = None):
+        if hasattr(self, 'connection'):  # Prevent re-initialization
+            return
+        db_path = db_path or config.search_cache_path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS search_cache (
+                cache_key TEXT PRIMARY KEY,
+                backend TEXT NOT NULL,
+                query TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            ''')
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_created ON search_cache(created_at)")
+        logger.info("SearchCache: 缓存数据库已连接: %s", db_path)
+
+    @staticmethod
+    def make_key(backend: str, query: str, max_results: int) -> str:
+        raw = f"{backend}|{max_results}|{normalize_query(query)}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, backend: str, query: str, max_results: int, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """返回新鲜度窗口内的缓存结果；max_age默认取SEARCH_CACHE_TTL，<= 0 表示不使用缓存。"""
+        max_age = config.search_cache_ttl if max_age is None else max_age
+        if max_age <= 0:
+            return None
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT response, created_at FROM search_cache WHERE cache_key = ?",
+                (self.make_key(backend, query, max_results),)
+            ).fetchone()
+        if row is None or time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[0])
+
+    def put(self, backend: str, query: str, max_results: int, response: Any):
+        if config.search_cache_ttl <= 0:
+            return
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO search_cache (cache_key, backend, query, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                (self.make_key(backend, query, max_results), backend, query,
+                 json.dumps(response, ensure_ascii=False, default=str), time.time())
+            )
+
+    def purge_expired(self) -> int:
+        """删除超过新鲜度窗口的条目，返回删除的数量。"""
+        with self._lock, self.connection:
+            cursor = self.connection.execute("DELETE FROM search_cache WHERE created_at < ?",
+                                             (time.time() - config.search_cache_ttl,))
+        return cursor.rowcount
@@ -0,0 +1,256 @@
+# hive/core/workspace_index.py
+
+import os
+import sqlite3
+import stat
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from hive.utils.config import config
+
+logger = logging.getLogger(__name__)
+
+_BATCH_SIZE = 5000
+
+
+class WorkspaceIndex:
+    """
+    Steward的持久化工作区文件索引 (v1.0)。
+    使用os.scandir爬取目录树，将每个条目的路径、大小、修改时间和类型存入SQLite。
+    再次扫描时，目录自身mtime未变化的目录不会被重新列举（仅沿已索引的条目继续下探并刷新文件的大小与mtime），
+    因此对一个大型目录树的增量刷新只需要stat已知条目，而不必重新列举所有目录。
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(WorkspaceIndex, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, db_path: Optional[str] = None):
+        if hasattr(self, 'connection'):  # Prevent re-initialization
+            return
+        db_path = db_path or config.index_db_path
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._initialize_db()
+        logger.info("WorkspaceIndex: 索引数据库已连接: %s", db_path)
+
+    def _initialize_db(self):
+        with self.connection:
+            self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS fs_entries (
+                path TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                name TEXT NOT NULL,
+                is_dir INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL
+            )
+            ''')
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_fs_entries_parent ON fs_entries(parent)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_fs_entries_name ON fs_entries(name)")
+            self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS fs_scans (
+                root TEXT PRIMARY KEY,
+                scanned_at REAL NOT NULL
+            )
+            ''')
+
+    @staticmethod
+    def normalize_root(path: str) -> str:
+        return os.path.realpath(os.path.expanduser(path))
+
+    @staticmethod
+    def subtree_bounds(root: str):
+        """返回匹配root下所有后代路径的主键区间 ('/'的下一个字符是'0')。"""
+        prefix = root.rstrip(os.sep) + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def _delete_subtree(self, path: str):
+        low, high = self.subtree_bounds(path)
+        self.connection.execute("DELETE FROM fs_entries WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+
+    def refresh(self, root: str, force: bool = False) -> Dict[str, Any]:
+        """
+        增量刷新root下的索引。
+        若root在 config.index_rescan_interval 秒内已扫描过且未指定force，则直接跳过。
+        """
+        root = self.normalize_root(root)
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"目录不存在: {root}")
+
+        with self._lock:
+            row = self.connection.execute("SELECT scanned_at FROM fs_scans WHERE root = ?", (root,)).fetchone()
+            if not force and row and time.time() - row["scanned_at"] < config.index_rescan_interval:
+                return {"skipped": True, "scanned_dirs": 0, "reused_dirs": 0, "updated_entries": 0}
+            stats = self._scan(root, force)
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO fs_scans (root, scanned_at) VALUES (?, ?)", (root, time.time())
+                )
+        logger.info("WorkspaceIndex: 刷新 '%s' 完成: %s", root, stats)
+        return stats
+
+    def _scan(self, root: str, force: bool) -> Dict[str, Any]:
+        scanned_dirs = reused_dirs = updated = 0
+        pending: List[tuple] = []
+        pending_dirs: List[tuple] = []
+
+        def flush():
+            nonlocal pending, pending_dirs
+            if pending:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO fs_entries (path, parent, name, is_dir, size, mtime) VALUES (?, ?, ?, ?, ?, ?)",
+                    pending
+                )
+                pending = []
+            if pending_dirs:
+                self.connection.executemany(
+                    "INSERT INTO fs_entries (path, parent, name, is_dir, size, mtime) VALUES (?, ?, ?, 1, 0, -1) "
+                    "ON CONFLICT(path) DO UPDATE SET is_dir = 1, size = 0, "
+                    "mtime = CASE WHEN fs_entries.is_dir = 1 THEN fs_entries.mtime ELSE -1 END",
+                    pending_dirs
+                )
+                pending_dirs = []
+
+        root_stat = os.stat(root)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO fs_entries (path, parent, name, is_dir, size, mtime) VALUES (?, ?, ?, 1, 0, -1)",
+                (root, os.path.dirname(root), os.path.basename(root))
+            )
+            stack = [(root, root_stat.st_mtime)]
+            while stack:
+                dir_path, dir_mtime = stack.pop()
+                row = self.connection.execute("SELECT mtime FROM fs_entries WHERE path = ?", (dir_path,)).fetchone()
+
+                if not force and row and row["mtime"] == dir_mtime:
+                    # 目录条目集合未变化：沿已索引的子目录继续下探，检查它们自己的mtime。
+                    # 原地修改文件不会改变目录的mtime，因此文件条目逐个stat，刷新其大小与修改时间
+                    reused_dirs += 1
+                    children = self.connection.execute(
+                        "SELECT path, is_dir, size, mtime FROM fs_entries WHERE parent = ?", (dir_path,)
+                    ).fetchall()
+                    for child in children:
+                        try:
+                            st = os.stat(child["path"], follow_symlinks=False)
+                        except OSError:
+                            self._delete_subtree(child["path"])
+                            continue
+                        if child["is_dir"]:
+                            stack.append((child["path"], st.st_mtime))
+                        elif child["size"] != st.st_size or child["mtime"] != st.st_mtime:
+                            self.connection.execute(
+                                "UPDATE fs_entries SET size = ?, mtime = ? WHERE path = ?",
+                                (st.st_size, st.st_mtime, child["path"])
+                            )
+                            updated += 1
+                    continue
+
+                scanned_dirs += 1
+                seen = set()
+                try:
+                    with os.scandir(dir_path) as it:
+                        for entry in it:
+                            try:
+                                st = entry.stat(follow_symlinks=False)
+                            except OSError:
+                                continue
+                            is_dir = stat.S_ISDIR(st.st_mode)
+                            seen.add(entry.path)
+                            if is_dir:
+                                stack.append((entry.path, st.st_mtime))
+                                # 目录行的mtime在该目录被真正列举后才写入，保证中断后的扫描可以恢复
+                                pending_dirs.append((entry.path, dir_path, entry.name))
+                            else:
+                                pending.append((entry.path, dir_path, entry.name, 0, st.st_size, st.st_mtime))
+                            updated += 1
+                            if len(pending) + len(pending_dirs) >= _BATCH_SIZE:
+                                flush()
+                except OSError as e:
+                    logger.warning("WorkspaceIndex: 无法列举目录 '%s': %s", dir_path, e)
+                    continue
+
+                flush()
+                known = self.connection.execute("SELECT path FROM fs_entries WHERE parent = ?", (dir_path,)).fetchall()
+                for stale in (r["path"] for r in known if r["path"] not in seen):
+                    self._delete_subtree(stale)
+                self.connection.execute("UPDATE fs_entries SET mtime = ? WHERE path = ?", (dir_mtime, dir_path))
+
+        return {"skipped": False, "scanned_dirs": scanned_dirs, "reused_dirs": reused_dirs, "updated_entries": updated}
+
+    def list_files(self, root: str) -> List[str]:
+        """返回索引中root下的所有文件路径 (不含目录)。root应已规范化。"""
+        low, high = self.subtree_bounds(root)
+        with self._lock:
+            return [r["path"] for r in self.connection.execute(
+                "SELECT path FROM fs_entries WHERE path >= ? AND path < ? AND is_dir = 0", (low, high)
+            )]
+
+    def find(
+        self,
+        root: str,
+        pattern: Optional[str] = None,
+        file_type: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        modified_after: Optional[float] = None,
+        modified_before: Optional[float] = None,
+        limit: int = 200,
+    ) -> Dict[str, Any]:
+        """
+        直接从索引中回答查找请求。
+        pattern不含'/'时按文件名匹配glob；含'/'时按相对root的路径匹配（'**'可跨越多级目录）。
+        """
+        root = self.normalize_root(root)
+        low, high = self.subtree_bounds(root)
+        clauses = ["path >= ?", "path < ?"]
+        args: List[Any] = [low, high]
+
+        if pattern:
+            if "/" in pattern:
+                clauses.append("path GLOB ?")
+                args.append(low + pattern.lstrip("/").replace("**/", "*").replace("**", "*"))
+            else:
+                clauses.append("name GLOB ?")
+                args.append(pattern)
+        if file_type in ("file", "dir"):
+            clauses.append("is_dir = ?")
+            args.append(1 if file_type == "dir" else 0)
+        if min_size is not None:
+            clauses.append("size >= ?")
+            args.append(int(min_size))
+        if max_size is not None:
+            clauses.append("size <= ?")
+            args.append(int(max_size))
+        if modified_after is not None:
+            clauses.append("mtime >= ?")
+            args.append(float(modified_after))
+        if modified_before is not None:
+            clauses.append("mtime <= ?")
+            args.append(float(modified_before))
+
+        where = " AND ".join(clauses)
+        with self._lock:
+            total = self.connection.execute(f"SELECT COUNT(*) FROM fs_entries WHERE {where}", args).fetchone()[0]
+            rows = self.connection.execute(
+                f"SELECT path, is_dir, size, mtime FROM fs_entries WHERE {where} ORDER BY path LIMIT ?",
+                args + [int(limit)]
+            ).fetchall()
+
+        matches = [
+            {
+                "path": r["path"],
+                "type": "dir" if r["is_dir"] else "file",
+                "size": r["size"],
+                "mtime": None if r["mtime"] < 0 else time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(r["mtime"])),
+            }
+            for r in rows
+        ]
+        return {"root": root, "total_matched": total, "truncated": total > len(matches), "matches": matches}
@@ -1,13 +1,22 @@
 # hive/interaction/alpha_engine.py
 
+import re
 import json
+import math
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import threading
+from collections import deque
+from typing import Dict, Any, Iterator, List, Literal, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from langchain_deepseek import ChatDeepSeek
 from hive.utils.config import config
+from hive.utils.llm_factory import get_llm
 from hive.utils.datetime_util import get_current_timestamp
+from hive.utils import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -22,17 +31,186 @@ class ParsedIntent(BaseModel):
     thought: str = Field(..., description="AI模型的思考过程，解释决策原因。")
 
 
+class RouteIntent(BaseModel):
+    """轻量级模型对单条指令的分类结果。"""
+    single_step: bool = Field(..., description="该指令能否只调用一次工具就完整回答。需要多个步骤、对比、写文件或依赖上下文时为false。")
+    tool: Optional[Literal["seeker", "steward", "abacus"]] = Field(None, description="single_step为true时要调用的工具。")
+    parameters: Dict[str, Any] = Field(default_factory=dict, description="工具参数。seeker: {query}；abacus: {expression}；steward: {operation, path}。")
+    confidence: float = Field(0.0, description="0到1之间的置信度。")
+
+
+class RouteDecision(BaseModel):
+    """预路由的结论：fast表示直接调用tool并以模板或轻量级模型作答，nexus表示进入完整的Nexus循环。"""
+    route: Literal["fast", "nexus"]
+    tool: Optional[str] = None
+    args: Dict[str, Any] = Field(default_factory=dict)
+    confidence: float = 0.0
+    source: Literal["rule", "llm", "none"] = "none"
+    reason: str = ""
+
+
+# --- 规则分类 ---
+_MULTI_STEP = re.compile(r'(然后|接着|之后|并且|并把|再把|以及|同时|对比|比较|分别|保存|写入|总结|分析|and then|\bthen\b|;|；|\n)', re.I)
+_CALC = re.compile(r'^\s*(?:请|帮我)*\s*(?:计算|算一下|算算|求|calculate|compute|calc)\s*[:：]?\s*(?P<expr>.+?)\s*(?:=|等于多少|是多少)?\s*[?？]?\s*$', re.I)
+# 只接受Abacus能原样解析的字符：它只保留数字、+-*/()与万/亿单位，%、^、×、÷、全角括号等会被静默丢弃而算错
+_EXPRESSION = re.compile(r'^[\d\s.+\-*/(),万亿¥$￥]+$')
+_OPERATOR = re.compile(r'[\d万亿)]\s*(?:\*\*|[+\-*/])\s*[\d(]')
+# 没有计算动词时，只有"-"且两侧无空格的输入多半是日期、电话或编号，要求出现其他运算符或带空格的运算符
+_BARE_OPERATOR = re.compile(r'[+*/]|\s[+\-*/]\s')
+_DATE_OR_PHONE = re.compile(r'^\s*(?:\d{4}\s*[-/.]\s*\d{1,2}\s*[-/.]\s*\d{1,2}|\d{1,2}/\d{1,2}/\d{4}|\+?\d{2,4}(?:-\d{2,8}){2,})\s*$')
+_PATH = r'(?P<path>(?:~|\.{1,2}|[A-Za-z]:)?[/\\][^\s]*|~)'
+_FILE_OP = re.compile(r'^\s*(?:请|帮我)*\s*(?P<verb>列出|显示|查看|读取|打开|list|ls|read|cat|show|open)\s*(?:目录|文件夹|文件|directory|dir|file)?\s*[:：]?\s*'
+                      + _PATH + r'\s*(?:目录|文件夹|文件)?(?:下|中|里)?(?:的)?(?:所有)?(?:文件|内容|content)?\s*$', re.I)
+_SEARCH = re.compile(r'^\s*(?:请|帮我)*\s*(?:搜索|搜一下|查一下|search(?:\s+for)?|google)\s*[:：]?\s*(?P<query>.+?)\s*$', re.I)
+_READ_VERBS = {"读取", "打开", "read", "cat", "open"}
+
+
+def classify_by_rules(query: str) -> Optional[RouteDecision]:
+    """
+    用正则规则识别明确的单步任务 (计算、列目录、读文件、搜索)。
+    含有多步骤连接词的指令直接交给Nexus；没有规则命中时返回None，交给轻量级模型判断。
+    """
+    text = query.strip()
+    if not text:
+        return RouteDecision(route="nexus", reason="空指令")
+    if _MULTI_STEP.search(text):
+        return RouteDecision(route="nexus", source="rule", reason="指令包含多个步骤或需要综合分析")
+
+    match = _CALC.match(text)
+    expression = match.group("expr") if match else text
+    if _EXPRESSION.match(expression) and _OPERATOR.search(expression) and not _DATE_OR_PHONE.match(expression) \
+            and (match or _BARE_OPERATOR.search(expression)):
+        return RouteDecision(route="fast", tool="abacus", args={"expression": expression.strip()},
+                             confidence=0.98 if match else 0.9, source="rule", reason="纯数学表达式")
+
+    match = _FILE_OP.match(text)
+    if match:
+        path = match.group("path")
+        is_file = re.search(r'\.\w{1,8}$', path) is not None and not path.endswith(("/", "\\"))
+        if is_file or match.group("verb").lower() in _READ_VERBS:
+            return RouteDecision(route="fast", tool="steward", args={"operation": "read_file", "parameters": {"path": path}},
+                                 confidence=0.95, source="rule", reason="读取单个文件")
+        return RouteDecision(route="fast", tool="steward", args={"operation": "list_directory", "parameters": {"path": path}},
+                             confidence=0.95, source="rule", reason="列出目录")
+
+    match = _SEARCH.match(text)
+    if match and match.group("query"):
+        return RouteDecision(route="fast", tool="seeker", args={"query": match.group("query")},
+                             confidence=0.9, source="rule", reason="单次网络搜索")
+    return None
+
+
+def _intent_to_decision(intent: RouteIntent) -> RouteDecision:
+    params = intent.parameters or {}
+    if not intent.single_step or not intent.tool:
+        return RouteDecision(route="nexus", confidence=intent.confidence, source="llm", reason="轻量级模型判断为多步任务")
+    if intent.confidence < config.fast_path_min_confidence:
+        return RouteDecision(route="nexus", confidence=intent.confidence, source="llm", reason="轻量级模型置信度不足")
+    if intent.tool == "seeker" and params.get("query"):
+        args = {"query": str(params["query"])}
+    elif intent.tool == "abacus" and params.get("expression"):
+        args = {"expression": str(params["expression"])}
+    elif intent.tool == "steward" and params.get("operation") in ("list_directory", "read_file") and params.get("path"):
+        args = {"operation": params["operation"], "parameters": {"path": str(params["path"])}}
+    else:
+        return RouteDecision(route="nexus", confidence=intent.confidence, source="llm", reason="轻量级模型给出的参数不完整")
+    return RouteDecision(route="fast", tool=intent.tool, args=args, confidence=intent.confidence, source="llm", reason="轻量级模型判断为单步任务")
+
+
+# --- 命中率与节省的延迟 ---
+FAST_PATH_DECISIONS = metrics.registry.counter("hive_fast_path_decisions_total", "预路由的决策次数", ["route", "source"])
+FAST_PATH_FALLBACKS = metrics.registry.counter("hive_fast_path_fallbacks_total", "快速通道执行失败后回退到Nexus的次数", ["tool"])
+FAST_PATH_SAVED = metrics.registry.counter("hive_fast_path_latency_saved_seconds_total", "快速通道估算节省的重量级模型耗时")
+
+
+class FastPathStats:
+    """
+    记录预路由的命中率，以及按重量级模型每轮的滚动平均耗时估算的节省时间：
+    完整循环至少需要两轮重量级调用 (规划 + 作答)，快速通道用路由与作答的实际耗时替代它们。
+    """
+
+    def __init__(self, window: int = 50):
+        self._lock = threading.Lock()
+        self._heavy_rounds_ms: deque = deque(maxlen=window)
+        self.decisions: Dict[str, int] = {"fast": 0, "nexus": 0}
+        self.completed = 0
+        self.fallbacks = 0
+        self.saved_ms = 0.0
+
+    def record_decision(self, decision: RouteDecision):
+        FAST_PATH_DECISIONS.inc(route=decision.route, source=decision.source)
+        with self._lock:
+            self.decisions[decision.route] += 1
+
+    def record_heavy_round(self, elapsed_ms: float):
+        with self._lock:
+            self._heavy_rounds_ms.append(elapsed_ms)
+
+    def record_completion(self, fast_path_ms: float):
+        with self._lock:
+            self.completed += 1
+            if not self._heavy_rounds_ms:
+                return
+            saved = max(0.0, 2 * sum(self._heavy_rounds_ms) / len(self._heavy_rounds_ms) - fast_path_ms)
+            self.saved_ms += saved
+        FAST_PATH_SAVED.inc(saved / 1000)
+
+    def record_fallback(self, tool: str):
+        FAST_PATH_FALLBACKS.inc(tool=tool or "")
+        with self._lock:
+            self.fallbacks += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self.decisions.values())
+            heavy = list(self._heavy_rounds_ms)
+            return {
+                "decisions": dict(self.decisions),
+                "hit_rate": round(self.decisions["fast"] / total, 4) if total else 0.0,
+                "completed": self.completed,
+                "fallbacks": self.fallbacks,
+                "heavy_round_ms_avg": round(sum(heavy) / len(heavy), 1) if heavy else None,
+                "latency_saved_ms": round(self.saved_ms, 1),
+            }
+
+
+fast_path_stats = FastPathStats()
+
+
+class TemplateChatModel(BaseChatModel):
+    """
+    把已经渲染好的模板回答 (最后一条消息的内容) 以流式chunk的形式输出。
+    在图节点中调用它，前端就能像接收模型输出一样收到 on_chat_model_stream 事件。
+    """
+    chunk_size: int = 16
+
+    @property
+    def _llm_type(self) -> str:
+        return "hive-template"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=messages[-1].content))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        text = messages[-1].content
+        for i in range(0, len(text), self.chunk_size):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text[i:i + self.chunk_size]))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
 class AlphaEngine:
     def __init__(self):
-        if not config.deepseek_api_key:
-            raise ValueError("DeepSeek API Key未配置。")
-        self.llm = ChatDeepSeek(model="deepseek-chat", temperature=0, api_key=config.deepseek_api_key).with_structured_output(ParsedIntent)
-        # Prompt不再是静态的，而是在调用时动态构建
-    
+        # 模型在首次使用时才创建：预路由只需要轻量级层级，不要求配置DeepSeek
+        self._intent_llm = None
+        self._route_llm = None
+        self._route_llm_failed = False
+
     def _build_prompt(self) -> ChatPromptTemplate:
         # 注入时间上下文
         current_time = get_current_timestamp()
-        
+
         system_prompt = f"""你是一个顶级的AI任务规划师，在Hive操作系统中担任Alpha引擎。
 你的核心职责是：接收用户的自然语言指令，并将其转换成一个精确的、结构化的JSON任务对象。
 
@@ -62,14 +240,94 @@ class AlphaEngine:
         ])
 
     def parse_intent(self, user_query: str) -> ParsedIntent:
-        logging.info(f"AlphaEngine正在解析用户指令: '{user_query}'")
+        logger.info("AlphaEngine正在解析用户指令: '%s'", user_query)
+        if self._intent_llm is None:
+            if not config.llms["heavyweight"].get("api_key"):
+                raise ValueError("DeepSeek API Key未配置。")
+            # 通过LLM工厂获取模型，共享连接池、重试与响应缓存
+            self._intent_llm = get_llm(tier="heavyweight").with_structured_output(ParsedIntent)
         # 每次解析都重新构建prompt以获取最新时间
         prompt = self._build_prompt()
-        chain = prompt | self.llm
+        chain = prompt | self._intent_llm
         try:
             parsed_result = chain.invoke({"query": user_query})
-            logging.info(f"AlphaEngine解析成功。思考过程: {parsed_result.thought}")
+            logger.info("AlphaEngine解析成功。思考过程: %s", parsed_result.thought)
             return parsed_result
         except Exception as e:
-            logging.error(f"AlphaEngine在调用LLM时发生错误: {e}")
-            raise 
\ No newline at end of file
+            logger.error("AlphaEngine在调用LLM时发生错误: %s", e)
+            raise
+
+    def _route_chain(self):
+        if self._route_llm is None and not self._route_llm_failed:
+            try:
+                llm = get_llm(tier="lightweight").with_structured_output(RouteIntent)
+            except Exception as e:
+                # 部分本地模型不支持结构化输出，此时只使用规则分类
+                logger.warning("AlphaEngine: 轻量级模型不支持结构化输出，预路由只使用规则分类: %s", e)
+                self._route_llm_failed = True
+                return None
+            prompt = ChatPromptTemplate.from_messages([
+                ("system", "你是Hive的预路由器。判断用户指令能否只调用一次工具就完整回答。\n"
+                           "可用工具: seeker (网络搜索, 参数 query)；abacus (数学计算, 参数 expression)；"
+                           "steward (本地文件, 参数 operation 为 list_directory 或 read_file，以及 path)。\n"
+                           "需要多个步骤、比较、写文件、分析总结或依赖对话上下文的指令，single_step必须为false。"),
+                ("human", "{query}"),
+            ])
+            self._route_llm = prompt | llm
+        return self._route_llm
+
+    async def aroute(self, user_query: str, allow_llm: bool = True) -> RouteDecision:
+        """先用规则分类，规则无法确定时在超时限制内询问轻量级模型；任何失败都回退到Nexus。"""
+        decision = classify_by_rules(user_query)
+        if decision is None and allow_llm and config.fast_path_llm:
+            chain = self._route_chain()
+            if chain is not None:
+                try:
+                    intent = await asyncio.wait_for(chain.ainvoke({"query": user_query}), timeout=config.fast_path_llm_timeout)
+                    decision = _intent_to_decision(intent)
+                except Exception as e:
+                    logger.info("AlphaEngine: 轻量级模型预路由失败，交给Nexus处理: %s", e)
+        if decision is None:
+            decision = RouteDecision(route="nexus", reason="没有可确定的单步任务")
+        fast_path_stats.record_decision(decision)
+        logger.info("AlphaEngine预路由: %s (来源=%s, 工具=%s, 置信度=%.2f, %s)",
+                    decision.route, decision.source, decision.tool, decision.confidence, decision.reason)
+        return decision
+
+
+def _format_number(value: Any) -> str:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e16:
+        return f"{int(value):,}"
+    if isinstance(value, float):
+        return f"{value:,.6g}" if abs(value) >= 1e16 or abs(value) < 1e-4 else f"{value:,.6f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def render_template_answer(tool: str, args: Dict[str, Any], tool_output: str) -> Optional[str]:
+    """
+    为能直接模板化的工具结果生成回答 (计算、列目录、读文件)。
+    结果无法解析或包含错误时返回None，由调用方回退到Nexus。
+    """
+    try:
+        data = json.loads(tool_output)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or "error" in data:
+        return None
+    if tool == "abacus" and "result" in data:
+        result = data["result"]
+        # inf/nan (如除以零) 不能作为回答直接返回
+        if isinstance(result, bool) or not isinstance(result, (int, float)) or not math.isfinite(result):
+            return None
+        return f"{args.get('expression', '')} = {_format_number(data['result'])}"
+    params = args.get("parameters") or {}
+    if tool == "steward" and "directory_listing" in data:
+        entries = sorted(data["directory_listing"])
+        shown = "\n".join(f"- {name}" for name in entries[:100])
+        more = f"\n... 以及另外 {len(entries) - 100} 项" if len(entries) > 100 else ""
+        return f"目录 `{params.get('path')}` 下共有 {len(entries)} 项：\n{shown}{more}" if entries else f"目录 `{params.get('path')}` 是空的。"
+    if tool == "steward" and "file_content" in data:
+        return f"文件 `{params.get('path')}` 的内容如下：\n\n{data['file_content']}"
+    return None
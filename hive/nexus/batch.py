@@ -0,0 +1,253 @@
+# hive/nexus/batch.py
+
+import os
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from hive.utils import tracing
+from hive.utils.config import config
+from hive.utils.llm_factory import get_llm_stats
+
+logger = logging.getLogger(__name__)
+
+# 续跑时跳过的状态；失败的条目默认也跳过，指定retry_failed时重新执行
+_DONE_STATUSES = ("ok",)
+_FAILED_STATUSES = ("error", "timeout", "invalid")
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def load_checkpoint(output_path: str, retry_failed: bool = False) -> Set[str]:
+    """
+    输出文件本身就是检查点：读取已写入的结果，返回可以跳过的条目id。
+    进程中途被杀时最后一行可能不完整，这里把它截掉，避免续跑后产生损坏的JSON行。
+    """
+    if not os.path.exists(output_path):
+        return set()
+    done: Set[str] = set()
+    skip = _DONE_STATUSES if retry_failed else _DONE_STATUSES + _FAILED_STATUSES
+    valid_bytes = 0
+    with open(output_path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            valid_bytes += len(raw)
+            # 重复id的占位记录不代表该id已经执行过
+            if record.get("duplicate"):
+                continue
+            if record.get("status") in skip:
+                done.add(str(record.get("id")))
+    if valid_bytes < os.path.getsize(output_path):
+        logger.warning("输出文件 %s 末尾有不完整的记录，已截断到 %d 字节", output_path, valid_bytes)
+        with open(output_path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return done
+
+
+def iter_items(input_path: str) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    逐行读取输入JSONL，产出 (条目id, 条目, 错误)。每行是 {"id": ..., "query": "..."}，
+    或带完整对话的 {"id": ..., "messages": [...]}；可选 "mode" 与 "timeout"。没有id时使用行号。
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield f"line-{lineno}", None, f"第 {lineno} 行不是合法的JSON: {e}"
+                continue
+            if isinstance(item, str):
+                item = {"query": item}
+            if not isinstance(item, dict):
+                yield f"line-{lineno}", None, f"第 {lineno} 行必须是JSON对象或字符串，实际为 {type(item).__name__}。"
+                continue
+            item_id = str(item["id"]) if item.get("id") is not None else f"line-{lineno}"
+            if not item.get("query") and not item.get("messages"):
+                yield item_id, None, "条目需要 'query' 或 'messages' 字段。"
+                continue
+            yield item_id, item, None
+
+
+class BatchRunner:
+    """
+    离线批量执行Nexus图：有界并发、每个条目独立的截止时间，结果在完成时立即追加写入输出JSONL。
+    所有条目在同一个进程中运行，共享LLM客户端的连接池、响应缓存与搜索缓存。
+    """
+
+    def __init__(self, input_path: str, output_path: str, concurrency: int = 4, timeout: float = 300.0,
+                 mode: Optional[str] = None, retry_failed: bool = False, include_messages: bool = False,
+                 limit: Optional[int] = None):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.mode = (mode or config.nexus_mode).lower()
+        self.retry_failed = retry_failed
+        self.include_messages = include_messages
+        self.limit = limit
+        self.counts: Dict[str, int] = {"ok": 0, "error": 0, "timeout": 0, "invalid": 0, "skipped": 0}
+        self.latencies_ms: List[float] = []
+        self.total = 0
+        self._finished = 0
+        self._output = None
+
+    @staticmethod
+    def _graph(mode: str):
+        # 延迟导入：两张图在导入时编译，只在真正执行时才需要
+        if mode == "plan":
+            from hive.nexus.planner import plan_graph
+            return plan_graph
+        from hive.nexus.executor import nexus_graph
+        return nexus_graph
+
+    def _write(self, record: Dict[str, Any]):
+        self._output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._output.flush()
+        self._finished += 1
+        status = record["status"]
+        self.counts[status] = self.counts.get(status, 0) + 1
+        detail = f"{record.get('duration_ms', 0) / 1000:.1f}s" if status != "invalid" else record.get("error", "")
+        print(f"[{self._finished}/{self.total}] {status:<7} id={record['id']} {detail}", flush=True)
+
+    async def _run_item(self, item_id: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        mode = (item.get("mode") or self.mode).lower()
+        timeout = float(item.get("timeout") or self.timeout)
+        messages = item.get("messages") or [("human", item["query"])]
+        # 每个条目在独立的任务中执行，拥有自己的run id与根span，可以通过 /runs/{run_id}/spans 查看链路
+        root_span = tracing.start_run("batch_item", item_id=item_id, mode=mode)
+        run_id = tracing.current_run_id()
+        record: Dict[str, Any] = {"id": item_id, "run_id": run_id, "mode": mode}
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._graph(mode).ainvoke({"messages": messages}), timeout=timeout)
+            final = result["messages"][-1]
+            record.update({
+                "status": "ok",
+                "answer": final.content if isinstance(final, AIMessage) else str(getattr(final, "content", final)),
+                "tool_calls": sum(1 for m in result["messages"] if isinstance(m, ToolMessage)),
+            })
+            if self.include_messages:
+                record["messages"] = [m.model_dump(mode="json") for m in result["messages"] if hasattr(m, "model_dump")]
+        except asyncio.TimeoutError:
+            record.update({"status": "timeout", "error": f"超过截止时间 {timeout:g} 秒"})
+        except Exception as e:
+            logger.error("批量条目 %s 执行失败", item_id, exc_info=True)
+            record.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            root_span.end(status="ok" if record.get("status") == "ok" else "error")
+        record["duration_ms"] = round(elapsed, 1)
+        record["completed_at"] = datetime.now().isoformat(timespec="seconds")
+        return record
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            entry = await queue.get()
+            try:
+                if entry is None:
+                    return
+                item_id, item = entry
+                record = await asyncio.create_task(self._run_item(item_id, item))
+                self.latencies_ms.append(record["duration_ms"])
+                self._write(record)
+            finally:
+                queue.task_done()
+
+    async def run(self) -> Dict[str, Any]:
+        done = load_checkpoint(self.output_path, self.retry_failed)
+        # 按条目在输入中的序号选择，同一个id出现多次时后面的条目记为invalid，而不是静默丢弃
+        pending: List[int] = []
+        duplicates: Set[int] = set()
+        seen: Set[str] = set()
+        for index, (item_id, item, error) in enumerate(iter_items(self.input_path)):
+            if item_id in done:
+                self.counts["skipped"] += 1
+                continue
+            if item_id in seen:
+                duplicates.add(index)
+            seen.add(item_id)
+            pending.append(index)
+        if self.limit is not None:
+            pending = pending[:self.limit]
+        self.total = len(pending)
+        selected = set(pending)
+        print(f"批量任务: {self.total} 个待执行，{self.counts['skipped']} 个已在 {self.output_path} 中完成 "
+              f"(mode={self.mode}, 并发={self.concurrency}, 截止时间={self.timeout:g}s)", flush=True)
+
+        started = time.perf_counter()
+        # 队列有界，输入文件边读边执行，条目数量再多内存占用也保持不变
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        with open(self.output_path, "a", encoding="utf-8") as self._output:
+            workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+            try:
+                for index, (item_id, item, error) in enumerate(iter_items(self.input_path)):
+                    if index not in selected:
+                        continue
+                    if index in duplicates:
+                        self._write({"id": item_id, "status": "invalid", "duplicate": True,
+                                     "error": "重复的id，与前面的条目冲突，未执行。",
+                                     "completed_at": datetime.now().isoformat(timespec="seconds")})
+                        continue
+                    if error:
+                        self._write({"id": item_id, "status": "invalid", "error": error,
+                                     "completed_at": datetime.now().isoformat(timespec="seconds")})
+                        continue
+                    await queue.put((item_id, item))
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                tracing.recorder.flush()
+        return self.summary(time.perf_counter() - started)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        executed = len(self.latencies_ms)
+        return {
+            "input": self.input_path,
+            "output": self.output_path,
+            "mode": self.mode,
+            "concurrency": self.concurrency,
+            "counts": self.counts,
+            "wall_time_s": round(elapsed, 2),
+            "items_per_min": round(executed / elapsed * 60, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": round(_percentile(self.latencies_ms, 0.5), 1),
+                "p95": round(_percentile(self.latencies_ms, 0.95), 1),
+                "max": round(max(self.latencies_ms, default=0.0), 1),
+            },
+            "llm": get_llm_stats(),
+        }
+
+
+def print_summary(summary: Dict[str, Any]):
+    counts = summary["counts"]
+    latency = summary["latency_ms"]
+    print("\n" + "=" * 60)
+    print(f"批量任务完成: 成功 {counts['ok']}，失败 {counts['error']}，超时 {counts['timeout']}，"
+          f"无效 {counts['invalid']}，跳过 (已完成) {counts['skipped']}")
+    print(f"总耗时 {summary['wall_time_s']}s，吞吐 {summary['items_per_min']} 条/分钟 (并发 {summary['concurrency']})")
+    print(f"单条耗时 p50={latency['p50']}ms  p95={latency['p95']}ms  max={latency['max']}ms")
+    cache = summary["llm"].get("response_cache")
+    if cache:
+        print(f"LLM响应缓存: {json.dumps(cache, ensure_ascii=False)}")
+    print(f"结果文件: {summary['output']}")
+    print("=" * 60)
@@ -2,17 +2,30 @@
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import tool
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, convert_to_messages
+from langchain_core.runnables.config import var_child_runnable_config
 from langgraph.graph import StateGraph, END
+from langgraph.graph.message import add_messages
+import json
+import time
+import uuid
 import logging
-from typing import Annotated, Sequence, TypedDict, Dict, Any
+import asyncio
+import threading
+import functools
+from collections import deque
+from typing import Annotated, Sequence, TypedDict, Dict, Any, List, Optional, Tuple
 
 from hive.agents.file_system_agent import FileSystemAgent
 from hive.agents.web_search_agent import WebSearchAgent
 from hive.agents.calculator_agent import CalculatorAgent
 from hive.agents.get_agent import GetAgent
 from hive.core.memory import CoreMemory
+from hive.interaction.alpha_engine import AlphaEngine, TemplateChatModel, fast_path_stats, render_template_answer
 from hive.utils.llm_factory import get_llm
+from hive.utils.extractive import extract_summary
+from hive.utils.cassette import recorded_tool
+from hive.utils import metrics, tracing
 # --- 【核心修改】: 导入我们的中央配置 ---
 from hive.utils.config import config
 # ------------------------------------
@@ -25,35 +38,50 @@ fs_agent = FileSystemAgent(memory)
 web_agent = WebSearchAgent(memory)
 calc_agent = CalculatorAgent(memory)
 get_agent = GetAgent(memory)
+alpha_engine = AlphaEngine()
+template_model = TemplateChatModel()
 
 @tool
-def seeker(query: str) -> str:
-    """网络研究员: 使用Tavily搜索引擎直接研究和回答问题。能直接返回对问题的简洁回答或摘要，非常适合需要实时信息的问题。"""
-    return web_agent.invoke(query=query)
+@recorded_tool("seeker")
+def seeker(query: str = "", queries: Optional[List[str]] = None) -> str:
+    """网络研究员: 使用Tavily搜索引擎直接研究和回答问题。能直接返回对问题的简洁回答或摘要，非常适合需要实时信息的问题。需要对比研究多个问题时，请通过 queries 列表一次性提交，它们会被并发搜索并去除重复网页。"""
+    return web_agent.invoke(query=query, queries=queries)
 
 @tool
+@recorded_tool("steward")
 def steward(operation: str, parameters: dict) -> str:
-    """文件管家: 用于在本地计算机上进行文件操作（读、写、列出目录）。"""
+    """文件管家: 用于在本地计算机上进行文件操作（读、写、列出目录），以及通过工作区索引在整个目录树中按模式、大小、修改时间快速查找文件 (find)、按关键词全文检索文件内容 (search_content)。需要处理多个文件时，请使用 read_files / write_files 在一次调用中批量完成；修改已有文件时请使用 append_file / patch_file，而不是重写整个文件。"""
     return fs_agent.invoke(operation=operation, parameters=parameters)
 
 @tool
-def abacus(expression: str) -> str:
-    """计算专家: 用于执行精确的数学计算，能自动处理'万'、'亿'等单位。"""
-    return calc_agent.invoke(expression=expression)
+@recorded_tool("abacus")
+def abacus(expression: str = "", expressions: Optional[List[str]] = None, dataset: Optional[Dict[str, Any]] = None) -> str:
+    """计算专家: 用于执行精确的数学计算，能自动处理'万'、'亿'等单位。需要计算多个表达式时（如对比多家公司的数据），请通过 expressions 列表一次性提交。
+    需要对本地CSV/TSV表格做统计时，请使用 dataset={"path": ..., "aggregates": [{"op": "sum|mean|min|max|count", "expr": "列或表达式"}], "columns": {派生列}, "filter": "条件", "group_by": "列名"}，不要先用steward读取整个文件。"""
+    return calc_agent.invoke(expression=expression, expressions=expressions, dataset=dataset)
 
 @tool
-def get(text_to_process: str, extraction_schema: Dict[str, Any]) -> str:
-    """信息提取专家: 从一段文本中，根据一个JSON Schema定义，提取出结构化的JSON数据。非常适合从Seeker返回的冗长文本中提取关键信息。"""
-    return get_agent.invoke(text_to_process=text_to_process, extraction_schema=extraction_schema)
+@recorded_tool("get")
+def get(extraction_schema: Dict[str, Any], text_to_process: str = "", texts: Optional[List[str]] = None,
+        file_paths: Optional[List[str]] = None, as_table: bool = False) -> str:
+    """信息提取专家: 从一段文本中，根据一个JSON Schema定义，提取出结构化的JSON数据。非常适合从Seeker返回的冗长文本中提取关键信息。需要对多段文本（texts）或多个本地文件（file_paths）按同一个Schema提取时，请一次性批量提交，可用 as_table 获得表格形式的结果。"""
+    return get_agent.invoke(text_to_process=text_to_process, extraction_schema=extraction_schema,
+                            texts=texts, file_paths=file_paths, as_table=as_table)
 
 tools = [seeker, steward, abacus, get]
 
-# 动态Prompt构建函数 (无变动)
-def build_nexus_prompt() -> ChatPromptTemplate:
+def build_tool_catalog() -> str:
+    """工具目录的XML片段，供Nexus与Planner的系统提示词共用。"""
     tool_catalog_parts = []
     for t in tools:
-        tool_catalog_parts.append(f"<tool><name>{t.name}</name><description>{t.description}</description></tool>")
-    tool_catalog = "\n".join(tool_catalog_parts)
+        # 工具描述中可能包含JSON示例，需要转义花括号，避免被提示词模板当作变量
+        description = t.description.replace("{", "{{").replace("}", "}}")
+        tool_catalog_parts.append(f"<tool><name>{t.name}</name><description>{description}</description></tool>")
+    return "\n".join(tool_catalog_parts)
+
+# 动态Prompt构建函数 (无变动)
+def build_nexus_prompt() -> ChatPromptTemplate:
+    tool_catalog = build_tool_catalog()
 
     prompt_template = f"""<mission_directive>
 你的唯一、最终、不可逾越的核心使命是：生成一段面向用户的、有帮助的文本回复。工具调用只是你为了达成此目标而使用的中间过程，而不是目标本身。
@@ -79,82 +107,251 @@ def build_nexus_prompt() -> ChatPromptTemplate:
 
 # Graph状态定义 (无变动)
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[HumanMessage | AIMessage | ToolMessage], lambda x, y: x + y]
+    # add_messages按消息id合并：带已有id的消息替换原消息 (reflect_node用精炼后的内容替换超长的工具输出)
+    messages: Annotated[Sequence[HumanMessage | AIMessage | ToolMessage], add_messages]
+    # AlphaEngine预路由的结论；为None时走完整的Nexus循环
+    route: Optional[Dict[str, Any]]
+
+# 快速通道中搜索结果的作答提示词 (由轻量级模型完成)
+FAST_ANSWER_PROMPT = ChatPromptTemplate.from_template(
+    "请根据以下搜索结果，简洁、准确地回答用户的问题。如果搜索结果不足以回答，请如实说明。\n\n"
+    "用户问题: '{query}'\n\n搜索结果:\n---\n{tool_output}\n---"
+)
 
 # 核心节点定义
+async def route_node(state: AgentState):
+    """
+    图的入口：用AlphaEngine对最新的用户指令做预路由。明确的单步任务直接生成一次工具调用，
+    交给execute_tools执行，之后由agent_node用模板或轻量级模型作答，完全跳过重量级模型。
+    """
+    messages = convert_to_messages(state["messages"])
+    last_message = messages[-1] if messages else None
+    if not config.fast_path_enabled or not isinstance(last_message, HumanMessage):
+        return {"route": None}
+    started = time.perf_counter()
+    # 只有全新的对话才询问轻量级模型，带历史的追问往往依赖上下文，交给Nexus更稳妥
+    first_turn = not any(isinstance(m, AIMessage) for m in messages)
+    decision = await alpha_engine.aroute(str(last_message.content), allow_llm=first_turn)
+    if decision.route != "fast":
+        return {"route": None}
+    tool_call = {"name": decision.tool, "args": decision.args, "id": f"fast_path_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+    route = {**decision.model_dump(), "tool_call_id": tool_call["id"], "query": str(last_message.content),
+             "route_ms": (time.perf_counter() - started) * 1000}
+    return {"messages": [AIMessage(content="", tool_calls=[tool_call])], "route": route}
+
+def fast_path_router(state: AgentState):
+    last_message = state["messages"][-1]
+    if state.get("route") and isinstance(last_message, AIMessage) and last_message.tool_calls:
+        return "execute_tools"
+    return "agent"
+
+async def fast_path_answer(state: AgentState, route: Dict[str, Any]) -> Optional[AIMessage]:
+    """根据快速通道的工具结果作答；结果缺失、出错或无法作答时返回None，由重量级模型接手。"""
+    started = time.perf_counter()
+    tool_message = next((m for m in reversed(state["messages"])
+                         if isinstance(m, ToolMessage) and m.tool_call_id == route["tool_call_id"]), None)
+    if tool_message is None:
+        return None
+    tool_output = str(tool_message.content)
+    try:
+        answer = render_template_answer(route["tool"], route["args"], tool_output)
+        if answer is not None:
+            response = await template_model.ainvoke([AIMessage(content=answer)])
+        elif route["tool"] == "seeker" and not tool_output_failed(tool_output):
+            chain = FAST_ANSWER_PROMPT | get_llm(tier="lightweight")
+            response = await chain.ainvoke({"query": route["query"], "tool_output": tool_output[:config.reflector_max_text_length]})
+        else:
+            return None
+    except Exception:
+        logger.warning("快速通道作答失败，交给Nexus处理", exc_info=True)
+        return None
+    fast_path_stats.record_completion(route["route_ms"] + (time.perf_counter() - started) * 1000)
+    return response
+
 async def agent_node(state: AgentState):
+    route = state.get("route")
+    if route and route.get("route") == "fast":
+        response = await fast_path_answer(state, route)
+        if response is not None:
+            return {"messages": [response], "route": None}
+        fast_path_stats.record_fallback(route.get("tool"))
+        logger.info("快速通道 (%s) 未能直接作答，回退到Nexus循环", route.get("tool"))
+
+    started = time.perf_counter()
     prompt = build_nexus_prompt()
     llm = get_llm(tier="heavyweight")
     llm_with_tools = llm.bind_tools(tools)
     chain = prompt | llm_with_tools
     response = await chain.ainvoke({"messages": state["messages"]})
-    return {"messages": [response]}
+    fast_path_stats.record_heavy_round((time.perf_counter() - started) * 1000)
+    return {"messages": [response], "route": None}
+
+def run_tool_call(tool_name: str, tool_args: Dict[str, Any], tool_id: Optional[str]) -> Tuple[str, str]:
+    """执行单个工具调用，记录追踪span与耗时指标，返回 (输出文本, success|error)。工具抛出的异常被转换为错误文本。"""
+    selected_tool = next((t for t in tools if t.name == tool_name), None)
+    if not selected_tool:
+        return f"错误: 未找到名为 '{tool_name}' 的工具。", "error"
+    started = time.perf_counter()
+    with tracing.span(f"tool:{tool_name}", tool=tool_name, tool_call_id=tool_id) as tool_span:
+        try:
+            output = selected_tool.invoke(tool_args)
+            status = "success"
+        except Exception as e:
+            logger.error("工具执行失败! 工具: %s, 参数: %s", tool_name, tool_args, exc_info=True)
+            output = f"执行工具 {tool_name} 时发生错误: {e}"
+            status = "error"
+            tool_span.set_attribute("error", str(e))
+        tool_span.status = "ok" if status == "success" else "error"
+        tool_span.set_attribute("output_chars", len(str(output)))
+    metrics.TOOL_DURATION.observe(time.perf_counter() - started, tool=tool_name, status=status)
+    return str(output), status
 
-def execute_tools_node(state: AgentState):
+def tool_output_failed(output: str) -> bool:
+    """工具是否报告了失败：执行时抛出异常，或Agent返回了顶层带error字段的JSON。"""
+    if output.startswith(("执行工具 ", "错误: 未找到名为")):
+        return True
+    try:
+        data = json.loads(output)
+    except (ValueError, TypeError):
+        return False
+    return isinstance(data, dict) and bool(data.get("error"))
+
+async def arun_tool_call(tool_name: str, tool_args: Dict[str, Any], tool_id: Optional[str],
+                         semaphore: Optional[asyncio.Semaphore] = None) -> Tuple[str, str]:
+    """在线程池中执行工具调用 (Agent都是同步实现)，上下文变量随之复制，span仍挂在当前节点下。"""
+    if semaphore is None:
+        return await asyncio.to_thread(run_tool_call, tool_name, tool_args, tool_id)
+    async with semaphore:
+        return await asyncio.to_thread(run_tool_call, tool_name, tool_args, tool_id)
+
+async def execute_tools_node(state: AgentState):
     last_message = state["messages"][-1]
     if not isinstance(last_message, AIMessage) or not last_message.tool_calls:
         return {"messages": []}
     tool_calls = last_message.tool_calls
-    tool_messages = []
-    for tool_call in tool_calls:
-        tool_name = tool_call.get("name")
-        tool_args = tool_call.get("args", {})
-        tool_id = tool_call.get("id")
-        selected_tool = next((t for t in tools if t.name == tool_name), None)
-        if not selected_tool:
-            output = f"错误: 未找到名为 '{tool_name}' 的工具。"
-        else:
-            try:
-                output = selected_tool.invoke(**tool_args)
-            except Exception as e:
-                logger.error(f"工具执行失败! 工具: {tool_name}, 参数: {tool_args}", exc_info=True)
-                output = f"执行工具 {tool_name} 时发生错误: {e}"
-        tool_messages.append(ToolMessage(content=str(output), tool_call_id=tool_id))
-    return {"messages": tool_messages}
+    # 同一轮中的工具调用互不依赖，并发执行；ToolMessage保持与tool_calls相同的顺序
+    semaphore = asyncio.Semaphore(max(1, config.tool_max_concurrency))
+    results = await asyncio.gather(*(arun_tool_call(tc.get("name"), tc.get("args", {}), tc.get("id"), semaphore)
+                                     for tc in tool_calls))
+    return {"messages": [ToolMessage(content=output, tool_call_id=tc.get("id"))
+                         for tc, (output, _) in zip(tool_calls, results)]}
+
+SUMMARIZATION_PROMPT = ChatPromptTemplate.from_template(
+    "你是一个数据分析助理。你的任务是阅读一段长文本，并根据用户的原始问题，提取出最核心、最相关的信息。"
+    "你的输出必须简洁、只包含关键数据点，并忽略所有无关内容。\n\n"
+    "原始问题: '{query}'\n\n"
+    "请总结以下长文本:\n\n---\n{long_text}\n---"
+)
+
+class ReflectorPolicy:
+    """
+    决定超长工具输出的精炼方式。REFLECTOR_MODE为auto时：轻量级模型近期的平均延迟超过上限就只做抽取式摘要，
+    否则只有足够长的输出 (REFLECTOR_HYBRID_MIN_CHARS) 才在抽取之后再交给模型总结。
+    判定为过慢后每隔probe_every次仍会让一次大输出走模型，以便在模型恢复后重新启用。
+    """
+
+    def __init__(self, window: int = 20, probe_every: int = 20):
+        self._lock = threading.Lock()
+        self._llm_ms: deque = deque(maxlen=window)
+        self._probe_every = probe_every
+        self._skipped = 0
+        self.decisions: Dict[str, int] = {"extractive": 0, "llm": 0, "hybrid": 0}
+
+    def llm_latency_ms(self) -> Optional[float]:
+        with self._lock:
+            return sum(self._llm_ms) / len(self._llm_ms) if self._llm_ms else None
+
+    def record_llm(self, elapsed_ms: float):
+        with self._lock:
+            self._llm_ms.append(elapsed_ms)
+
+    def choose(self, length: int) -> str:
+        mode = config.reflector_mode if config.reflector_mode in self.decisions else "auto"
+        if mode == "auto":
+            mode = "extractive"
+            if length >= config.reflector_hybrid_min_chars:
+                latency = self.llm_latency_ms()
+                with self._lock:
+                    if latency is None or latency <= config.reflector_llm_max_latency_ms:
+                        mode = "hybrid"
+                    else:
+                        self._skipped += 1
+                        if self._skipped >= self._probe_every:
+                            self._skipped = 0
+                            mode = "hybrid"
+        with self._lock:
+            self.decisions[mode] += 1
+        return mode
+
+    def snapshot(self) -> Dict[str, Any]:
+        latency = self.llm_latency_ms()
+        with self._lock:
+            return {"mode": config.reflector_mode, "decisions": dict(self.decisions),
+                    "llm_latency_ms": round(latency, 1) if latency is not None else None}
+
+reflector_policy = ReflectorPolicy()
+
+def _reflection_query(state: AgentState, tool_call_id: str) -> str:
+    """找到产生该工具输出的调用，用它的查询参数作为相关度的依据；没有时使用最近一条用户消息。"""
+    for msg in reversed(state["messages"]):
+        if isinstance(msg, AIMessage) and msg.tool_calls:
+            tool_call = next((tc for tc in msg.tool_calls if tc.get("id") == tool_call_id), None)
+            if tool_call:
+                args = tool_call.get("args", {})
+                query = args.get("query") or " ".join(args.get("queries") or [])
+                if query:
+                    return query
+                break
+    human = next((m for m in reversed(convert_to_messages(state["messages"])) if isinstance(m, HumanMessage)), None)
+    return str(human.content) if human else ""
+
+async def reflect_tool_output(tool_output: str, query: str) -> Tuple[str, str]:
+    """按策略精炼一段超长工具输出，返回 (精炼后的文本, 实际使用的方式)。模型总结失败时退回抽取式摘要。"""
+    mode = reflector_policy.choose(len(tool_output))
+    started = time.perf_counter()
+    extract = None
+    if mode != "llm":
+        extract = extract_summary(tool_output, query, config.reflector_token_budget)
+        if mode == "extractive":
+            metrics.REFLECTOR_DURATION.observe(time.perf_counter() - started, mode=mode, status="success")
+            return extract, mode
+    llm_started = time.perf_counter()
+    chain = SUMMARIZATION_PROMPT | get_llm(tier="lightweight")
+    try:
+        response = await chain.ainvoke({
+            "query": query or "用户原始请求",
+            "long_text": extract if extract is not None else tool_output[:config.reflector_max_text_length] + "...",
+        })
+        reflector_policy.record_llm((time.perf_counter() - llm_started) * 1000)
+        metrics.REFLECTOR_DURATION.observe(time.perf_counter() - started, mode=mode, status="success")
+        return response.content, mode
+    except Exception:
+        reflector_policy.record_llm((time.perf_counter() - llm_started) * 1000)
+        metrics.REFLECTOR_DURATION.observe(time.perf_counter() - started, mode=mode, status="error")
+        logger.error("模型精炼失败，改用抽取式摘要", exc_info=True)
+        if extract is None:
+            extract = extract_summary(tool_output, query, config.reflector_token_budget)
+        return extract, "extractive"
 
 async def reflect_node(state: AgentState):
-    # --- 【核心修改】: 移除硬编码，使用config中的配置 ---
-    last_message = state["messages"][-1]
-    if not isinstance(last_message, ToolMessage):
+    """精炼最近一轮工具调用中的超长输出，用精炼后的ToolMessage (相同id) 替换原消息。"""
+    recent: List[ToolMessage] = []
+    for msg in reversed(state["messages"]):
+        if not isinstance(msg, ToolMessage):
+            break
+        recent.append(msg)
+    oversized = [m for m in reversed(recent) if len(str(m.content)) > config.reflector_max_text_length]
+    if not oversized:
         return {"messages": []}
-    
-    tool_output = last_message.content
-    # 从中央配置读取阈值
-    if len(tool_output) > config.reflector_max_text_length:
-        logger.warning(f"检测到超长工具输出 ({len(tool_output)} chars)，超过阈值 {config.reflector_max_text_length}，启动信息精炼流程...")
-        # ---------------------------------------------------
-        tool_call_id = last_message.tool_call_id
-        ai_message_with_call = next((msg for msg in reversed(state["messages"]) if isinstance(msg, AIMessage) and msg.tool_calls and any(tc.get("id") == tool_call_id for tc in msg.tool_calls)), None)
-        original_query = "用户原始请求"
-        if ai_message_with_call:
-            tool_call = next((tc for tc in ai_message_with_call.tool_calls if tc.get("id") == tool_call_id), None)
-            if tool_call:
-                original_query = tool_call.get("args", {}).get("query", original_query)
-
-        summarization_template = (
-            "你是一个数据分析助理。你的任务是阅读一段长文本，并根据用户的原始问题，提取出最核心、最相关的信息。"
-            "你的输出必须简洁、只包含关键数据点，并忽略所有无关内容。\n\n"
-            "原始问题: '{query}'\n\n"
-            "请总结以下长文本:\n\n---\n{long_text}\n---"
-        )
-        summarization_prompt = ChatPromptTemplate.from_template(summarization_template)
-        summarizer_llm = get_llm(tier="lightweight")
-        chain = summarization_prompt | summarizer_llm
-        try:
-            summary_response = await chain.ainvoke({
-                "query": original_query,
-                "long_text": tool_output[:config.reflector_max_text_length] + "..."
-            })
-            refined_content = summary_response.content
-            logger.info(f"信息精炼成功，原文长度 {len(tool_output)}，摘要长度 {len(refined_content)}")
-            new_tool_message = ToolMessage(content=refined_content, tool_call_id=tool_call_id)
-            return {"messages": state["messages"][:-1] + [new_tool_message]}
-        except Exception as e:
-            logger.error("信息精炼过程中发生错误!", exc_info=True)
-            error_message = ToolMessage(content=f"错误：工具返回信息过长，且在尝试总结时失败: {e}", tool_call_id=tool_call_id)
-            return {"messages": state["messages"][:-1] + [error_message]}
-            
-    return {"messages": []}
+
+    async def refine(message: ToolMessage) -> ToolMessage:
+        tool_output = str(message.content)
+        logger.warning("检测到超长工具输出 (%d chars)，超过阈值 %d，启动信息精炼流程...", len(tool_output), config.reflector_max_text_length)
+        refined_content, mode = await reflect_tool_output(tool_output, _reflection_query(state, message.tool_call_id))
+        logger.info("信息精炼成功 (%s)，原文长度 %d，摘要长度 %d", mode, len(tool_output), len(refined_content))
+        return ToolMessage(content=refined_content, tool_call_id=message.tool_call_id, id=message.id)
+
+    return {"messages": list(await asyncio.gather(*(refine(m) for m in oversized)))}
 
 def router_node(state: AgentState):
     last_message = state["messages"][-1]
@@ -163,17 +360,48 @@ def router_node(state: AgentState):
     else:
         return END
 
+def _node_span(name: str):
+    """图节点的span，附带LangGraph的超步序号 (langgraph_step)，用于区分同一节点的多轮迭代。"""
+    run_config = var_child_runnable_config.get() or {}
+    step = (run_config.get("metadata") or {}).get("langgraph_step")
+    return tracing.span(f"node:{name}", node=name, step=step)
+
+def timed_node(name: str, node):
+    """为图节点记录执行耗时 (hive_node_duration_seconds) 与追踪span，同时支持同步与异步节点。"""
+    if asyncio.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state):
+            started = time.perf_counter()
+            try:
+                with _node_span(name):
+                    return await node(state)
+            finally:
+                metrics.NODE_DURATION.observe(time.perf_counter() - started, node=name)
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state):
+        started = time.perf_counter()
+        try:
+            with _node_span(name):
+                return node(state)
+        finally:
+            metrics.NODE_DURATION.observe(time.perf_counter() - started, node=name)
+    return wrapper
+
 def build_nexus_graph():
     workflow = StateGraph(AgentState)
-    workflow.add_node("agent", agent_node)
-    workflow.add_node("execute_tools", execute_tools_node)
-    workflow.add_node("reflect", reflect_node)
-    workflow.set_entry_point("agent")
+    workflow.add_node("route", timed_node("route", route_node))
+    workflow.add_node("agent", timed_node("agent", agent_node))
+    workflow.add_node("execute_tools", timed_node("execute_tools", execute_tools_node))
+    workflow.add_node("reflect", timed_node("reflect", reflect_node))
+    workflow.set_entry_point("route")
+    workflow.add_conditional_edges("route", fast_path_router, {"execute_tools": "execute_tools", "agent": "agent"})
     workflow.add_conditional_edges("agent", router_node, {"execute_tools": "execute_tools", END: END})
     workflow.add_edge("execute_tools", "reflect")
     workflow.add_edge("reflect", "agent")
     graph = workflow.compile()
-    print("✅ Hive Nexus Graph v1.7 (Dynamic Prompt & Configurable) has been successfully compiled.")
+    print("✅ Hive Nexus Graph v1.8 (Fast-Path Routing) has been successfully compiled.")
     return graph
 
 nexus_graph = build_nexus_graph()
\ No newline at end of file
@@ -0,0 +1,287 @@
+# hive/nexus/planner.py
+
+import re
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Set
+
+from pydantic import BaseModel, Field
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, convert_to_messages
+from langgraph.graph import StateGraph, END
+
+from hive.nexus import executor
+from hive.nexus.executor import (
+    arun_tool_call, build_tool_catalog, execute_tools_node, fast_path_router, route_node,
+    timed_node, tool_output_failed, fast_path_answer,
+)
+from hive.nexus.state import HiveState, latest_step_results
+from hive.interaction.alpha_engine import fast_path_stats
+from hive.utils.config import config
+
+logger = logging.getLogger(__name__)
+
+
+# --- 计划的数据结构 ---
+class PlanStep(BaseModel):
+    id: str = Field(description="步骤的唯一标识，如 s1、s2。")
+    tool: str = Field(description="要调用的工具名。")
+    args: Dict[str, Any] = Field(default_factory=dict, description="工具参数。可以用 ${步骤id} 引用之前步骤的完整输出，用 ${步骤id.字段.子字段} 引用其JSON输出中的某个字段。")
+    depends_on: List[str] = Field(default_factory=list, description="本步骤依赖的步骤id列表；没有依赖的步骤会被并发执行。")
+    purpose: str = Field(default="", description="这一步要获得什么信息。")
+
+class Plan(BaseModel):
+    steps: List[PlanStep] = Field(default_factory=list, description="执行计划中的步骤。不需要任何工具就能回答时为空列表。")
+
+
+# --- 步骤之间的数据引用 ---
+_REFERENCE = re.compile(r'\$\{(?P<step>[\w\-]+)(?P<path>(?:\.[^}.]+)*)\}')
+
+def find_references(value: Any) -> Set[str]:
+    """找出参数中引用的所有步骤id。"""
+    if isinstance(value, str):
+        return {m.group("step") for m in _REFERENCE.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*(find_references(v) for v in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(find_references(v) for v in value)) if value else set()
+    return set()
+
+def _lookup(output: str, path: str) -> Any:
+    if not path:
+        return output
+    value = json.loads(output)
+    for key in path.strip(".").split("."):
+        value = value[int(key)] if isinstance(value, list) else value[key]
+    return value
+
+def resolve_references(value: Any, outputs: Dict[str, str]) -> Any:
+    """
+    把参数中的 ${步骤id[.字段路径]} 替换为对应步骤的输出。整个字符串就是一个引用时保留原始类型
+    (如列表、数字)，嵌在文本中时替换为文本。引用无法解析时抛出KeyError/IndexError/ValueError。
+    """
+    if isinstance(value, str):
+        whole = _REFERENCE.fullmatch(value)
+        if whole:
+            return _lookup(outputs[whole.group("step")], whole.group("path"))
+
+        def _as_text(m: re.Match) -> str:
+            found = _lookup(outputs[m.group("step")], m.group("path"))
+            return found if isinstance(found, str) else json.dumps(found, ensure_ascii=False)
+        return _REFERENCE.sub(_as_text, value)
+    if isinstance(value, dict):
+        return {k: resolve_references(v, outputs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(v, outputs) for v in value]
+    return value
+
+
+# --- 提示词 ---
+def build_planner_prompt() -> ChatPromptTemplate:
+    prompt_template = f"""<role_definition>
+你是Nexus的规划核心。你的任务不是回答问题，而是一次性规划出回答用户问题所需的全部工具调用步骤。
+</role_definition>
+<tools_catalog>
+{build_tool_catalog()}
+</tools_catalog>
+<planning_rules>
+1.  每个步骤调用一个工具，给出唯一的id (s1、s2……)、工具名、参数以及它依赖的步骤 (depends_on)。
+2.  **互不依赖的步骤不要填写depends_on，它们会被同时执行。** 只有当一个步骤确实需要另一个步骤的输出时才声明依赖。
+3.  需要使用之前步骤的输出时，在参数中写 ${{{{步骤id}}}} 引用其完整输出，或写 ${{{{步骤id.字段}}}} 引用其JSON输出中的字段，不要自己猜测结果。
+4.  计划最多包含 {config.plan_max_steps} 个步骤。不需要任何工具就能回答时，返回空的步骤列表。
+5.  你不需要规划最终的总结步骤，所有步骤完成后会有专门的分析环节撰写回复。
+</planning_rules>
+<progress>
+{{progress}}
+</progress>"""
+    return ChatPromptTemplate.from_messages([
+        ("system", prompt_template),
+        MessagesPlaceholder(variable_name="messages")
+    ])
+
+SYNTHESIS_SYSTEM = """<mission_directive>
+你是一个名为Nexus的、严谨、逻辑清晰的AI分析师。执行计划中的工具调用已经全部完成，现在你【必须】根据下面的执行结果，
+对数据进行全面的分析、计算、比较和总结，直接、完整地回答用户的原始问题。
+如果某些步骤失败导致信息不全，请诚实说明，并给出你已经能够得出的部分结论。如果任务包含写文件，回复中必须包含对此操作的确认。
+</mission_directive>
+<execution_results>
+{results}
+</execution_results>"""
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + f"... (共 {len(text)} 字符，已截断)"
+
+def _format_results(results: Dict[str, dict], limit: int) -> str:
+    if not results:
+        return "(没有执行任何工具)"
+    blocks = []
+    for step_id, record in results.items():
+        header = f"[{step_id}] {record['tool']} ({record['status']})"
+        if record.get("purpose"):
+            header += f" - {record['purpose']}"
+        blocks.append(f"{header}\n参数: {json.dumps(record.get('args', {}), ensure_ascii=False)}\n输出: {_truncate(record['output'], limit)}")
+    return "\n\n".join(blocks)
+
+def _conversation(messages) -> list:
+    """去掉工具调用的中间消息，只保留用户与最终回复，供Planner和分析环节使用。"""
+    return [m for m in convert_to_messages(messages)
+            if isinstance(m, HumanMessage) or (isinstance(m, AIMessage) and not m.tool_calls)]
+
+
+# --- 图节点 ---
+async def planner_node(state: HiveState):
+    """调用重量级模型生成步骤DAG；已有计划时 (有步骤失败) 带上已完成的结果重新规划剩余的工作。"""
+    previous = state.get("plan")
+    replans = (state.get("replans") or 0) + (1 if previous else 0)
+    results = latest_step_results(state.get("execution_history", []))
+    if previous:
+        progress = ("之前的计划中有步骤失败，请只为尚未完成的工作重新规划。已成功的步骤不需要重复执行，"
+                    "可以直接通过 ${步骤id} 引用它们的输出；新步骤请使用新的id。已有的执行结果:\n"
+                    + _format_results(results, 1000))
+    else:
+        progress = "这是第一次规划。"
+
+    started = time.perf_counter()
+    chain = build_planner_prompt() | executor.get_llm(tier="heavyweight").with_structured_output(Plan)
+    try:
+        plan = await chain.ainvoke({"messages": _conversation(state["messages"]), "progress": progress})
+    except Exception:
+        logger.error("Planner生成计划失败，直接进入分析环节", exc_info=True)
+        plan = None
+    fast_path_stats.record_heavy_round((time.perf_counter() - started) * 1000)
+
+    steps = (plan.steps if isinstance(plan, Plan) else [])[:config.plan_max_steps]
+    logger.info("Planner生成了 %d 个步骤 (第 %d 次重新规划)", len(steps), replans)
+    return {"plan": Plan(steps=steps).model_dump(), "replans": replans}
+
+async def _run_step(step: PlanStep, outputs: Dict[str, str], semaphore: asyncio.Semaphore) -> dict:
+    record = {"id": step.id, "tool": step.tool, "purpose": step.purpose, "args": step.args}
+    started = time.perf_counter()
+    try:
+        args = resolve_references(step.args, outputs)
+    except (KeyError, IndexError, ValueError, TypeError) as e:
+        return {**record, "status": "error", "output": f"无法解析步骤 {step.id} 的参数引用: {e!r}", "duration_ms": 0.0}
+    output, status = await arun_tool_call(step.tool, args, f"plan_{step.id}", semaphore)
+    failed = status != "success" or tool_output_failed(output)
+    return {**record, "args": args, "status": "error" if failed else "success", "output": output,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+async def execute_plan_node(state: HiveState):
+    """
+    按依赖关系调度计划中的步骤：依赖全部成功的步骤立即并发启动，上游失败的步骤被跳过。
+    步骤的输出只保存在execution_history中，下游步骤执行时才按引用取用。
+    """
+    plan = Plan.model_validate(state.get("plan") or {})
+    results = latest_step_results(state.get("execution_history", []))
+    outputs = {sid: r["output"] for sid, r in results.items() if r["status"] == "success"}
+    pending = {s.id: s for s in plan.steps if s.id not in outputs}
+    known = {s.id for s in plan.steps} | set(outputs)
+    semaphore = asyncio.Semaphore(max(1, config.tool_max_concurrency))
+    running: Dict[asyncio.Task, str] = {}
+    history: List[dict] = []
+
+    def _skip(step: PlanStep, reason: str):
+        history.append({"id": step.id, "tool": step.tool, "purpose": step.purpose, "args": step.args,
+                        "status": "skipped", "output": reason, "duration_ms": 0.0})
+        pending.pop(step.id)
+
+    while pending or running:
+        progressed = False
+        for step in list(pending.values()):
+            deps = set(step.depends_on) | find_references(step.args)
+            unknown = deps - known
+            failed = [d for d in deps if d in known and d not in outputs and d not in pending
+                      and d not in running.values()]
+            if unknown:
+                _skip(step, f"依赖了不存在的步骤: {', '.join(sorted(unknown))}")
+            elif failed:
+                _skip(step, f"依赖的步骤未成功: {', '.join(sorted(failed))}")
+            elif deps <= set(outputs):
+                pending.pop(step.id)
+                running[asyncio.create_task(_run_step(step, outputs, semaphore))] = step.id
+            else:
+                continue
+            progressed = True
+        if not running:
+            if pending and not progressed:
+                # 剩下的步骤互相依赖，永远不会就绪
+                for step in list(pending.values()):
+                    _skip(step, "步骤之间存在循环依赖")
+            continue
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            running.pop(task)
+            record = task.result()
+            history.append(record)
+            if record["status"] == "success":
+                outputs[record["id"]] = record["output"]
+
+    succeeded = sum(1 for r in history if r["status"] == "success")
+    logger.info("计划执行完毕: 成功 %d 步，失败或跳过 %d 步", succeeded, len(history) - succeeded)
+    return {"execution_history": history}
+
+def planner_router(state: HiveState):
+    return "execute_plan" if (state.get("plan") or {}).get("steps") else "agent"
+
+def plan_result_router(state: HiveState):
+    """有步骤失败且还有重新规划的次数时回到Planner，否则进入分析环节。"""
+    results = latest_step_results(state.get("execution_history", []))
+    steps = (state.get("plan") or {}).get("steps", [])
+    incomplete = [s["id"] for s in steps if results.get(s["id"], {}).get("status") != "success"]
+    if incomplete and (state.get("replans") or 0) < config.plan_max_replans:
+        logger.info("步骤 %s 未成功，重新规划", incomplete)
+        return "planner"
+    return "agent"
+
+async def synthesize_node(state: HiveState):
+    """
+    最终的分析环节 (节点名沿用agent，前端据此展示回复)。快速通道的结果先尝试直接作答，
+    否则把所有步骤的执行结果交给重量级模型撰写回复。
+    """
+    route = state.get("route")
+    results = latest_step_results(state.get("execution_history", []))
+    if route and route.get("route") == "fast":
+        response = await fast_path_answer(state, route)
+        if response is not None:
+            return {"messages": [response], "route": None}
+        fast_path_stats.record_fallback(route.get("tool"))
+        logger.info("快速通道 (%s) 未能直接作答，交给分析环节", route.get("tool"))
+        tool_message = next((m for m in reversed(state["messages"])
+                             if isinstance(m, ToolMessage) and m.tool_call_id == route["tool_call_id"]), None)
+        if tool_message is not None:
+            output = str(tool_message.content)
+            results = {"fast": {"id": "fast", "tool": route["tool"], "purpose": "", "args": route["args"], "output": output,
+                                "status": "error" if tool_output_failed(output) else "success"}}
+
+    started = time.perf_counter()
+    prompt = ChatPromptTemplate.from_messages([("system", SYNTHESIS_SYSTEM), MessagesPlaceholder(variable_name="messages")])
+    chain = prompt | executor.get_llm(tier="heavyweight")
+    response = await chain.ainvoke({"messages": _conversation(state["messages"]),
+                                    "results": _format_results(results, config.reflector_max_text_length)})
+    fast_path_stats.record_heavy_round((time.perf_counter() - started) * 1000)
+    return {"messages": [response], "route": None}
+
+def build_plan_graph():
+    """
+    plan模式：route → planner → execute_plan → (有失败则回到planner) → agent。
+    重量级模型只在规划、失败后的重新规划以及最终分析时被调用。
+    """
+    workflow = StateGraph(HiveState)
+    workflow.add_node("route", timed_node("route", route_node))
+    workflow.add_node("planner", timed_node("planner", planner_node))
+    workflow.add_node("execute_plan", timed_node("execute_plan", execute_plan_node))
+    workflow.add_node("execute_tools", timed_node("execute_tools", execute_tools_node))
+    workflow.add_node("agent", timed_node("agent", synthesize_node))
+    workflow.set_entry_point("route")
+    workflow.add_conditional_edges("route", fast_path_router, {"execute_tools": "execute_tools", "agent": "planner"})
+    workflow.add_conditional_edges("planner", planner_router, {"execute_plan": "execute_plan", "agent": "agent"})
+    workflow.add_conditional_edges("execute_plan", plan_result_router, {"planner": "planner", "agent": "agent"})
+    workflow.add_edge("execute_tools", "agent")
+    workflow.add_edge("agent", END)
+    graph = workflow.compile()
+    print("✅ Hive Plan Graph v1.0 (Plan-then-Execute DAG) has been successfully compiled.")
+    return graph
+
+plan_graph = build_plan_graph()
@@ -1,18 +1,25 @@
-# hive/planning/state.py
+# hive/nexus/state.py
 
-from typing import TypedDict, List, Optional
-from hive.interaction.alpha_engine import ParsedIntent
+from typing import Annotated, Any, Dict, List, Optional, Sequence, TypedDict
+from langchain_core.messages import BaseMessage
 
 class HiveState(TypedDict):
     """
-    定义了在LangGraph中流转的核心状态。
+    定义了plan模式下在LangGraph中流转的核心状态。
     它就像一个公文包，在所有节点之间传递。
     """
-    user_query: str                  # 用户的原始输入
-    intent: Optional[ParsedIntent]   # Alpha引擎解析出的意图
-    
-    # 我们用一个列表来追踪每一步的执行结果
-    execution_history: List[dict]
-    
-    # 最终给用户的回复
-    final_response: str 
\ No newline at end of file
+    messages: Annotated[Sequence[BaseMessage], lambda x, y: x + y]   # 对话消息 (与react模式相同)
+    route: Optional[Dict[str, Any]]  # AlphaEngine预路由的结论
+    plan: Optional[Dict[str, Any]]   # 当前的执行计划 (Plan.model_dump())
+    replans: int                     # 已经重新规划的次数
+
+    # 我们用一个列表来追踪每一步的执行结果，每轮执行只追加；同一步骤以最后一条记录为准
+    execution_history: Annotated[List[dict], lambda x, y: x + y]
+
+
+def latest_step_results(execution_history: List[dict]) -> Dict[str, dict]:
+    """按步骤id取每一步最新的执行记录，保持步骤首次出现的顺序。"""
+    results: Dict[str, dict] = {}
+    for record in execution_history or []:
+        results[record["id"]] = record
+    return results
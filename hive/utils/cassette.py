@@ -0,0 +1,226 @@
+# hive/utils/cassette.py
+
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import functools
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumpd, load
+
+from hive.utils.config import config
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMissError(LookupError):
+    """回放模式下，请求的指纹在磁带中不存在 (提示词、工具或参数与录制时不一致)。"""
+
+
+def _canonical(data: Any) -> str:
+    return json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def strip_message_ids(node: Any) -> Any:
+    """去掉序列化消息中的运行时id (如 'run-<uuid>')，使指纹只取决于对话内容。"""
+    if isinstance(node, dict):
+        return {k: strip_message_ids(v) for k, v in node.items() if k != "id" or not isinstance(v, str)}
+    if isinstance(node, list):
+        return [strip_message_ids(v) for v in node]
+    return node
+
+
+def fingerprint(kind: str, name: str, payload: Any) -> str:
+    return hashlib.sha256(_canonical({"kind": kind, "name": name, "payload": payload}).encode('utf-8')).hexdigest()
+
+
+class LatencyModel:
+    """
+    回放时的模拟延迟。spec格式：
+    none | recorded | fixed:<ms> | uniform:<lo_ms>,<hi_ms> | normal:<mean_ms>,<std_ms>
+    随机分布使用固定种子，同一次回放的延迟序列可复现。
+    """
+
+    def __init__(self, spec: str, seed: int = 0):
+        kind, _, args = (spec or "none").partition(":")
+        self.kind = kind.strip().lower()
+        self.args = [float(a) for a in args.split(",") if a.strip()]
+        if self.kind not in ("none", "recorded", "fixed", "uniform", "normal"):
+            raise ValueError(f"无法识别的延迟分布: '{spec}'。")
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay_seconds(self, recorded_ms: Optional[float]) -> float:
+        with self._lock:
+            if self.kind == "recorded":
+                ms = recorded_ms or 0.0
+            elif self.kind == "fixed":
+                ms = self.args[0]
+            elif self.kind == "uniform":
+                ms = self._rng.uniform(self.args[0], self.args[1])
+            elif self.kind == "normal":
+                ms = self._rng.gauss(self.args[0], self.args[1])
+            else:
+                ms = 0.0
+        return max(0.0, ms) / 1000
+
+
+class Cassette:
+    """
+    LLM与工具调用的录制/回放磁带 (JSONL文件，每行一次交互)。
+    录制模式下保存每次请求的指纹、响应和真实耗时；回放模式下按指纹返回录制的响应，
+    同一指纹被多次调用时按录制顺序依次返回 (用尽后重复最后一条)。
+    """
+
+    def __init__(self, path: str, mode: str, latency: str = "none", seed: int = 0):
+        if mode not in MODES:
+            raise ValueError(f"无法识别的磁带模式: '{mode}'。可选值为 {MODES}。")
+        self.path = path
+        self.mode = mode
+        self.latency = LatencyModel(latency, seed)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursors: Dict[str, int] = defaultdict(int)
+        self._pending_starts: Dict[str, deque] = defaultdict(deque)
+
+        if mode == "record":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            open(path, 'w', encoding='utf-8').close()
+            logger.info("Cassette: 录制模式，写入 %s", path)
+        elif mode == "replay":
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"回放模式需要的磁带文件不存在: {path}")
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+            logger.info("Cassette: 回放模式，已从 %s 加载 %d 条交互", path, sum(len(v) for v in self._entries.values()))
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(self, key: str, kind: str, name: str, response: Any, latency_ms: float):
+        entry = {"key": key, "kind": kind, "name": name, "latency_ms": round(latency_ms, 3), "response": response}
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def _next_entry(self, key: str, kind: str, name: str) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMissError(f"磁带 {self.path} 中没有 {kind} '{name}' 的录制 (指纹 {key[:12]})。请重新录制。")
+            index = min(self._cursors[key], len(entries) - 1)
+            self._cursors[key] += 1
+            return entries[index]
+
+    def replay(self, key: str, kind: str, name: str) -> Any:
+        entry = self._next_entry(key, kind, name)
+        time.sleep(self.latency.delay_seconds(entry.get("latency_ms")))
+        return entry["response"]
+
+    async def areplay(self, key: str, kind: str, name: str) -> Any:
+        entry = self._next_entry(key, kind, name)
+        await asyncio.sleep(self.latency.delay_seconds(entry.get("latency_ms")))
+        return entry["response"]
+
+    # --- 工具调用 ---
+    def call_tool(self, name: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        key = fingerprint("tool", name, {"args": list(args), "kwargs": kwargs})
+        if self.replaying:
+            return self.replay(key, "tool", name)
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        if self.recording:
+            self.record(key, "tool", name, result, (time.perf_counter() - started) * 1000)
+        return result
+
+
+class CassetteLLMCache(BaseCache):
+    """
+    把磁带接入LangChain的LLM缓存接口：挂在模型实例的 `cache` 属性上后，
+    所有 invoke / ainvoke / batch / bind_tools 之后的调用都会经过这里。
+    录制模式下lookup总是未命中，真实响应在update中写入磁带；回放模式下lookup直接返回录制的响应。
+    """
+
+    def __init__(self, cassette: Cassette, name: str):
+        self.cassette = cassette
+        self.name = name
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        try:
+            messages = strip_message_ids(json.loads(prompt))
+        except ValueError:
+            messages = prompt
+        return fingerprint("llm", self.name, {"llm": llm_string, "messages": messages})
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        key = self._key(prompt, llm_string)
+        if self.cassette.replaying:
+            return [load(g) for g in self.cassette.replay(key, "llm", self.name)]
+        self.cassette._pending_starts[key].append(time.perf_counter())
+        return None
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        key = self._key(prompt, llm_string)
+        if self.cassette.replaying:
+            return [load(g) for g in await self.cassette.areplay(key, "llm", self.name)]
+        self.cassette._pending_starts[key].append(time.perf_counter())
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        if not self.cassette.recording:
+            return
+        key = self._key(prompt, llm_string)
+        starts = self.cassette._pending_starts[key]
+        latency_ms = (time.perf_counter() - starts.popleft()) * 1000 if starts else 0.0
+        self.cassette.record(key, "llm", self.name, [dumpd(g) for g in return_val], latency_ms)
+
+    def clear(self, **kwargs: Any) -> None:
+        pass
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """返回全局磁带；CASSETTE_MODE=off (默认) 时返回None。"""
+    global _cassette
+    if config.cassette_mode == "off":
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(config.cassette_path, config.cassette_mode, config.cassette_latency, config.cassette_seed)
+        return _cassette
+
+
+def recorded_tool(name: str):
+    """
+    工具函数装饰器：录制模式下记录工具的输入与输出，回放模式下直接返回录制的输出而不调用真实的Agent。
+    应放在 @tool 之下，以便LangChain仍能从原函数推断参数schema。
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cassette = get_cassette()
+            if cassette is None:
+                return func(*args, **kwargs)
+            return cassette.call_tool(name, func, *args, **kwargs)
+        return wrapper
+    return decorator
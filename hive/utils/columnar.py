@@ -0,0 +1,239 @@
+# hive/utils/columnar.py
+
+import os
+import re
+import csv
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numexpr
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_AGGREGATES = ("sum", "mean", "min", "max", "count")
+_IDENTIFIER_PATTERN = re.compile(r'[^\W\d]\w*')
+_DEFAULT_CHUNK_ROWS = 100_000
+_MAX_GROUPS = 1000
+_STRING_COMPARISON = re.compile(r'''([^\W\d]\w*)\s*(==|!=)\s*(['"])(.*?)\3''')
+_STRING_COMPARISON_REVERSED = re.compile(r'''(['"])(.*?)\1\s*(==|!=)\s*([^\W\d]\w*)''')
+
+
+def _column_alias(name: str) -> str:
+    """将列名转换为可在numexpr表达式中引用的标识符 (非单词字符替换为'_')。"""
+    alias = re.sub(r'\W', '_', name.strip())
+    return f"_{alias}" if not alias or alias[0].isdigit() else alias
+
+
+def _to_float_array(values: List[str]) -> np.ndarray:
+    """快速路径直接交给NumPy转换；失败时逐个解析，无法解析的值记为NaN。"""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except ValueError:
+        out = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                out[i] = float(value.replace(',', '')) if value.strip() else np.nan
+            except ValueError:
+                out[i] = np.nan
+        return out
+
+
+def _iter_chunks(path: str, delimiter: str, chunk_rows: int, wanted: List[str]) -> Iterator[Tuple[int, Dict[str, List[str]]]]:
+    """按块流式读取CSV，只保留需要的列，内存占用与chunk_rows成正比，而与文件大小无关。"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        aliases = [_column_alias(h) for h in header]
+        indices = {alias: i for i, alias in enumerate(aliases) if alias in wanted}
+        missing = [w for w in wanted if w not in indices]
+        if missing:
+            raise ValueError(f"数据集中不存在列: {missing}。可用的列为: {aliases}")
+
+        chunk: Dict[str, List[str]] = {alias: [] for alias in indices}
+        n = 0
+        for row in reader:
+            if not row:
+                continue
+            for alias, i in indices.items():
+                chunk[alias].append(row[i] if i < len(row) else "")
+            n += 1
+            if n >= chunk_rows:
+                yield n, chunk
+                chunk = {alias: [] for alias in indices}
+                n = 0
+        if n:
+            yield n, chunk
+
+
+def read_header(path: str, delimiter: str) -> List[str]:
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f, delimiter=delimiter), [])
+
+
+class _Accumulator:
+    """单个聚合表达式的分组累加器，按分组序号存放在数组中，每个数据块只做一次向量化更新。"""
+
+    def __init__(self):
+        self.sum = np.zeros(0)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+
+    def _grow(self, n_groups: int):
+        extra = n_groups - len(self.sum)
+        if extra > 0:
+            self.sum = np.concatenate([self.sum, np.zeros(extra)])
+            self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+            self.min = np.concatenate([self.min, np.full(extra, np.inf)])
+            self.max = np.concatenate([self.max, np.full(extra, -np.inf)])
+
+    def update(self, group_ids: np.ndarray, values: np.ndarray, n_groups: int):
+        self._grow(n_groups)
+        valid = ~np.isnan(values)
+        ids, values = group_ids[valid], values[valid]
+        self.sum += np.bincount(ids, weights=values, minlength=n_groups)
+        self.count += np.bincount(ids, minlength=n_groups)
+        np.minimum.at(self.min, ids, values)
+        np.maximum.at(self.max, ids, values)
+
+    def result(self, group: int, op: str) -> Optional[float]:
+        count = int(self.count[group]) if group < len(self.count) else 0
+        if op == "count":
+            return count
+        if count == 0:
+            return None
+        if op == "sum":
+            return float(self.sum[group])
+        if op == "mean":
+            return float(self.sum[group]) / count
+        return float(self.min[group]) if op == "min" else float(self.max[group])
+
+
+def _extract_string_comparisons(filter: str, header_aliases: set) -> Tuple[str, Dict[str, Tuple[str, str, str]]]:
+    """
+    numexpr中的列都是浮点数组，字符串列与字面量比较永远不成立。这里把 col == 'x' / col != 'x'
+    替换为预先计算好的布尔变量，返回改写后的filter以及 {变量名: (列, 运算符, 字面量)}。
+    """
+    comparisons: Dict[str, Tuple[str, str, str]] = {}
+
+    def replace(column: str, op: str, literal: str) -> str:
+        alias = _column_alias(column)
+        if alias not in header_aliases:
+            raise ValueError(f"字符串比较只能用于数据文件中的列，'{column}' 不是数据集的列。")
+        name = f"__str_cmp_{len(comparisons)}"
+        comparisons[name] = (alias, op, literal.strip())
+        return name
+
+    filter = _STRING_COMPARISON.sub(lambda m: replace(m.group(1), m.group(2), m.group(4)), filter)
+    filter = _STRING_COMPARISON_REVERSED.sub(lambda m: replace(m.group(4), m.group(3), m.group(2)), filter)
+    return filter, comparisons
+
+
+def compute_dataset(
+    path: str,
+    aggregates: List[Dict[str, str]],
+    columns: Optional[Dict[str, str]] = None,
+    filter: Optional[str] = None,
+    group_by: Optional[str] = None,
+    delimiter: Optional[str] = None,
+    chunk_rows: int = _DEFAULT_CHUNK_ROWS,
+) -> Dict[str, Any]:
+    """
+    在本地CSV/TSV文件上执行列式计算，只返回紧凑的聚合结果。
+
+    Args:
+        path: 数据文件路径。
+        aggregates: 聚合列表，如 [{"op": "sum", "expr": "price * qty", "as": "revenue"}]。
+        columns: 派生列，如 {"revenue": "price * qty"}，可在filter和aggregates中引用。
+        filter: numexpr布尔表达式，如 "(year == 2024) & (price > 0)"。
+        group_by: 分组列名。
+        delimiter: 分隔符，默认根据扩展名推断 (.tsv为制表符，其余为逗号)。
+        chunk_rows: 每个数据块的行数。
+    """
+    path = os.path.expanduser(path)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"数据文件不存在: {path}")
+    if not aggregates:
+        raise ValueError("dataset模式至少需要一个聚合 (aggregates)。")
+    delimiter = delimiter or ("\t" if path.lower().endswith((".tsv", ".tab")) else ",")
+    columns = {_column_alias(k): v for k, v in (columns or {}).items()}
+    for agg in aggregates:
+        if agg.get("op") not in SUPPORTED_AGGREGATES:
+            raise ValueError(f"不支持的聚合操作: {agg.get('op')}。可选值为 {SUPPORTED_AGGREGATES}。")
+
+    header_aliases = {_column_alias(h) for h in read_header(path, delimiter)}
+    string_comparisons: Dict[str, Tuple[str, str, str]] = {}
+    if filter:
+        filter, string_comparisons = _extract_string_comparisons(filter, header_aliases)
+    expressions = list(columns.values()) + [a.get("expr", "") for a in aggregates] + ([filter] if filter else [])
+    if any(quote in (expr or "") for expr in expressions for quote in ("'", '"')):
+        raise ValueError("字符串字面量只支持在filter中与列做 == 或 != 比较，如 \"region == 'east'\"。")
+    numeric_columns = sorted({ident for expr in expressions for ident in _IDENTIFIER_PATTERN.findall(expr or "")
+                              if ident in header_aliases})
+    group_alias = _column_alias(group_by) if group_by else None
+    string_columns = {column for column, _, _ in string_comparisons.values()}
+    if group_alias:
+        string_columns.add(group_alias)
+    wanted = numeric_columns + sorted(string_columns - set(numeric_columns))
+
+    accumulators = [_Accumulator() for _ in aggregates]
+    # 分组键 -> 分组序号。累加过程中最多保留_MAX_GROUPS个分组，之后出现的新分组的行不再累加，只计数
+    group_ids: Dict[Any, int] = {} if group_alias else {None: 0}
+    rows_scanned = rows_matched = rows_in_dropped_groups = 0
+
+    for n, chunk in _iter_chunks(path, delimiter, chunk_rows, wanted):
+        rows_scanned += n
+        arrays = {alias: _to_float_array(chunk[alias]) for alias in numeric_columns}
+        for name, (column, op, literal) in string_comparisons.items():
+            equal = np.fromiter((value.strip() == literal for value in chunk[column]), dtype=bool, count=n)
+            arrays[name] = equal if op == "==" else ~equal
+        for name, expr in columns.items():
+            arrays[name] = np.broadcast_to(numexpr.evaluate(expr, local_dict=arrays), (n,)).astype(np.float64)
+
+        mask = np.broadcast_to(numexpr.evaluate(filter, local_dict=arrays), (n,)) if filter else np.ones(n, dtype=bool)
+        rows_matched += int(mask.sum())
+        if group_alias:
+            keys, inverse = np.unique(np.asarray(chunk[group_alias], dtype=object)[mask].astype(str), return_inverse=True)
+            ids = np.empty(len(keys), dtype=np.intp)
+            for i, key in enumerate(keys.tolist()):
+                group = group_ids.get(key)
+                if group is None and len(group_ids) < _MAX_GROUPS:
+                    group = group_ids[key] = len(group_ids)
+                ids[i] = -1 if group is None else group
+            row_ids = ids[inverse]
+            kept = row_ids >= 0
+            rows_in_dropped_groups += int((~kept).sum())
+            row_ids = row_ids[kept]
+        else:
+            kept = slice(None)
+            row_ids = np.zeros(int(mask.sum()), dtype=np.intp)
+
+        for agg, acc in zip(aggregates, accumulators):
+            expr = agg.get("expr")
+            if expr:
+                values = np.broadcast_to(numexpr.evaluate(expr, local_dict=arrays), (n,)).astype(np.float64)[mask]
+            else:
+                values = np.zeros(int(mask.sum()))  # 纯count无需表达式
+            acc.update(row_ids, values[kept], len(group_ids))
+
+    names = [a.get("as") or f"{a['op']}({a.get('expr', '*')})" for a in aggregates]
+    output: Dict[str, Any] = {"path": path, "rows_scanned": rows_scanned, "rows_matched": rows_matched}
+    if group_alias:
+        output["group_by"] = group_by
+        output["total_groups"] = len(group_ids)
+        output["groups"] = [
+            {group_by: key, **{name: acc.result(group, agg["op"]) for name, agg, acc in zip(names, aggregates, accumulators)}}
+            for key, group in sorted(group_ids.items())
+        ]
+        output["truncated"] = rows_in_dropped_groups > 0
+        if rows_in_dropped_groups:
+            # 超出上限的分组未参与累加，total_groups只统计保留下来的分组
+            output["rows_in_dropped_groups"] = rows_in_dropped_groups
+            logger.warning("数据集 %s 的分组数超过上限 %d，%d 行属于被丢弃的分组", path, _MAX_GROUPS, rows_in_dropped_groups)
+    else:
+        output["result"] = {name: acc.result(0, agg["op"]) for name, agg, acc in zip(names, aggregates, accumulators)}
+    logger.info("数据集计算完成: %s, 扫描 %d 行, 匹配 %d 行", path, rows_scanned, rows_matched)
+    return output
@@ -22,19 +22,44 @@ class AppConfig:
             cls._instance.frontend_cors_origins_str = os.getenv("FRONTEND_CORS_ORIGINS", "")
             
             cls._instance.reflector_max_text_length = int(os.getenv("REFLECTOR_MAX_TEXT_LENGTH", "4000"))
+            # 超长工具输出的精炼方式：extractive (按相关度抽取句子，毫秒级) | llm (轻量级模型总结) |
+            # hybrid (先抽取再交给轻量级模型总结) | auto (按输出大小与轻量级模型的实测延迟在extractive与hybrid之间选择)
+            cls._instance.reflector_mode = os.getenv("REFLECTOR_MODE", "auto").lower()
+            cls._instance.reflector_token_budget = int(os.getenv("REFLECTOR_TOKEN_BUDGET", "800"))
+            # auto模式下，超过此长度的输出才值得再交给模型总结；模型近期平均延迟超过上限时只做抽取
+            cls._instance.reflector_hybrid_min_chars = int(os.getenv("REFLECTOR_HYBRID_MIN_CHARS", "16000"))
+            cls._instance.reflector_llm_max_latency_ms = float(os.getenv("REFLECTOR_LLM_MAX_LATENCY_MS", "2000"))
             cls._instance.api_host = os.getenv("API_HOST", "http://localhost")
             cls._instance.api_port = int(os.getenv("API_PORT", "8000"))
 
+            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+            # Steward工作区索引 (find / search_content 操作使用)
+            cls._instance.workspace_root = os.path.expanduser(os.getenv("HIVE_WORKSPACE_ROOT", os.getcwd()))
+            cls._instance.index_db_path = os.getenv("HIVE_INDEX_DB_PATH", os.path.join(project_root, "hive_index.db"))
+            cls._instance.index_rescan_interval = float(os.getenv("HIVE_INDEX_RESCAN_INTERVAL", "30"))
+            cls._instance.content_index_max_file_bytes = int(os.getenv("HIVE_CONTENT_INDEX_MAX_FILE_BYTES", str(2*1024*1024)))
+            cls._instance.io_max_workers = int(os.getenv("HIVE_IO_MAX_WORKERS", "8"))
+            cls._instance.steward_batch_max_files = int(os.getenv("STEWARD_BATCH_MAX_FILES", "100"))
+            cls._instance.steward_max_read_bytes = int(os.getenv("STEWARD_MAX_READ_BYTES", "200000"))
+
+            # GetAgent长文本分块提取
+            cls._instance.get_chunk_size = int(os.getenv("GET_CHUNK_SIZE", "6000"))
+            cls._instance.get_chunk_overlap = int(os.getenv("GET_CHUNK_OVERLAP", "400"))
+            cls._instance.get_max_concurrency = int(os.getenv("GET_MAX_CONCURRENCY", "4"))
+            cls._instance.get_fast_path = os.getenv("GET_FAST_PATH", "true").lower() == "true"
+
             cls._instance.llms = {
                 "heavyweight": {
                     "provider": "deepseek",
                     "model": os.getenv("DEEPSEEK_MODEL_NAME", "deepseek-chat"),
-                    "api_key": os.getenv("DEEPSEEK_API_KEY")
+                    "api_key": os.getenv("DEEPSEEK_API_KEY"),
+                    "max_concurrency": int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "8"))
                 },
                 "lightweight_api": {
                     "provider": "openai",
                     "model": os.getenv("OPENAI_LIGHT_MODEL_NAME", "gpt-3.5-turbo"),
-                    "api_key": os.getenv("OPENAI_API_KEY")
+                    "api_key": os.getenv("OPENAI_API_KEY"),
+                    "max_concurrency": int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
                 },
                 "lightweight_local": {
                     "provider": "ollama",
@@ -42,13 +67,102 @@ class AppConfig:
                     "model": os.getenv("OLLAMA_MODEL_NAME", "llama2"), 
                     # ----------------------------------------------
                     "base_url": os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+                },
+                "router": {
+                    "provider": "router",
+                    # 按顺序列出参与路由的层级，只有配置完整的层级会被启用
+                    "backends": [b.strip() for b in os.getenv("ROUTER_BACKENDS", "lightweight_local,lightweight_api").split(",") if b.strip()],
+                    "hedge": os.getenv("ROUTER_HEDGE", "false").lower() == "true",
+                    "hedge_percentile": float(os.getenv("ROUTER_HEDGE_PERCENTILE", "95"))
                 }
             }
             
-            cls._instance.default_lightweight_tier = "lightweight_local"
+            # L2专家与Reflector使用的轻量级层级，可选 lightweight_local / lightweight_api / router
+            cls._instance.default_lightweight_tier = os.getenv("LIGHTWEIGHT_TIER", "lightweight_local")
+            # 路由层级的滚动窗口大小与熔断策略
+            cls._instance.router_window = int(os.getenv("ROUTER_WINDOW", "50"))
+            cls._instance.router_failure_threshold = int(os.getenv("ROUTER_FAILURE_THRESHOLD", "3"))
+            cls._instance.router_cooldown = float(os.getenv("ROUTER_COOLDOWN", "30"))
+
+            # LLM客户端共享连接池、超时与重试 (对基于httpx的deepseek/openai客户端生效)
+            cls._instance.llm_timeout = float(os.getenv("LLM_TIMEOUT", "120"))
+            cls._instance.llm_pool_max_connections = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+            cls._instance.llm_pool_max_keepalive = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+            cls._instance.llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", "4"))
+            cls._instance.llm_retry_base_delay = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+            cls._instance.llm_retry_max_delay = float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))
+
+            # temperature=0调用的精确匹配响应缓存
+            cls._instance.llm_cache_enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+            cls._instance.llm_cache_path = os.getenv("LLM_CACHE_PATH", os.path.join(project_root, "hive_llm_cache.db"))
+            cls._instance.llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+            cls._instance.llm_cache_max_bytes = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
             
             cls._instance.tavily_api_key = os.getenv("TAVILY_API_KEY")
 
+            # Seeker搜索后端 (tavily | stub)、并发、限流与磁盘缓存
+            cls._instance.search_backend = os.getenv("SEARCH_BACKEND", "tavily").lower()
+            cls._instance.search_max_results = int(os.getenv("SEARCH_MAX_RESULTS", "5"))
+            cls._instance.search_max_concurrency = int(os.getenv("SEARCH_MAX_CONCURRENCY", "4"))
+            cls._instance.search_rate_limit = float(os.getenv("SEARCH_RATE_LIMIT", "5"))
+            cls._instance.search_rate_burst = int(os.getenv("SEARCH_RATE_BURST", "5"))
+            cls._instance.search_cache_ttl = float(os.getenv("SEARCH_CACHE_TTL", "86400"))
+            cls._instance.search_cache_path = os.getenv("SEARCH_CACHE_PATH", os.path.join(project_root, "hive_search_cache.db"))
+            cls._instance.search_stub_latency_ms = float(os.getenv("SEARCH_STUB_LATENCY_MS", "0"))
+
+            # LLM与工具调用的录制/回放 (off | record | replay)，用于离线、可复现的基准测试
+            cls._instance.cassette_mode = os.getenv("CASSETTE_MODE", "off").lower()
+            cls._instance.cassette_path = os.getenv("CASSETTE_PATH", os.path.join(project_root, "cassettes", "default.jsonl"))
+            cls._instance.cassette_latency = os.getenv("CASSETTE_LATENCY", "none")
+            cls._instance.cassette_seed = int(os.getenv("CASSETTE_SEED", "0"))
+
+            # AlphaEngine快速通道：规则或轻量级模型能确定的单步任务直接交给对应Agent，跳过重量级循环
+            cls._instance.fast_path_enabled = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+            cls._instance.fast_path_llm = os.getenv("FAST_PATH_LLM", "true").lower() == "true"
+            cls._instance.fast_path_llm_timeout = float(os.getenv("FAST_PATH_LLM_TIMEOUT", "3.0"))
+            cls._instance.fast_path_min_confidence = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.85"))
+
+            # Nexus图模式：react (逐轮决定工具调用) | plan (先规划带依赖的步骤DAG，再并发执行就绪的步骤)
+            cls._instance.nexus_mode = os.getenv("NEXUS_MODE", "react").lower()
+            cls._instance.plan_max_steps = int(os.getenv("PLAN_MAX_STEPS", "12"))
+            cls._instance.plan_max_replans = int(os.getenv("PLAN_MAX_REPLANS", "2"))
+            # 同一轮中并发执行的工具调用数上限 (react模式的并行tool_calls与plan模式的就绪步骤共用)
+            cls._instance.tool_max_concurrency = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+
+            # 沙箱工作进程池：AgentManifest标记为cpu_bound的计算在独立进程中执行，可超时强杀并限制内存
+            cls._instance.sandbox_enabled = os.getenv("SANDBOX_ENABLED", "true").lower() == "true"
+            cls._instance.sandbox_workers = int(os.getenv("SANDBOX_WORKERS", str(min(4, os.cpu_count() or 1))))
+            cls._instance.sandbox_timeout = float(os.getenv("SANDBOX_TIMEOUT", "30"))
+            cls._instance.sandbox_memory_mb = int(os.getenv("SANDBOX_MEMORY_MB", "2048"))  # 0为不限制
+            cls._instance.sandbox_max_tasks_per_child = int(os.getenv("SANDBOX_MAX_TASKS_PER_CHILD", "200"))
+            # 超过此大小的结果通过临时文件 (优先/dev/shm) 传回，而不是经过管道
+            cls._instance.sandbox_inline_max_bytes = int(os.getenv("SANDBOX_INLINE_MAX_BYTES", str(1024 * 1024)))
+            # 工作进程启动时预先导入的模块
+            cls._instance.sandbox_preload = os.getenv("SANDBOX_PRELOAD", "numpy,numexpr")
+
+            # 请求链路追踪：span先在内存中缓冲，攒够一批或到达刷新间隔后批量写入CoreMemory
+            cls._instance.tracing_enabled = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+            cls._instance.trace_batch_size = int(os.getenv("TRACE_BATCH_SIZE", "50"))
+            cls._instance.trace_flush_interval = float(os.getenv("TRACE_FLUSH_INTERVAL", "2.0"))
+            # span的保留天数 (0表示不清理)；刷新线程每隔TRACE_PRUNE_INTERVAL秒分批删除过期的span
+            cls._instance.trace_retention_days = float(os.getenv("TRACE_RETENTION_DAYS", "7"))
+            cls._instance.trace_prune_interval = float(os.getenv("TRACE_PRUNE_INTERVAL", "600"))
+            cls._instance.trace_prune_batch_size = int(os.getenv("TRACE_PRUNE_BATCH_SIZE", "5000"))
+
+            # 调用记录导出：按id分页读取，每页的行数 (每页是一次独立的短读事务，不会长时间阻塞写入)
+            cls._instance.export_batch_size = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+            # 日志管道：格式化与磁盘写入在后台线程完成；text | json (JSON Lines，附带run id)
+            cls._instance.log_format = os.getenv("LOG_FORMAT", "text").lower()
+            cls._instance.log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+            cls._instance.log_console_level = os.getenv("LOG_CONSOLE_LEVEL", "INFO").upper()
+            cls._instance.log_queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+            # DEBUG/INFO日志的限流 (每个logger每秒条数，0为不限) 与采样比例；WARNING及以上总是保留
+            cls._instance.log_rate_limit = float(os.getenv("LOG_RATE_LIMIT", "0"))
+            cls._instance.log_sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+            # 按logger覆盖，格式 "logger名=每秒条数[:采样比例],..."，如 "hive.core.memory=5:0.1,httpx=1"
+            cls._instance.log_logger_limits = os.getenv("LOG_LOGGER_LIMITS", "")
+
             cls._instance._validate_and_log()
 
         return cls._instance
@@ -69,7 +183,9 @@ class AppConfig:
         logging.info(f"--- [Hive配置] 当前运行环境 (APP_ENV): {self.app_env.upper()} ---")
         
         logging.info(f"后端API服务地址 (API_HOST:API_PORT): {self.api_base_url}")
-        logging.info(f"ReflectorNode 触发阈值 (REFLECTOR_MAX_TEXT_LENGTH): {self.reflector_max_text_length} chars")
+        logging.info(f"ReflectorNode 触发阈值 (REFLECTOR_MAX_TEXT_LENGTH): {self.reflector_max_text_length} chars, 精炼方式 (REFLECTOR_MODE): {self.reflector_mode}")
+        logging.info(f"Steward 工作区根目录 (HIVE_WORKSPACE_ROOT): {self.workspace_root}")
+        logging.info(f"Nexus 图模式 (NEXUS_MODE): {self.nexus_mode}")
         
         heavy_conf = self.llms["heavyweight"]
         if not heavy_conf.get("api_key"):
@@ -82,13 +198,21 @@ class AppConfig:
         
         if light_conf:
             logging.info(f"✅ Lightweight LLM (L2专家) 已切换至: [ {light_tier_key.upper()} ]")
-            logging.info(f"   - Provider: '{light_conf['provider']}', Model: '{light_conf['model']}'")
+            if light_conf["provider"] == "router":
+                logging.info(f"   - Backends: {light_conf['backends']}, Hedge: {light_conf['hedge']}")
+            else:
+                logging.info(f"   - Provider: '{light_conf['provider']}', Model: '{light_conf['model']}'")
             if light_tier_key == "lightweight_api" and not light_conf.get("api_key"):
                 logging.warning(f"   - 警告: {light_tier_key.upper()} 模式下需要API密钥，但未在.env中配置！")
         else:
             logging.error(f"配置错误: default_lightweight_tier '{light_tier_key}' 未在llms配置中找到！")
 
-        if not self.tavily_api_key:
+        if self.cassette_mode != "off":
+            logging.info(f"LLM/工具录制回放 (CASSETTE_MODE): {self.cassette_mode.upper()}, 磁带文件: {self.cassette_path}")
+
+        if self.search_backend != "tavily":
+            logging.info(f"Seeker 搜索后端 (SEARCH_BACKEND): {self.search_backend}")
+        elif not self.tavily_api_key:
             logging.warning("TAVILY_API_KEY 未设置！Seeker Agent将无法工作。")
         else:
             logging.info("✅ Tavily API Key 已配置。")
@@ -0,0 +1,128 @@
+# hive/utils/extractive.py
+
+import re
+import json
+import math
+from typing import Any, List, Optional
+
+import numpy as np
+
+from hive.utils.text_tokenize import tokenize, _CJK_RANGES
+
+# BM25 参数 (与content_index相同)；句子作为文档，原始问题作为查询
+_K1 = 1.2
+_B = 0.75
+# 位置先验：得分相同 (或都不含查询词) 时优先保留靠前的句子，权重远小于任何一次词项命中
+_POSITION_WEIGHT = 1e-3
+# 没有标点的超长片段 (压缩过的JSON、表格行) 按固定长度切开，避免一个"句子"吃掉全部预算
+_MAX_SENTENCE_CHARS = 400
+
+# 中文句末标点 (可带右引号/括号)、后面跟空白的英文句点，或行尾；句子不跨行
+_SENTENCE = re.compile(r'(?:[^。！？；!?;…\n.]+|\.(?!\s|$))+(?:[。！？；!?;…]+[”’」』"\'）)\]]*|\.)?', re.M)
+_CJK_CHAR = re.compile(f'[{_CJK_RANGES}]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩文字按每字1个token，其余字符按每4个1个token。"""
+    cjk = len(_CJK_CHAR.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _string_leaves(value: Any, out: List[str]):
+    if isinstance(value, str):
+        out.append(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _string_leaves(item, out)
+    elif isinstance(value, list):
+        for item in value:
+            _string_leaves(item, out)
+    elif value is not None and not isinstance(value, bool):
+        out.append(str(value))
+
+
+def flatten_json_text(text: str) -> str:
+    """
+    Agent的输出大多是JSON，换行被转义为\\n，句子切分无法识别。
+    能解析为JSON时取出其中所有的字符串与数值 (每个一行)，否则原样返回。
+    """
+    if not text.lstrip().startswith(("{", "[")):
+        return text
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text
+    leaves: List[str] = []
+    _string_leaves(data, leaves)
+    return "\n".join(leaves)
+
+
+def split_sentences(text: str) -> List[str]:
+    """按中英文句末标点与换行切分句子，去掉空白片段，超长片段按_MAX_SENTENCE_CHARS切开。"""
+    sentences: List[str] = []
+    for match in _SENTENCE.finditer(text):
+        sentence = match.group().strip()
+        if len(sentence) > _MAX_SENTENCE_CHARS:
+            sentences.extend(sentence[i:i + _MAX_SENTENCE_CHARS] for i in range(0, len(sentence), _MAX_SENTENCE_CHARS))
+        elif sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def score_sentences(sentences: List[str], query: str, lengths: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    用BM25计算每个句子与query的相关度 (向量化)。lengths为句子长度 (默认按词项数)。
+    词频矩阵只包含查询中出现的词项，形状为 (句子数, 查询词项数)，由np.add.at一次性累加得到；
+    不含任何查询词项的句子由一次正则匹配筛掉，不需要分词。
+    """
+    n = len(sentences)
+    position_prior = _POSITION_WEIGHT * (1.0 - np.arange(n, dtype=np.float64) / max(n, 1))
+    vocab = {term: i for i, term in enumerate(dict.fromkeys(tokenize(query)))}
+    if not vocab or not n:
+        return position_prior
+
+    if lengths is None:
+        lengths = np.fromiter((len(tokenize(s, unigrams=True)) for s in sentences), dtype=np.float64, count=n)
+    candidate = re.compile("|".join(map(re.escape, sorted(vocab, key=len, reverse=True))))
+    hits = [(i, vocab[t]) for i, s in enumerate(sentences) if candidate.search(s.lower())
+            for t in tokenize(s, unigrams=True) if t in vocab]
+    if not hits:
+        return position_prior
+    rows, cols = np.array(hits, dtype=np.intp).T
+    tf = np.zeros((n, len(vocab)), dtype=np.float64)
+    np.add.at(tf, (rows, cols), 1.0)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    norm = _K1 * (1 - _B + _B * lengths / (lengths.mean() or 1.0))
+    return (tf * (_K1 + 1) / (tf + norm[:, None])) @ idf + position_prior
+
+
+def extract_summary(text: str, query: str, max_tokens: int) -> str:
+    """
+    抽取式摘要：按与query的BM25相关度从高到低挑选句子，直到用完max_tokens的预算，
+    再按句子在原文中的顺序输出 (每句一行)。重复的句子只保留第一次出现。
+    """
+    sentences = list(dict.fromkeys(split_sentences(flatten_json_text(text))))
+    if not sentences:
+        return ""
+    costs = np.fromiter((estimate_tokens(s) for s in sentences), dtype=np.int64, count=len(sentences))
+    # 句子长度直接使用估算的token数，省去对不相关句子的分词
+    scores = score_sentences(sentences, query, costs.astype(np.float64))
+    order = np.argsort(-scores, kind="stable")
+    if scores[order[0]] > _POSITION_WEIGHT:
+        # 有句子命中查询词时只在命中的句子中挑选，不用无关内容填满预算
+        order = order[scores[order] > _POSITION_WEIGHT]
+    selected: List[int] = []
+    remaining = max_tokens
+    for i in order:
+        if costs[i] <= remaining:
+            selected.append(int(i))
+            remaining -= int(costs[i])
+        if remaining <= 0:
+            break
+    if not selected:
+        # 预算连最相关的一句都放不下时，截取它的开头部分
+        best = sentences[int(np.argmax(scores))]
+        return best[:max(1, max_tokens)]
+    return "\n".join(sentences[i] for i in sorted(selected))
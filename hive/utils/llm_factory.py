@@ -1,8 +1,15 @@
 # hive/utils/llm_factory.py
 
+import time
 import logging
-from typing import Dict
+import threading
+from typing import Any, Dict, Tuple
+from uuid import UUID
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import LLMResult
 
 # 导入所有需要支持的LLM的具体类
 from langchain_deepseek import ChatDeepSeek
@@ -11,12 +18,144 @@ from langchain_community.chat_models import ChatOllama
 
 # 导入我们的中央配置
 from hive.utils.config import config
+from hive.utils.cassette import CassetteLLMCache, get_cassette
+from hive.utils.llm_transport import AsyncRetryingTransport, RetryingTransport, TierLimiter
+from hive.utils.llm_router import RouterChatModel, get_router_stats
+from hive.utils.response_cache import CACHE_HIT_KEY, ResponseCache, ResponseCacheStore
+from hive.utils import metrics
+from hive.utils.tracing import TracingCallback
 
 logger = logging.getLogger(__name__)
 
 # 一个简单的内存缓存，用于存储已创建的LLM实例，避免重复创建
 # 这在单次请求的生命周期内能提高效率
 _llm_cache: Dict[str, BaseChatModel] = {}
+# 保护实例与连接池的创建，避免并发的首次请求重复创建客户端
+_factory_lock = threading.RLock()
+# 每个层级共享的httpx连接池 (同步, 异步) 与并发限制器
+_http_clients: Dict[str, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+_tier_limiters: Dict[str, TierLimiter] = {}
+
+
+def _get_http_clients(lookup_key: str, llm_config: Dict[str, Any]) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    为层级创建 (或复用) 调优过的共享连接池。传输层负责层级并发上限、
+    可重试错误的抖动指数退避以及Retry-After，因此SDK自身的重试被关闭 (max_retries=0)。
+    """
+    with _factory_lock:
+        if lookup_key not in _http_clients:
+            limiter = TierLimiter(
+                tier=lookup_key,
+                max_concurrency=llm_config.get("max_concurrency", 8),
+                max_retries=config.llm_max_retries,
+                base_delay=config.llm_retry_base_delay,
+                max_delay=config.llm_retry_max_delay,
+            )
+            limits = httpx.Limits(max_connections=config.llm_pool_max_connections,
+                                  max_keepalive_connections=config.llm_pool_max_keepalive)
+            timeout = httpx.Timeout(config.llm_timeout, connect=10.0)
+            _http_clients[lookup_key] = (
+                httpx.Client(transport=RetryingTransport(httpx.HTTPTransport(limits=limits), limiter), timeout=timeout),
+                httpx.AsyncClient(transport=AsyncRetryingTransport(httpx.AsyncHTTPTransport(limits=limits), limiter), timeout=timeout),
+            )
+            _tier_limiters[lookup_key] = limiter
+        return _http_clients[lookup_key]
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """记录每个层级的LLM调用耗时、首token延迟与token用量 (挂在模型实例上，对所有调用方式生效)。"""
+
+    def __init__(self, tier: str):
+        self.tier = tier
+        self._starts: Dict[UUID, float] = {}
+        self._first_token_seen: set = set()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if run_id not in self._first_token_seen and run_id in self._starts:
+            self._first_token_seen.add(run_id)
+            metrics.LLM_TTFT.observe(time.perf_counter() - self._starts[run_id], tier=self.tier)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        # 响应缓存命中不是真实的模型调用：耗时单独标记，也不计入token用量
+        if any((generation.generation_info or {}).get(CACHE_HIT_KEY) for generations in response.generations for generation in generations):
+            self._finish(run_id, "cache_hit")
+            return
+        self._finish(run_id, "success")
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        if not input_tokens and not output_tokens:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens, output_tokens = usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+        for kind, count in (("input", input_tokens), ("output", output_tokens)):
+            if count:
+                metrics.LLM_TOKENS.observe(count, tier=self.tier, type=kind)
+                metrics.LLM_TOKENS_TOTAL.inc(count, tier=self.tier, type=kind)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "error")
+
+    def _finish(self, run_id: UUID, status: str):
+        started = self._starts.pop(run_id, None)
+        self._first_token_seen.discard(run_id)
+        if started is not None:
+            metrics.LLM_DURATION.observe(time.perf_counter() - started, tier=self.tier, status=status)
+
+
+_LLM_IN_FLIGHT = metrics.registry.gauge("hive_llm_in_flight", "各层级正在进行的HTTP请求数", ["tier"])
+_LLM_QUEUED = metrics.registry.gauge("hive_llm_queued", "各层级等待并发名额的请求数", ["tier"])
+_LLM_RETRIES = metrics.registry.counter("hive_llm_retries_total", "各层级累计重试次数", ["tier"])
+_ROUTER_HEALTHY = metrics.registry.gauge("hive_router_backend_healthy", "路由后端是否健康 (1/0)", ["backend"])
+_ROUTER_HEDGES_WON = metrics.registry.counter("hive_router_hedges_won_total", "对冲请求中由该后端胜出的次数", ["backend"])
+_CACHE_HIT_RATE = metrics.registry.gauge("hive_llm_cache_hit_rate", "本进程内响应缓存命中率", ["tier"])
+_CACHE_LATENCY_SAVED = metrics.registry.gauge("hive_llm_cache_latency_saved_seconds", "本进程内响应缓存节省的LLM耗时", ["tier"])
+
+
+def _collect_llm_metrics():
+    for tier, limiter in list(_tier_limiters.items()):
+        snapshot = limiter.snapshot()
+        _LLM_IN_FLIGHT.set(snapshot["in_flight"], tier=tier)
+        _LLM_QUEUED.set(snapshot["queued"], tier=tier)
+        _LLM_RETRIES.set_total(snapshot["retries"], tier=tier)
+    for backend, snapshot in get_router_stats().items():
+        _ROUTER_HEALTHY.set(1 if snapshot["healthy"] else 0, backend=backend)
+        _ROUTER_HEDGES_WON.set_total(snapshot["hedges_won"], backend=backend)
+    if config.llm_cache_enabled and ResponseCacheStore._instance is not None:
+        for tier, values in ResponseCacheStore().stats()["session"].items():
+            _CACHE_HIT_RATE.set(values["hit_rate"], tier=tier)
+            _CACHE_LATENCY_SAVED.set(values["latency_saved_ms"] / 1000, tier=tier)
+
+
+metrics.registry.add_collector(_collect_llm_metrics)
+
+
+def get_llm_stats() -> Dict[str, Dict[str, Any]]:
+    """返回每个层级的排队等待、重试、在途请求数等统计，以及路由层级中各后端的健康状况。"""
+    stats: Dict[str, Dict[str, Any]] = {tier: limiter.snapshot() for tier, limiter in _tier_limiters.items()}
+    router_stats = get_router_stats()
+    if router_stats:
+        stats["router"] = router_stats
+    if config.llm_cache_enabled:
+        stats["response_cache"] = ResponseCacheStore().stats()
+    return stats
+
+
+def _is_configured(tier: str) -> bool:
+    """路由层级只使用配置完整的后端 (API类服务商需要密钥)。"""
+    llm_config = config.llms.get(tier)
+    if not llm_config or llm_config.get("provider") == "router":
+        return False
+    return "api_key" not in llm_config or bool(llm_config["api_key"])
+
 
 def get_llm(tier: str) -> BaseChatModel:
     """
@@ -37,9 +176,17 @@ def get_llm(tier: str) -> BaseChatModel:
     
     # 1. 检查缓存
     if lookup_key in _llm_cache:
-        logger.debug(f"LLM Factory: Returning cached instance for key '{lookup_key}'.")
+        logger.debug("LLM Factory: Returning cached instance for key '%s'.", lookup_key)
         return _llm_cache[lookup_key]
 
+    with _factory_lock:
+        if lookup_key in _llm_cache:
+            return _llm_cache[lookup_key]
+        return _create_llm(tier, lookup_key)
+
+
+def _create_llm(tier: str, lookup_key: str) -> BaseChatModel:
+    """在_factory_lock内调用，创建层级对应的LLM实例并放入缓存。"""
     # 2. 获取配置
     llm_config = config.llms.get(lookup_key)
     if not llm_config:
@@ -50,18 +197,41 @@ def get_llm(tier: str) -> BaseChatModel:
     llm_instance = None
     logger.info(f"LLM Factory: Creating new instance for provider '{provider}' with key '{lookup_key}'.")
 
+    cassette = get_cassette()
+    if cassette is not None and cassette.replaying and "api_key" in llm_config and not llm_config["api_key"]:
+        # 回放模式下不会真正访问服务商，使用占位密钥以便在没有凭证的环境 (如CI) 中创建客户端
+        llm_config = {**llm_config, "api_key": "cassette-replay"}
+
     try:
         if provider == "deepseek":
+            http_client, http_async_client = _get_http_clients(lookup_key, llm_config)
             llm_instance = ChatDeepSeek(
                 model=llm_config["model"],
                 api_key=llm_config["api_key"],
-                temperature=0  # Agent任务通常需要更确定的输出
+                temperature=0,  # Agent任务通常需要更确定的输出
+                max_retries=0,
+                http_client=http_client,
+                http_async_client=http_async_client
             )
         elif provider == "openai":
+            http_client, http_async_client = _get_http_clients(lookup_key, llm_config)
             llm_instance = ChatOpenAI(
                 model=llm_config["model"],
                 api_key=llm_config["api_key"],
-                temperature=0
+                temperature=0,
+                max_retries=0,
+                http_client=http_client,
+                http_async_client=http_async_client
+            )
+        elif provider == "router":
+            backends = [b for b in llm_config["backends"] if _is_configured(b)]
+            if not backends:
+                raise ValueError(f"路由层级 '{lookup_key}' 没有可用的后端，请检查ROUTER_BACKENDS与各服务商的配置。")
+            llm_instance = RouterChatModel(
+                backends=backends,
+                model_factory=get_llm,
+                hedge=llm_config["hedge"],
+                hedge_percentile=llm_config["hedge_percentile"]
             )
         elif provider == "ollama":
             llm_instance = ChatOllama(
@@ -72,6 +242,14 @@ def get_llm(tier: str) -> BaseChatModel:
         else:
             raise NotImplementedError(f"LLM provider '{provider}' is not supported by the factory.")
         
+        if cassette is not None and provider != "router":
+            # 录制/回放通过LangChain的缓存接口接入，对bind_tools、批量与异步调用同样生效
+            llm_instance.cache = CassetteLLMCache(cassette, lookup_key)
+        elif config.llm_cache_enabled and provider != "router":
+            # 所有实例都以temperature=0创建，相同的请求可以直接复用之前的响应 (路由层级由各后端各自缓存)
+            llm_instance.cache = ResponseCache(lookup_key)
+        llm_instance.callbacks = [LLMMetricsCallback(lookup_key), TracingCallback(lookup_key)]
+
         # 4. 存入缓存并返回
         logger.info(f"LLM instance for key '{lookup_key}' created successfully.")
         _llm_cache[lookup_key] = llm_instance
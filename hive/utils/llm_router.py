@@ -0,0 +1,243 @@
+# hive/utils/llm_router.py
+
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from hive.utils.config import config
+
+logger = logging.getLogger(__name__)
+
+# 同步对冲请求使用的线程池 (输掉的请求无法中断，只能等其自然结束)
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+
+class BackendHealth:
+    """单个后端的滚动延迟窗口、错误率与熔断状态。所有路由器实例共享同一份健康数据。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.latencies_ms: deque = deque(maxlen=config.router_window)
+        self.outcomes: deque = deque(maxlen=config.router_window)  # True表示成功
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.hedges_won = 0
+
+    def record_success(self, latency_ms: float):
+        with self._lock:
+            self.requests += 1
+            self.latencies_ms.append(latency_ms)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= config.router_failure_threshold:
+                self.open_until = time.monotonic() + config.router_cooldown
+                logger.warning("Router: 后端 '%s' 连续失败 %d 次，熔断 %.0f 秒", self.name, self.consecutive_failures, config.router_cooldown)
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = list(self.latencies_ms)
+        return float(np.percentile(samples, q)) if samples else None
+
+    def error_rate(self) -> float:
+        with self._lock:
+            outcomes = list(self.outcomes)
+        return outcomes.count(False) / len(outcomes) if outcomes else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "healthy": self.healthy,
+            "requests": self.requests,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate(), 4),
+            "p50_ms": round(p50, 1) if p50 is not None else None,
+            "p95_ms": round(p95, 1) if p95 is not None else None,
+            "hedges_won": self.hedges_won,
+        }
+
+
+_health: Dict[str, BackendHealth] = {}
+_health_lock = threading.Lock()
+
+
+def get_backend_health(name: str) -> BackendHealth:
+    with _health_lock:
+        if name not in _health:
+            _health[name] = BackendHealth(name)
+        return _health[name]
+
+
+def get_router_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: health.snapshot() for name, health in _health.items()}
+
+
+class RouterChatModel(BaseChatModel):
+    """
+    延迟感知的多后端路由模型。按滚动p50延迟 (乘以错误率惩罚) 选择最快的健康后端，
+    失败时自动切换到下一个后端；开启对冲后，若首选后端超过其历史延迟分位数仍未返回，
+    会并行向次优后端发送第二个请求，采用先返回的结果。
+    """
+    backends: List[str]
+    model_factory: Callable[[str], BaseChatModel]
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+    hedge_min_samples: int = 5
+    tool_binding: Optional[Dict[str, Any]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "hive-router"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"backends": self.backends, "hedge": self.hedge}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "RouterChatModel":
+        # 工具在选定具体后端时再绑定，由各后端自己转换为对应的工具格式
+        return self.model_copy(update={"tool_binding": {"tools": list(tools), "kwargs": kwargs}})
+
+    def _model(self, name: str):
+        model = self.model_factory(name)
+        if self.tool_binding:
+            return model.bind_tools(self.tool_binding["tools"], **self.tool_binding["kwargs"])
+        return model
+
+    def _ranked(self) -> List[str]:
+        """健康后端按 p50延迟 × (1 + 错误率) 排序；尚无样本的后端优先试探，熔断中的后端排在最后兜底。"""
+        def score(name: str) -> float:
+            health = get_backend_health(name)
+            p50 = health.percentile(50)
+            return -1.0 if p50 is None else p50 * (1 + health.error_rate())
+        healthy = sorted((b for b in self.backends if get_backend_health(b).healthy), key=score)
+        return healthy + [b for b in self.backends if b not in healthy]
+
+    def _hedge_budget(self, name: str) -> Optional[float]:
+        health = get_backend_health(name)
+        if not self.hedge or len(health.latencies_ms) < self.hedge_min_samples:
+            return None
+        return health.percentile(self.hedge_percentile) / 1000
+
+    @staticmethod
+    def _to_result(message: BaseMessage, backend: str) -> ChatResult:
+        message.response_metadata = {**(message.response_metadata or {}), "router_backend": backend}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _call(self, name: str, messages: List[BaseMessage], stop) -> BaseMessage:
+        started = time.perf_counter()
+        try:
+            result = self._model(name).invoke(messages, stop=stop)
+        except Exception:
+            get_backend_health(name).record_failure()
+            raise
+        get_backend_health(name).record_success((time.perf_counter() - started) * 1000)
+        return result
+
+    async def _acall(self, name: str, messages: List[BaseMessage], stop) -> BaseMessage:
+        started = time.perf_counter()
+        try:
+            result = await self._model(name).ainvoke(messages, stop=stop)
+        except Exception:
+            get_backend_health(name).record_failure()
+            raise
+        get_backend_health(name).record_success((time.perf_counter() - started) * 1000)
+        return result
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        ranked = self._ranked()
+        errors = []
+        i = 0
+        while i < len(ranked):
+            primary = ranked[i]
+            budget = self._hedge_budget(primary) if i + 1 < len(ranked) else None
+            logger.info("Router: 选择后端 '%s' (候选顺序: %s)", primary, ranked[i:])
+            if budget is None:
+                try:
+                    return self._to_result(self._call(primary, messages, stop), primary)
+                except Exception as e:
+                    errors.append(f"{primary}: {e}")
+                    logger.warning("Router: 后端 '%s' 调用失败，切换到下一个后端: %s", primary, e)
+                    i += 1
+                    continue
+
+            secondary = ranked[i + 1]
+            futures = {_hedge_pool.submit(self._call, primary, messages, stop): primary}
+            done, _ = wait(futures, timeout=budget)
+            if not done:
+                logger.info("Router: 后端 '%s' 超过 p%.0f 延迟预算 (%.0fms)，向 '%s' 发送对冲请求", primary, self.hedge_percentile, budget * 1000, secondary)
+                futures[_hedge_pool.submit(self._call, secondary, messages, stop)] = secondary
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures[future]
+                    if future.exception() is None:
+                        if len(futures) > 1:
+                            get_backend_health(name).hedges_won += 1
+                        return self._to_result(future.result(), name)
+                    errors.append(f"{name}: {future.exception()}")
+            i += len(futures)
+        raise RuntimeError(f"Router: 所有后端均调用失败: {errors}")
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        ranked = self._ranked()
+        errors = []
+        i = 0
+        while i < len(ranked):
+            primary = ranked[i]
+            budget = self._hedge_budget(primary) if i + 1 < len(ranked) else None
+            logger.info("Router: 选择后端 '%s' (候选顺序: %s)", primary, ranked[i:])
+            if budget is None:
+                try:
+                    return self._to_result(await self._acall(primary, messages, stop), primary)
+                except Exception as e:
+                    errors.append(f"{primary}: {e}")
+                    logger.warning("Router: 后端 '%s' 调用失败，切换到下一个后端: %s", primary, e)
+                    i += 1
+                    continue
+
+            secondary = ranked[i + 1]
+            tasks = {asyncio.ensure_future(self._acall(primary, messages, stop)): primary}
+            done, _ = await asyncio.wait(tasks, timeout=budget)
+            if not done:
+                logger.info("Router: 后端 '%s' 超过 p%.0f 延迟预算 (%.0fms)，向 '%s' 发送对冲请求", primary, self.hedge_percentile, budget * 1000, secondary)
+                tasks[asyncio.ensure_future(self._acall(secondary, messages, stop))] = secondary
+            pending = set(tasks)
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        name = tasks[task]
+                        if task.exception() is None:
+                            if len(tasks) > 1:
+                                get_backend_health(name).hedges_won += 1
+                            return self._to_result(task.result(), name)
+                        errors.append(f"{name}: {task.exception()}")
+            finally:
+                for task in pending:
+                    task.cancel()
+            i += len(tasks)
+        raise RuntimeError(f"Router: 所有后端均调用失败: {errors}")
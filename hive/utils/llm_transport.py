@@ -0,0 +1,292 @@
+# hive/utils/llm_transport.py
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+RETRYABLE_EXCEPTIONS = (httpx.TimeoutException, httpx.ConnectError, httpx.RemoteProtocolError, httpx.ReadError)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After头 (秒数或HTTP日期)，返回需要等待的秒数。"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TierLimiter:
+    """
+    单个LLM层级的并发上限与统计。同步和异步请求共享同一组许可，
+    因此线程池中的批量调用与事件循环中的调用加起来也不会超过上限。
+    许可不足时按到达顺序排队：线程在Event上阻塞，协程等待事件循环中的Future，释放时直接把许可交给队首，不轮询。
+    """
+
+    def __init__(self, tier: str, max_concurrency: int, max_retries: int, base_delay: float, max_delay: float):
+        self.tier = tier
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._available = self.max_concurrency
+        self._waiters: deque = deque()  # threading.Event 或 (事件循环, Future)
+        self._permit_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self.stats = {
+            "requests": 0, "retries": 0, "failures": 0, "in_flight": 0, "queued": 0,
+            "queue_wait_ms_total": 0.0, "queue_wait_ms_max": 0.0, "status_429": 0, "status_5xx": 0, "timeouts": 0,
+        }
+
+    def _bump(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+
+    def _record_wait(self, waited_ms: float):
+        with self._lock:
+            self.stats["queued"] -= 1
+            self.stats["in_flight"] += 1
+            self.stats["queue_wait_ms_total"] += waited_ms
+            self.stats["queue_wait_ms_max"] = max(self.stats["queue_wait_ms_max"], waited_ms)
+
+    def _try_acquire(self, waiter) -> bool:
+        """有空闲许可且没有人排队时立即拿到许可，否则把waiter加入队尾。"""
+        with self._permit_lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def acquire(self):
+        self._bump(queued=1)
+        started = time.perf_counter()
+        event = threading.Event()
+        if not self._try_acquire(event):
+            event.wait()
+        self._record_wait((time.perf_counter() - started) * 1000)
+
+    async def aacquire(self):
+        self._bump(queued=1)
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        if not self._try_acquire(waiter):
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._permit_lock:
+                    try:
+                        self._waiters.remove(waiter)
+                        granted = False
+                    except ValueError:
+                        granted = True
+                # 许可已经交给了这个waiter (结果已设置)，取消时要还回去；尚未送达的由_grant转交
+                if granted and future.done() and not future.cancelled():
+                    self._hand_off()
+                self._bump(queued=-1)
+                raise
+        self._record_wait((time.perf_counter() - started) * 1000)
+
+    def _grant(self, future: asyncio.Future):
+        # 在等待者的事件循环中执行；等待者已被取消时把许可交给下一个
+        if future.done():
+            self._hand_off()
+        else:
+            future.set_result(None)
+
+    def _hand_off(self):
+        """把一个许可交给队首的等待者；没有等待者时归还到空闲许可。"""
+        with self._permit_lock:
+            if not self._waiters:
+                self._available = min(self.max_concurrency, self._available + 1)
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+            return
+        loop, future = waiter
+        try:
+            loop.call_soon_threadsafe(self._grant, future)
+        except RuntimeError:  # 事件循环已关闭
+            self._hand_off()
+
+    def release(self):
+        self._bump(in_flight=-1)
+        self._hand_off()
+
+    def backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """带完全抖动的指数退避；服务端给出Retry-After时至少等待该时长 (不超过max_delay)。"""
+        with self._lock:
+            delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return min(delay, self.max_delay)
+
+    def classify(self, status_code: Optional[int] = None, error: Optional[Exception] = None):
+        if isinstance(error, httpx.TimeoutException):
+            self._bump(timeouts=1)
+        elif status_code == 429:
+            self._bump(status_429=1)
+        elif status_code is not None and status_code >= 500:
+            self._bump(status_5xx=1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        completed = max(1, stats["requests"])
+        stats["queue_wait_ms_avg"] = round(stats["queue_wait_ms_total"] / completed, 3)
+        stats["max_concurrency"] = self.max_concurrency
+        return stats
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """在响应体被读完或关闭时才释放并发名额，使流式响应在整个传输期间都占用名额。"""
+
+    def __init__(self, stream: httpx.SyncByteStream, limiter: TierLimiter):
+        self._stream = stream
+        self._limiter = limiter
+        self._released = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._limiter.release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+
+    def __init__(self, stream: httpx.AsyncByteStream, limiter: TierLimiter):
+        self._stream = stream
+        self._limiter = limiter
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._limiter.release()
+
+
+class RetryingTransport(httpx.BaseTransport):
+    """同步传输层：在共享连接池之上增加层级并发上限、重试与退避。"""
+
+    def __init__(self, inner: httpx.BaseTransport, limiter: TierLimiter):
+        self._inner = inner
+        self._limiter = limiter
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            self._limiter.acquire()
+            self._limiter._bump(requests=1)
+            try:
+                response = self._inner.handle_request(request)
+            except RETRYABLE_EXCEPTIONS as e:
+                self._limiter.release()
+                self._limiter.classify(error=e)
+                if attempt >= self._limiter.max_retries:
+                    self._limiter._bump(failures=1)
+                    raise
+                delay = self._limiter.backoff(attempt, None)
+                logger.warning("LLM请求失败 (tier=%s, %s)，%.2f秒后重试 (%d/%d)", self._limiter.tier, type(e).__name__, delay, attempt + 1, self._limiter.max_retries)
+            except BaseException:
+                self._limiter.release()
+                raise
+            else:
+                retryable = response.status_code in RETRYABLE_STATUS_CODES
+                if retryable:
+                    self._limiter.classify(status_code=response.status_code)
+                if not retryable or attempt >= self._limiter.max_retries:
+                    if retryable:
+                        self._limiter._bump(failures=1)
+                    return httpx.Response(status_code=response.status_code, headers=response.headers,
+                                          stream=_ReleasingStream(response.stream, self._limiter),
+                                          extensions=response.extensions, request=request)
+                delay = self._limiter.backoff(attempt, parse_retry_after(response.headers.get("retry-after")))
+                response.close()
+                self._limiter.release()
+                logger.warning("LLM请求返回 %d (tier=%s)，%.2f秒后重试 (%d/%d)", response.status_code, self._limiter.tier, delay, attempt + 1, self._limiter.max_retries)
+            attempt += 1
+            self._limiter._bump(retries=1)
+            time.sleep(delay)
+
+    def close(self):
+        self._inner.close()
+
+
+class AsyncRetryingTransport(httpx.AsyncBaseTransport):
+    """RetryingTransport的异步版本，退避期间不阻塞事件循环。"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, limiter: TierLimiter):
+        self._inner = inner
+        self._limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            await self._limiter.aacquire()
+            self._limiter._bump(requests=1)
+            try:
+                response = await self._inner.handle_async_request(request)
+            except RETRYABLE_EXCEPTIONS as e:
+                self._limiter.release()
+                self._limiter.classify(error=e)
+                if attempt >= self._limiter.max_retries:
+                    self._limiter._bump(failures=1)
+                    raise
+                delay = self._limiter.backoff(attempt, None)
+                logger.warning("LLM请求失败 (tier=%s, %s)，%.2f秒后重试 (%d/%d)", self._limiter.tier, type(e).__name__, delay, attempt + 1, self._limiter.max_retries)
+            except BaseException:
+                self._limiter.release()
+                raise
+            else:
+                retryable = response.status_code in RETRYABLE_STATUS_CODES
+                if retryable:
+                    self._limiter.classify(status_code=response.status_code)
+                if not retryable or attempt >= self._limiter.max_retries:
+                    if retryable:
+                        self._limiter._bump(failures=1)
+                    return httpx.Response(status_code=response.status_code, headers=response.headers,
+                                          stream=_AsyncReleasingStream(response.stream, self._limiter),
+                                          extensions=response.extensions, request=request)
+                delay = self._limiter.backoff(attempt, parse_retry_after(response.headers.get("retry-after")))
+                await response.aclose()
+                self._limiter.release()
+                logger.warning("LLM请求返回 %d (tier=%s)，%.2f秒后重试 (%d/%d)", response.status_code, self._limiter.tier, delay, attempt + 1, self._limiter.max_retries)
+            attempt += 1
+            self._limiter._bump(retries=1)
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._inner.aclose()
@@ -1,58 +1,220 @@
 # hive/utils/logging_config.py
 
-import logging
-import sys
 import os
-from logging.handlers import RotatingFileHandler
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+from hive.utils.config import config
+from hive.utils.tracing import current_run_id, current_span_id
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - [%(levelname)s]%(run_tag)s - %(message)s (%(filename)s:%(lineno)d)'
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+class TextFormatter(logging.Formatter):
+    """原有的文本格式，请求内的日志额外带上run id前缀，被限流抑制过的日志附上抑制条数。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        run_id = getattr(record, "run_id", None)
+        record.run_tag = f" [run={run_id[:12]}]" if run_id else ""
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} (此前已抑制 {suppressed} 条)" if suppressed else text
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON Lines格式，每条日志一行，便于按run_id检索和导入日志系统。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "run_id": getattr(record, "run_id", None),
+            "span_id": getattr(record, "span_id", None),
+            "thread": record.threadName,
+            "location": f"{record.filename}:{record.lineno}",
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _parse_logger_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for item in spec.split(","):
+        name, _, value = item.strip().partition("=")
+        if not name or not value:
+            continue
+        rate, _, sample = value.partition(":")
+        limits[name.strip()] = (float(rate), float(sample) if sample else 1.0)
+    return limits
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    DEBUG/INFO日志的按logger限流与采样，在调用线程中执行，被丢弃的日志不会进入队列。
+    限流使用令牌桶 (每秒rate条，允许rate条突发)；采样按比例随机保留。WARNING及以上级别总是放行。
+    """
+
+    def __init__(self, rate: float = 0.0, sample_rate: float = 1.0, overrides: Optional[Dict[str, Tuple[float, float]]] = None):
+        super().__init__()
+        self.default = (rate, sample_rate)
+        self.overrides = overrides or {}
+        self._buckets: Dict[str, list] = {}  # logger名 -> [令牌数, 上次更新时间, 已抑制条数]
+        self._policies: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    def _policy(self, name: str) -> Tuple[float, float]:
+        policy = self._policies.get(name)
+        if policy is None:
+            # 取最长匹配的logger前缀，如 "hive.agents" 同时作用于其下的所有logger
+            matches = [k for k in self.overrides if name == k or name.startswith(k + ".")]
+            policy = self.overrides[max(matches, key=len)] if matches else self.default
+            self._policies[name] = policy
+        return policy
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate, sample_rate = self._policy(record.name)
+        if rate <= 0 and sample_rate >= 1.0:
+            return True
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [max(rate, 1.0), record.created, 0]
+            keep = sample_rate >= 1.0 or self._rng.random() < sample_rate
+            if keep and rate > 0:
+                bucket[0] = min(max(rate, 1.0), bucket[0] + (record.created - bucket[1]) * rate)
+                bucket[1] = record.created
+                keep = bucket[0] >= 1.0
+                if keep:
+                    bucket[0] -= 1.0
+            if not keep:
+                bucket[2] += 1
+                return False
+            if bucket[2]:
+                record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    只把日志记录放入队列，格式化交给后台的QueueListener线程。
+    入队时捕获当前的run id/span id (上下文变量在后台线程中不可见)；参数中含有可变对象时
+    先在本线程合并消息，避免对象在格式化之前被修改。队列满时丢弃并计数，而不是阻塞请求。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.run_id = current_run_id()
+        record.span_id = current_span_id()
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(a, _IMMUTABLE_ARGS) for a in args)):
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _level(name: str, default: int) -> int:
+    level = logging.getLevelName(name)
+    return level if isinstance(level, int) else default
+
 
 def setup_logging():
     """
-    配置全局日志记录。
-    此函数设置了一个双通道的日志系统：
-    1. 控制台 (StreamHandler): 输出INFO及以上级别的日志，便于在开发时实时查看。
-    2. 文件 (RotatingFileHandler): 在项目根目录下创建hive.log文件，
-       记录DEBUG及以上级别的所有日志，用于详细的问题追溯和分析。
-       日志文件达到5MB时会自动轮替，最多保留3个备份文件。
+    配置全局日志记录 (非阻塞管道)。
+    所有日志先经过限流/采样过滤，再由DeferredQueueHandler放入内存队列；
+    后台的QueueListener线程负责格式化并写入两个通道：
+    1. 控制台 (StreamHandler): 输出LOG_CONSOLE_LEVEL (默认INFO) 及以上级别的日志。
+    2. 文件 (RotatingFileHandler): 在项目根目录下的hive.log中记录LOG_LEVEL (默认INFO) 及以上的日志，
+       达到5MB时自动轮替，最多保留3个备份文件。
+    LOG_FORMAT=json 时两个通道都输出JSON Lines，每行带有run_id与span_id。
     """
-    # 获取项目的根目录
-    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    log_file_path = os.path.join(project_root, 'hive.log')
-
-    # 定义日志格式
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - [%(levelname)s] - %(message)s (%(filename)s:%(lineno)d)'
-    )
-
-    # 获取根logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)  # 设置根logger的最低级别为DEBUG
-
-    # --- 配置控制台Handler ---
-    # 避免重复添加handler
-    if not any(isinstance(h, logging.StreamHandler) for h in root_logger.handlers):
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        # 获取项目的根目录
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        log_file_path = os.path.join(project_root, 'hive.log')
+
+        formatter = JsonFormatter() if config.log_format == "json" else TextFormatter(TEXT_FORMAT)
+        console_level = _level(config.log_console_level, logging.INFO)
+        file_level = _level(config.log_level, logging.INFO)
+
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.INFO)  # 控制台只显示INFO及以上信息
+        console_handler.setLevel(console_level)
         console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
 
-    # --- 配置文件Handler ---
-    # 避免重复添加handler
-    if not any(isinstance(h, RotatingFileHandler) for h in root_logger.handlers):
         file_handler = RotatingFileHandler(
             log_file_path,
             maxBytes=5*1024*1024,  # 5 MB
             backupCount=3,
             encoding='utf-8'
         )
-        file_handler.setLevel(logging.DEBUG)  # 文件记录所有DEBUG及以上信息
+        file_handler.setLevel(file_level)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+
+        log_queue: queue.Queue = queue.Queue(maxsize=config.log_queue_size)
+        queue_handler = DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(RateLimitFilter(config.log_rate_limit, config.log_sample_rate,
+                                                _parse_logger_limits(config.log_logger_limits)))
+
+        # 替换掉其他模块 (如basicConfig) 预先安装的同步handler，所有输出都经过队列
+        root_logger = logging.getLogger()
+        for handler in list(root_logger.handlers):
+            root_logger.removeHandler(handler)
+            handler.close()
+        root_logger.setLevel(min(console_level, file_level))
+        root_logger.addHandler(queue_handler)
+
+        _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
 
     logging.info("="*50)
-    logging.info("日志系统配置完成。输出将同时发送到控制台和hive.log文件。")
-    logging.info(f"日志文件路径: {log_file_path}")
+    logging.info("日志系统配置完成。输出将同时发送到控制台和hive.log文件 (格式: %s)。", config.log_format)
+    logging.info("日志文件路径: %s", log_file_path)
     logging.info("="*50)
 
+
+def shutdown_logging():
+    """停止后台线程并写出队列中剩余的日志。"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
 if __name__ == '__main__':
     # 简单的自测试
     setup_logging()
@@ -60,4 +222,5 @@ if __name__ == '__main__':
     logging.info("这是一条INFO级别的日志，应该会出现在控制台和文件中。")
     logging.warning("这是一条WARNING级别的日志。")
     logging.error("这是一条ERROR级别的日志。")
-    logging.critical("这是一条CRITICAL级别的日志。")
\ No newline at end of file
+    logging.critical("这是一条CRITICAL级别的日志。")
+    shutdown_logging()
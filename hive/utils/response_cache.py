@@ -0,0 +1,248 @@
+# hive/utils/response_cache.py
+
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import contextvars
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumpd, load
+from langchain_core.runnables.config import var_child_runnable_config
+
+from hive.utils.cassette import strip_message_ids
+from hive.utils.config import config
+
+try:
+    from langchain_core.tracers._streaming import _StreamingCallbackHandler
+except ImportError:  # pragma: no cover - 旧版本langchain_core
+    _StreamingCallbackHandler = None
+
+logger = logging.getLogger(__name__)
+
+# 每个ResponseCache最多跟踪的未完成键数；出错的调用不会update，超出时淘汰最久未用的键
+_MAX_PENDING_KEYS = 1024
+
+# 命中缓存时写入generation_info的标记
+CACHE_HIT_KEY = "hive_cache_hit"
+# 前端只展示这些图节点中模型的流式输出 (nexus_graph与plan_graph的最终回复节点都是agent)
+_USER_VISIBLE_NODES = ("agent",)
+# 当前上下文的缓存策略: "default" 正常读写 | "refresh" 跳过读取但写入新结果 | "bypass" 既不读也不写
+CACHE_MODES = ("default", "refresh", "bypass")
+_cache_mode: contextvars.ContextVar[str] = contextvars.ContextVar("hive_response_cache_mode", default="default")
+
+
+def cache_mode_from_header(cache_control: Optional[str]) -> str:
+    """把HTTP Cache-Control请求头映射为缓存策略: no-store -> bypass, no-cache -> refresh。"""
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    if "no-store" in directives:
+        return "bypass"
+    if "no-cache" in directives:
+        return "refresh"
+    return "default"
+
+
+def set_cache_mode(mode: str) -> contextvars.Token:
+    if mode not in CACHE_MODES:
+        raise ValueError(f"无法识别的缓存策略: '{mode}'。可选值为 {CACHE_MODES}。")
+    return _cache_mode.set(mode)
+
+
+@contextmanager
+def response_cache_mode(mode: str):
+    """在with块内 (包括其中启动的子任务与LangChain线程池) 使用指定的缓存策略。"""
+    token = set_cache_mode(mode)
+    try:
+        yield
+    finally:
+        _cache_mode.reset(token)
+
+
+def _is_streaming_call() -> bool:
+    """
+    当前调用的输出是否会逐token展示给用户。命中缓存会跳过逐token事件，因此这类调用不读缓存；
+    只有位于用户可见节点中、且处于astream_events等流式回调之下的调用才算，工具子Agent、反思与提取照常走缓存。
+    """
+    if _StreamingCallbackHandler is None:
+        return False
+    runnable_config = var_child_runnable_config.get() or {}
+    if (runnable_config.get("metadata") or {}).get("langgraph_node") not in _USER_VISIBLE_NODES:
+        return False
+    handlers = getattr(runnable_config.get("callbacks"), "handlers", None) or []
+    return any(isinstance(h, _StreamingCallbackHandler) for h in handlers)
+
+
+class ResponseCacheStore:
+    """
+    LLM响应的持久化存储 (SQLite)。按最近访问时间做基于总字节数的LRU淘汰，并对条目设置TTL。
+    每个条目记录原始调用耗时与命中次数，用于统计节省的延迟。
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(ResponseCacheStore, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, db_path: Optional[str] = None):
+        if hasattr(self, 'connection'):  # Prevent re-initialization
+            return
+        db_path = db_path or config.llm_cache_path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS llm_response_cache (
+                cache_key TEXT PRIMARY KEY,
+                tier TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                latency_ms REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            ''')
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_llm_response_cache_access ON llm_response_cache(last_access)")
+        self._total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM llm_response_cache").fetchone()[0]
+        self.session = defaultdict(lambda: {"hits": 0, "misses": 0, "stores": 0, "latency_saved_ms": 0.0})
+        logger.info("ResponseCache: 缓存数据库已连接: %s", db_path)
+
+    def get(self, key: str, tier: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT response, latency_ms, created_at, size FROM llm_response_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[2] > config.llm_cache_ttl:
+                with self.connection:
+                    self.connection.execute("DELETE FROM llm_response_cache WHERE cache_key = ?", (key,))
+                self._total_bytes -= row[3]
+                row = None
+            if row is None:
+                self.session[tier]["misses"] += 1
+                return None
+            with self.connection:
+                self.connection.execute("UPDATE llm_response_cache SET last_access = ?, hits = hits + 1 WHERE cache_key = ?", (now, key))
+            self.session[tier]["hits"] += 1
+            self.session[tier]["latency_saved_ms"] += row[1]
+            return row[0]
+
+    def put(self, key: str, tier: str, response: str, latency_ms: float):
+        size = len(response.encode('utf-8'))
+        if size > config.llm_cache_max_bytes:
+            return
+        now = time.time()
+        with self._lock, self.connection:
+            old = self.connection.execute("SELECT size FROM llm_response_cache WHERE cache_key = ?", (key,)).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO llm_response_cache (cache_key, tier, response, size, latency_ms, created_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, tier, response, size, latency_ms, now, now)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self.session[tier]["stores"] += 1
+            if self._total_bytes > config.llm_cache_max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """按最近访问时间从旧到新删除，直到总大小降到上限的90%以下。"""
+        target = config.llm_cache_max_bytes * 0.9
+        evicted = 0
+        for key, size in self.connection.execute(
+                "SELECT cache_key, size FROM llm_response_cache ORDER BY last_access").fetchall():
+            if self._total_bytes <= target:
+                break
+            self.connection.execute("DELETE FROM llm_response_cache WHERE cache_key = ?", (key,))
+            self._total_bytes -= size
+            evicted += 1
+        logger.info("ResponseCache: LRU淘汰 %d 条缓存，当前大小 %d 字节", evicted, self._total_bytes)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT tier, COUNT(*), SUM(size), SUM(hits), SUM(hits * latency_ms) FROM llm_response_cache GROUP BY tier"
+            ).fetchall()
+            session = {tier: dict(values) for tier, values in self.session.items()}
+        for values in session.values():
+            lookups = values["hits"] + values["misses"]
+            values["hit_rate"] = round(values["hits"] / lookups, 4) if lookups else 0.0
+            values["latency_saved_ms"] = round(values["latency_saved_ms"], 1)
+        return {
+            "total_bytes": self._total_bytes,
+            "max_bytes": config.llm_cache_max_bytes,
+            "session": session,
+            "stored": {tier: {"entries": n, "bytes": size, "hits": hits or 0, "latency_saved_ms": round(saved or 0.0, 1)}
+                       for tier, n, size, hits, saved in rows},
+        }
+
+
+class ResponseCache(BaseCache):
+    """
+    挂在模型实例上的精确匹配响应缓存。键为LangChain的llm_string (服务商、模型、温度、绑定的工具等)
+    与去除运行时id后的规范化消息列表的哈希。
+    """
+
+    def __init__(self, tier: str, store: Optional[ResponseCacheStore] = None):
+        self.tier = tier
+        self.store = store or ResponseCacheStore()
+        # 未命中时记录开始时间，update时据此计算原始调用耗时 (出错的调用不会update，因此限制队列长度与键数)
+        self._pending_starts: "OrderedDict[str, deque]" = OrderedDict()
+        self._pending_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        try:
+            messages = json.dumps(strip_message_ids(json.loads(prompt)), sort_keys=True, ensure_ascii=False)
+        except ValueError:
+            messages = prompt
+        return hashlib.sha256(f"{llm_string}\n{messages}".encode('utf-8')).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        mode = _cache_mode.get()
+        if mode == "bypass" or _is_streaming_call():
+            return None
+        key = self.make_key(prompt, llm_string)
+        cached = self.store.get(key, self.tier) if mode == "default" else None
+        if cached is not None:
+            logger.debug("ResponseCache: 命中 (tier=%s)", self.tier)
+            generations = [load(g) for g in json.loads(cached)]
+            for generation in generations:
+                # 供LLMMetricsCallback区分缓存命中与真实的模型调用
+                generation.generation_info = {**(generation.generation_info or {}), CACHE_HIT_KEY: True}
+            return generations
+        with self._pending_lock:
+            starts = self._pending_starts.get(key)
+            if starts is None:
+                starts = self._pending_starts[key] = deque(maxlen=64)
+            else:
+                self._pending_starts.move_to_end(key)
+            starts.append(time.perf_counter())
+            while len(self._pending_starts) > _MAX_PENDING_KEYS:
+                self._pending_starts.popitem(last=False)
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        key = self.make_key(prompt, llm_string)
+        with self._pending_lock:
+            starts = self._pending_starts.get(key)
+            if not starts:
+                return  # 对应的lookup被跳过 (bypass或流式调用)
+            started = starts.popleft()
+            if not starts:
+                del self._pending_starts[key]
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.store.put(key, self.tier, json.dumps([dumpd(g) for g in return_val], ensure_ascii=False), latency_ms)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self.store._lock, self.store.connection:
+            self.store.connection.execute("DELETE FROM llm_response_cache WHERE tier = ?", (self.tier,))
+            self.store._total_bytes = self.store.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM llm_response_cache").fetchone()[0]
@@ -0,0 +1,219 @@
+# hive/utils/rule_extraction.py
+
+import re
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+_MISSING = object()
+
+_EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+_URL_PATTERN = re.compile(r'https?://[^\s<>"\'，。）)]+')
+_DATE_PATTERN = re.compile(
+    r'\d{4}-\d{1,2}-\d{1,2}(?:[T ]\d{1,2}:\d{2}(?::\d{2})?)?'
+    r'|\d{4}/\d{1,2}/\d{1,2}'
+    r'|\d{4}年\d{1,2}月\d{1,2}日'
+)
+_NUMBER_TEXT = r'[-+]?\d[\d,]*(?:\.\d+)?\s*(?:万亿|亿|万|千|百万|trillion|billion|million|thousand|%)?'
+_NUMBER_PATTERN = re.compile(r'([-+]?\d[\d,]*(?:\.\d+)?)\s*(万亿|亿|万|千|百万|trillion|billion|million|thousand|%)?', re.IGNORECASE)
+_UNIT_MULTIPLIERS = {
+    "万亿": 1e12, "亿": 1e8, "百万": 1e6, "万": 1e4, "千": 1e3,
+    "trillion": 1e12, "billion": 1e9, "million": 1e6, "thousand": 1e3,
+}
+
+_NAME_HINTS = {
+    "email": ("email", "e-mail", "mail", "邮箱", "邮件"),
+    "url": ("url", "link", "href", "website", "网址", "链接"),
+    "date": ("date", "day", "time", "日期", "时间"),
+}
+# 字段名按snake_case/camelCase/连字符切分为单词，英文提示词必须整词匹配 (mailing_address不是email，lifetime不是date)
+_CAMEL_BOUNDARY = re.compile(r'(?<=[a-z0-9])(?=[A-Z])')
+_NAME_WORD = re.compile(r'[a-z0-9]+')
+# 没有单位的四位整数看起来像年份 ("Revenue 2023: ...")，不作为数值字段的取值
+_YEAR_PATTERN = re.compile(r'^(?:19|20)\d{2}$')
+_BOOLEAN_WORDS = {"true": True, "yes": True, "false": False, "no": False}
+
+
+def _name_words(name: str) -> List[str]:
+    return _NAME_WORD.findall(_CAMEL_BOUNDARY.sub(' ', name).lower())
+
+
+def _matches_hint(name: str, hint: str) -> bool:
+    if not hint.isascii():
+        return hint in name  # 中文字段名没有分词边界，按子串匹配
+    words, hint_words = _name_words(name), _name_words(hint)
+    return any(words[i:i + len(hint_words)] == hint_words for i in range(len(words) - len(hint_words) + 1))
+
+
+def parse_number(text: str) -> Optional[float]:
+    """解析带单位的数字，如 '3.21万亿' -> 3.21e12, '1,234.5 million' -> 1.2345e9。百分号保留原数值。"""
+    match = _NUMBER_PATTERN.search(text)
+    if not match:
+        return None
+    value = float(match.group(1).replace(',', ''))
+    unit = (match.group(2) or "").lower()
+    return value * _UNIT_MULTIPLIERS.get(unit, 1.0)
+
+
+def _try_parse_json(text: str) -> Any:
+    stripped = text.strip()
+    if not stripped or stripped[0] not in '{[':
+        return _MISSING
+    try:
+        return json.loads(stripped)
+    except ValueError:
+        return _MISSING
+
+
+def _json_lookup(data: Any, key: str) -> Any:
+    """在JSON中广度优先查找第一个名为key的字段 (大小写不敏感)。"""
+    target = key.lower()
+    queue = [data]
+    while queue:
+        node = queue.pop(0)
+        if isinstance(node, dict):
+            for k, v in node.items():
+                if str(k).lower() == target:
+                    return v
+            queue.extend(node.values())
+        elif isinstance(node, list):
+            queue.extend(node)
+    return _MISSING
+
+
+class FieldRule:
+    """单个顶层字段的本地提取规则，由schema编译而来。"""
+
+    def __init__(self, name: str, schema: Dict[str, Any]):
+        self.name = name
+        self.is_array = schema.get("type") == "array"
+        item_schema = schema.get("items", {}) if self.is_array else schema
+        self.value_type = item_schema.get("type", "string")
+        self.kind = self._infer_kind(name, item_schema)
+        keywords = {name, name.replace("_", " ")}
+        if schema.get("title"):
+            keywords.add(schema["title"])
+        escaped = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+        # 形如 "营收: 3.21万亿" / "Revenue is 5 billion" 的关键词邻近模式；关键词与数值之间必须有分隔词。
+        # 关键词前不能紧跟英文字母或数字 ("nonprofit"不是"profit")；中文前面没有词边界，不做限制
+        self.keyed_number = re.compile(rf'(?<![A-Za-z0-9_])(?:{escaped})\s*(?:[:：=]|是|为|约|达|\b(?:is|was|of)\b)\s*({_NUMBER_TEXT})', re.IGNORECASE)
+        # 形如 "Key: value" 的行
+        self.keyed_line = re.compile(rf'^\s*(?:{escaped})\s*[:：]\s*(.+?)\s*$', re.IGNORECASE | re.MULTILINE)
+
+    @staticmethod
+    def _infer_kind(name: str, schema: Dict[str, Any]) -> str:
+        fmt = schema.get("format", "")
+        if fmt == "email":
+            return "email"
+        if fmt in ("uri", "url"):
+            return "url"
+        if fmt in ("date", "date-time"):
+            return "date"
+        if schema.get("type") in ("number", "integer"):
+            return "number"
+        for kind, hints in _NAME_HINTS.items():
+            if any(_matches_hint(name, h) for h in hints):
+                return kind
+        return "string"
+
+    def _coerce(self, value: Any) -> Any:
+        if value is None:
+            return _MISSING
+        if self.value_type in ("number", "integer"):
+            if isinstance(value, bool):
+                return _MISSING
+            if isinstance(value, (int, float)):
+                return int(value) if self.value_type == "integer" and float(value).is_integer() else value
+            if isinstance(value, str):
+                number = parse_number(value)
+                if number is None:
+                    return _MISSING
+                return int(number) if self.value_type == "integer" and number.is_integer() else number
+            return _MISSING
+        if self.value_type == "string":
+            return value if isinstance(value, str) else _MISSING
+        if self.value_type == "boolean":
+            if isinstance(value, bool):
+                return value
+            if isinstance(value, str):
+                return _BOOLEAN_WORDS.get(value.strip().lower(), _MISSING)
+            return _MISSING
+        # 对象等结构化类型无法从文本中可靠地还原，交给LLM
+        return _MISSING
+
+    def from_json(self, data: Any) -> Any:
+        value = _json_lookup(data, self.name)
+        if value is _MISSING:
+            return _MISSING
+        if self.is_array:
+            if not isinstance(value, list):
+                return _MISSING
+            coerced = [self._coerce(v) for v in value]
+            return _MISSING if any(v is _MISSING for v in coerced) else coerced
+        return self._coerce(value)
+
+    def from_text(self, text: str) -> Any:
+        pattern = {"email": _EMAIL_PATTERN, "url": _URL_PATTERN, "date": _DATE_PATTERN}.get(self.kind)
+        if pattern is not None:
+            candidates = list(dict.fromkeys(m.group(0).rstrip('.,;') for m in pattern.finditer(text)))
+            if not candidates:
+                return _MISSING
+            if self.is_array:
+                return candidates
+            if len(candidates) == 1:
+                return candidates[0]
+            keyed = {pattern.search(m.group(1)).group(0) for m in self.keyed_line.finditer(text) if pattern.search(m.group(1))}
+            return keyed.pop() if len(keyed) == 1 else _MISSING
+        if self.is_array:
+            return _MISSING
+        if self.kind == "number":
+            values = {self._coerce(m.group(1)) for m in self.keyed_number.finditer(text)
+                      if not _YEAR_PATTERN.match(m.group(1).strip())}
+            values.discard(_MISSING)
+        else:
+            values = {self._coerce(m.group(1)) for m in self.keyed_line.finditer(text)}
+            values.discard(_MISSING)
+        # 只有唯一的候选值才在本地确定；有歧义时交给LLM
+        return values.pop() if len(values) == 1 else _MISSING
+
+
+class ExtractorPlan:
+    """
+    由extraction_schema编译而来的确定性提取计划。
+    只处理带有 'properties' 的对象schema；能在本地确定的字段直接填充，其余字段交给LLM。
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.schema = schema
+        self.rules = [FieldRule(name, sub or {}) for name, sub in (schema.get("properties") or {}).items()]
+
+    def apply(self, text: str) -> Tuple[Dict[str, Any], List[str]]:
+        data = _try_parse_json(text)
+        resolved: Dict[str, Any] = {}
+        for rule in self.rules:
+            value = rule.from_json(data) if data is not _MISSING else _MISSING
+            if value is _MISSING:
+                value = rule.from_text(text)
+            if value is not _MISSING:
+                resolved[rule.name] = value
+        unresolved = [rule.name for rule in self.rules if rule.name not in resolved]
+        return resolved, unresolved
+
+    def reduced_schema(self, unresolved: List[str]) -> Dict[str, Any]:
+        """只包含未解析字段的schema，用于发送给LLM。"""
+        properties = self.schema.get("properties") or {}
+        reduced = dict(self.schema)
+        reduced["properties"] = {name: properties[name] for name in unresolved}
+        if "required" in reduced:
+            reduced["required"] = [name for name in reduced["required"] if name in unresolved]
+        return reduced
+
+
+@lru_cache(maxsize=256)
+def _compile_plan_cached(schema_key: str) -> ExtractorPlan:
+    return ExtractorPlan(json.loads(schema_key))
+
+
+def compile_plan(schema: Dict[str, Any]) -> ExtractorPlan:
+    """编译 (并缓存) schema对应的提取计划。"""
+    return _compile_plan_cached(json.dumps(schema, sort_keys=True, ensure_ascii=False))
@@ -0,0 +1,232 @@
+# hive/utils/sandbox.py
+
+import os
+import sys
+import mmap
+import atexit
+import pickle
+import logging
+import threading
+import time
+import subprocess
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from hive.utils import metrics
+from hive.utils.config import config
+from hive.utils.sandbox_worker import FILE_MARKER, WorkerTaskError
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_DURATION = metrics.registry.histogram("hive_sandbox_task_duration_seconds", "沙箱工作进程中任务的执行耗时", ["task", "status"])
+SANDBOX_QUEUE_WAIT = metrics.registry.histogram("hive_sandbox_queue_wait_seconds", "等待空闲沙箱工作进程的时间")
+SANDBOX_WORKERS = metrics.registry.gauge("hive_sandbox_workers", "存活的沙箱工作进程数")
+SANDBOX_RESTARTS = metrics.registry.counter("hive_sandbox_worker_restarts_total", "沙箱工作进程被替换的次数", ["reason"])
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 工作进程通过pass_fds继承管道，只支持POSIX平台；其他平台上cpu_bound的任务在当前线程中执行
+_SUPPORTED = os.name == "posix"
+
+
+class SandboxError(RuntimeError):
+    """沙箱中的任务没有正常完成 (工作进程崩溃、超出内存限制等)。"""
+
+
+class SandboxTimeoutError(SandboxError, TimeoutError):
+    """任务超过墙钟时间限制，执行它的工作进程已被强制终止。"""
+
+
+def _load_result(raw: bytes) -> tuple:
+    if not raw.startswith(FILE_MARKER):
+        return pickle.loads(raw)
+    # 大结果由工作进程写入/dev/shm下的临时文件，这里mmap后直接反序列化
+    path = raw[len(FILE_MARKER):].decode()
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return pickle.loads(buffer)
+    finally:
+        os.unlink(path)
+
+
+class _Worker:
+    """
+    一个沙箱工作进程。以独立的解释器 (python -m hive.utils.sandbox_worker) 启动并通过继承的管道通信，
+    而不是multiprocessing的spawn/fork：既不会重新导入主进程的入口模块 (server.py)，也不会继承其他线程持有的锁。
+    """
+
+    def __init__(self):
+        to_child_r, to_child_w = os.pipe()
+        from_child_r, from_child_w = os.pipe()
+        env = dict(os.environ)
+        # 与multiprocessing的spawn相同，子进程使用与主进程一致的模块搜索路径
+        env["PYTHONPATH"] = os.pathsep.join([_PROJECT_ROOT] + [p for p in sys.path if p])
+        env["HIVE_SANDBOX_PRELOAD"] = config.sandbox_preload
+        # 工作目录与主进程一致，任务参数中的相对路径才会按调用方的预期解析
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "hive.utils.sandbox_worker", str(to_child_r), str(from_child_w),
+                 str(config.sandbox_inline_max_bytes)],
+                pass_fds=(to_child_r, from_child_w), env=env, cwd=os.getcwd(), stdin=subprocess.DEVNULL,
+            )
+        except Exception:
+            for fd in (to_child_w, from_child_r):
+                os.close(fd)
+            raise
+        finally:
+            os.close(to_child_r)
+            os.close(from_child_w)
+        self.writer = Connection(to_child_w, readable=False)
+        self.reader = Connection(from_child_r, writable=False)
+        self.tasks = 0
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def call(self, func: Callable, args: Sequence[Any], kwargs: Dict[str, Any], timeout: float, memory_mb: int) -> tuple:
+        self.writer.send((func, tuple(args), kwargs, memory_mb))
+        if not self.reader.poll(timeout):
+            raise SandboxTimeoutError(f"任务超过 {timeout:g} 秒仍未完成，已终止")
+        try:
+            raw = self.reader.recv_bytes()
+        except (EOFError, OSError):
+            try:
+                self.process.wait(1)
+            except subprocess.TimeoutExpired:
+                pass
+            raise SandboxError(f"沙箱工作进程异常退出 (exitcode={self.process.returncode})")
+        return _load_result(raw)
+
+    def stop(self, kill: bool = False):
+        try:
+            if kill:
+                self.process.kill()
+            else:
+                self.writer.send(None)
+            self.process.wait(1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait(1)
+        except (OSError, ValueError):
+            self.process.kill()
+        finally:
+            self.writer.close()
+            self.reader.close()
+
+
+class ProcessSandbox:
+    """
+    计算密集型任务的工作进程池。每个任务独占一个工作进程执行，不占用主进程的GIL：
+    超过墙钟时间限制时只强杀执行它的那个进程，之后按需补充；每个进程执行max_tasks_per_child个任务后被替换，
+    防止内存碎片与泄漏累积。工作进程按需启动，函数与参数需要可以被pickle (模块级函数)。
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_tasks_per_child: Optional[int] = None):
+        self.max_workers = max(1, workers or config.sandbox_workers)
+        self.max_tasks_per_child = max_tasks_per_child or config.sandbox_max_tasks_per_child
+        self._idle: List[_Worker] = []
+        self._live = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.is_alive():
+                    return worker
+                self._live -= 1
+                SANDBOX_RESTARTS.inc(reason="crashed")
+                worker.stop(kill=True)
+            self._live += 1
+            SANDBOX_WORKERS.set(self._live)
+        try:
+            return _Worker()
+        except Exception:
+            with self._lock:
+                self._live -= 1
+                SANDBOX_WORKERS.set(self._live)
+            raise
+
+    def _retire(self, worker: _Worker, reason: str, kill: bool):
+        with self._lock:
+            self._live -= 1
+            SANDBOX_WORKERS.set(self._live)
+        SANDBOX_RESTARTS.inc(reason=reason)
+        worker.stop(kill=kill)
+
+    def _checkin(self, worker: _Worker):
+        worker.tasks += 1
+        if worker.tasks >= self.max_tasks_per_child:
+            self._retire(worker, "recycled", kill=False)
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def run(self, func: Callable, args: Sequence[Any] = (), kwargs: Optional[Dict[str, Any]] = None,
+            timeout: Optional[float] = None, memory_mb: Optional[int] = None, name: Optional[str] = None) -> Any:
+        """
+        在工作进程中执行 func(*args, **kwargs) 并返回结果；任务抛出的异常在调用方原样重新抛出。
+        超时抛出SandboxTimeoutError，进程崩溃或超出内存限制抛出SandboxError。调用会阻塞当前线程，不会阻塞事件循环。
+        """
+        name = name or getattr(func, "__qualname__", "task")
+        timeout = timeout or config.sandbox_timeout
+        memory_mb = config.sandbox_memory_mb if memory_mb is None else memory_mb
+        queued = time.perf_counter()
+        self._slots.acquire()
+        started = time.perf_counter()
+        SANDBOX_QUEUE_WAIT.observe(started - queued)
+        status = "error"
+        try:
+            worker = self._checkout()
+            try:
+                outcome, value = worker.call(func, args, kwargs or {}, timeout, memory_mb)
+            except SandboxTimeoutError:
+                status = "timeout"
+                logger.warning("沙箱任务 %s 超时 (%.1fs)，终止工作进程 pid=%s", name, timeout, worker.pid)
+                self._retire(worker, "timeout", kill=True)
+                raise
+            except SandboxError:
+                logger.error("沙箱任务 %s 执行时工作进程崩溃 (pid=%s)", name, worker.pid)
+                self._retire(worker, "crashed", kill=True)
+                raise
+            except BaseException:
+                # 参数无法pickle等发送前的错误，工作进程本身仍然可用
+                self._checkin(worker)
+                raise
+            self._checkin(worker)
+            if outcome == "error":
+                if isinstance(value, (MemoryError, WorkerTaskError)):
+                    raise SandboxError(str(value)) from None
+                raise value
+            status = "ok"
+            return value
+        finally:
+            self._slots.release()
+            SANDBOX_DURATION.observe(time.perf_counter() - started, task=name, status=status)
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._idle = self._idle, []
+            self._live -= len(workers)
+            SANDBOX_WORKERS.set(self._live)
+        for worker in workers:
+            worker.stop()
+
+
+sandbox = ProcessSandbox()
+atexit.register(sandbox.shutdown)
+
+
+def run_for(manifest, func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Agent中计算密集部分的统一入口：manifest标记为cpu_bound且沙箱启用时在工作进程中执行
+    (使用manifest上的超时与内存限制)，否则在当前线程中直接执行。
+    """
+    if not (config.sandbox_enabled and _SUPPORTED and getattr(manifest, "cpu_bound", False)):
+        return func(*args, **kwargs)
+    return sandbox.run(func, args, kwargs, timeout=manifest.sandbox_timeout, memory_mb=manifest.sandbox_memory_mb,
+                       name=f"{manifest.display_name}.{func.__name__}")
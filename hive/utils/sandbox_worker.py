@@ -0,0 +1,87 @@
+# hive/utils/sandbox_worker.py
+#
+# 沙箱工作进程的入口 (python -m hive.utils.sandbox_worker <读fd> <写fd> <内联上限>)。
+# 只依赖标准库，不导入主进程的入口模块，启动时不会重复执行server.py中的初始化。
+
+import os
+import sys
+import pickle
+import signal
+import logging
+import tempfile
+import importlib
+from multiprocessing.connection import Connection
+
+# 大结果写入内存文件系统 (/dev/shm) 中的临时文件，主进程mmap后直接反序列化，不经过管道分块拷贝
+SPILL_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+FILE_MARKER = b"file:"
+
+
+class WorkerTaskError(RuntimeError):
+    """任务在工作进程中失败，但原始异常无法序列化传回主进程。"""
+
+
+def _set_memory_limit(limit_mb: int):
+    try:
+        import resource
+    except ImportError:  # 非POSIX平台不支持按进程限制内存
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    soft = limit_mb * 1024 * 1024 if limit_mb > 0 else hard
+    if hard != resource.RLIM_INFINITY and (soft == resource.RLIM_INFINITY or soft > hard):
+        soft = hard
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _dumps(result: tuple) -> bytes:
+    try:
+        return pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        return pickle.dumps(("error", WorkerTaskError(f"任务结果无法序列化: {type(e).__name__}: {e}")))
+
+
+def serve(reader: Connection, writer: Connection, inline_max_bytes: int):
+    """逐个接收 (函数, 参数, 内存上限) 并执行，结果超过inline_max_bytes时写入临时文件，只传回路径。"""
+    while True:
+        try:
+            task = reader.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+        func, args, kwargs, memory_mb = task
+        _set_memory_limit(memory_mb)
+        try:
+            result = ("ok", func(*args, **kwargs))
+        except MemoryError:
+            result = ("error", MemoryError(f"任务超出内存限制 ({memory_mb} MB)"))
+        except Exception as e:
+            result = ("error", e)
+        finally:
+            _set_memory_limit(0)
+        data = _dumps(result)
+        if len(data) > inline_max_bytes:
+            fd, path = tempfile.mkstemp(prefix="hive_sandbox_", suffix=".pkl", dir=SPILL_DIR)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            writer.send_bytes(FILE_MARKER + path.encode())
+        else:
+            writer.send_bytes(data)
+
+
+def main(argv):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C由主进程统一处理
+    # 工作进程只向stderr输出错误日志，任务中的INFO/WARNING (如配置加载提示) 不再重复打印
+    logging.basicConfig(level=logging.ERROR, format="[sandbox %(process)d] %(levelname)s %(name)s: %(message)s")
+    read_fd, write_fd, inline_max_bytes = int(argv[1]), int(argv[2]), int(argv[3])
+    # 预先导入numpy等重量级模块，第一个任务不必等待导入
+    for module in filter(None, os.environ.get("HIVE_SANDBOX_PRELOAD", "").split(",")):
+        try:
+            importlib.import_module(module.strip())
+        except ImportError:
+            pass
+    serve(Connection(read_fd, writable=False), Connection(write_fd, readable=False), inline_max_bytes)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,142 @@
+# hive/utils/search_backends.py
+
+import re
+import time
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from hive.utils.config import config
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_TRACKING_PARAMS = ("utm_", "spm", "fbclid", "gclid")
+
+
+def normalize_query(query: str) -> str:
+    """用于缓存键的查询归一化：去掉首尾空白、合并连续空白、统一小写。"""
+    return _WHITESPACE.sub(' ', query).strip().lower()
+
+
+def normalize_url(url: str) -> str:
+    """用于跨查询去重的URL归一化：忽略协议与主机大小写、片段、末尾斜杠和常见的跟踪参数。"""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                       if not k.lower().startswith(_TRACKING_PARAMS)])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/') or '/', query, ''))
+
+
+class RateLimiter:
+    """线程安全的令牌桶限流器：平均每秒rate个请求，允许burst个请求的突发。rate <= 0 表示不限流。"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SearchBackend(ABC):
+    """
+    Seeker的搜索后端接口。search()返回Tavily风格的结果字典：
+    {"query": ..., "answer": ..., "results": [{"url", "title", "content", "score"}, ...]}。
+    """
+    name: str
+
+    @abstractmethod
+    def search(self, query: str, max_results: int) -> Dict[str, Any]:
+        pass
+
+
+class TavilyBackend(SearchBackend):
+    name = "tavily"
+
+    def __init__(self):
+        if not config.tavily_api_key:
+            raise ValueError("Tavily API Key (TAVILY_API_KEY) 未在 .env 文件中配置。Seeker Agent无法初始化。")
+        # 延迟导入，使用stub后端时不需要安装langchain_tavily
+        from langchain_tavily import TavilySearch
+        self._tool_cls = TavilySearch
+        self._tools: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+
+    def _tool(self, max_results: int):
+        with self._lock:
+            if max_results not in self._tools:
+                self._tools[max_results] = self._tool_cls(max_results=max_results, tavily_api_key=config.tavily_api_key)
+            return self._tools[max_results]
+
+    def search(self, query: str, max_results: int) -> Dict[str, Any]:
+        return self._tool(max_results).invoke(query)
+
+
+class StubBackend(SearchBackend):
+    """
+    本地确定性搜索后端，不访问网络。同一查询总是返回相同的结果，
+    可通过SEARCH_STUB_LATENCY_MS模拟网络延迟，供测试与基准测试使用。
+    """
+    name = "stub"
+
+    def __init__(self, latency_ms: Optional[float] = None):
+        self.latency_ms = config.search_stub_latency_ms if latency_ms is None else latency_ms
+
+    def search(self, query: str, max_results: int) -> Dict[str, Any]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        words = normalize_query(query).split() or ["empty"]
+        results = []
+        for i in range(max_results):
+            # 前两个结果只取决于第一个词，使相近的查询产生可去重的重叠URL
+            seed = words[0] if i < 2 else f"{' '.join(words)}#{i}"
+            digest = hashlib.sha1(seed.encode('utf-8')).hexdigest()[:10]
+            results.append({
+                "url": f"https://stub.local/{digest}/{i if i >= 2 else 'shared' + str(i)}",
+                "title": f"{query} - 结果 {i + 1}",
+                "content": f"关于 '{query}' 的模拟搜索结果 {i + 1}。",
+                "score": round(1.0 - i * 0.1, 2),
+            })
+        return {"query": query, "answer": None, "results": results}
+
+
+_BACKENDS = {
+    TavilyBackend.name: TavilyBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def register_search_backend(name: str, backend_cls):
+    """注册自定义搜索后端，之后可通过SEARCH_BACKEND=<name>启用。"""
+    _BACKENDS[name] = backend_cls
+
+
+def create_search_backend(name: Optional[str] = None) -> SearchBackend:
+    name = (name or config.search_backend).lower()
+    if config.cassette_mode == "replay" and name == TavilyBackend.name:
+        # 回放模式下工具输出来自磁带，不需要真实的搜索服务与API Key
+        name = StubBackend.name
+    if name not in _BACKENDS:
+        raise ValueError(f"未知的搜索后端: '{name}'。可选值为 {sorted(_BACKENDS)}。")
+    logger.info("Seeker 使用搜索后端: %s", name)
+    return _BACKENDS[name]()
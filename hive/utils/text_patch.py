@@ -0,0 +1,118 @@
+# hive/utils/text_patch.py
+
+import os
+import re
+import tempfile
+import shutil
+from typing import List
+
+_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+# 在模块导入时 (单线程阶段) 读取一次umask，使原子写入新建的文件与普通open()创建的文件权限一致
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class PatchError(ValueError):
+    """补丁无法应用到目标文本时抛出 (上下文不匹配、行号越界等)。"""
+
+
+def atomic_write(path: str, content: str, encoding: str = 'utf-8') -> None:
+    """
+    原子写入：先写入同目录下的临时文件并fsync，再用os.replace替换目标文件。
+    写入过程中崩溃只会留下临时文件，目标文件要么是旧内容，要么是完整的新内容。
+    """
+    dir_path = os.path.dirname(path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dir_path or '.', prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline='') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def replace_line_range(original: str, start_line: int, end_line: int, content: str) -> str:
+    """
+    将第start_line到第end_line行 (从1开始，闭区间) 替换为content。
+    end_line = start_line - 1 表示不删除任何行，直接在start_line之前插入。
+    """
+    lines = original.splitlines(keepends=True)
+    if start_line < 1 or start_line > len(lines) + 1:
+        raise PatchError(f"起始行 {start_line} 超出范围 (文件共 {len(lines)} 行)。")
+    if end_line < start_line - 1 or end_line > len(lines):
+        raise PatchError(f"结束行 {end_line} 超出范围 (起始行 {start_line}，文件共 {len(lines)} 行)。")
+    if content and not content.endswith('\n') and end_line < len(lines):
+        content += '\n'
+    if start_line > 1 and not lines[start_line - 2].endswith('\n'):
+        lines[start_line - 2] += '\n'
+    return ''.join(lines[:start_line - 1]) + content + ''.join(lines[end_line:])
+
+
+def apply_unified_diff(original: str, diff: str) -> str:
+    """
+    将unified diff (如 `diff -u` 或 `git diff` 的输出) 应用到原文本上。
+    每一行上下文和删除行都会与原文校验，任何不匹配都会抛出PatchError而不是产生错误的结果。
+    """
+    src = original.splitlines(keepends=True)
+    diff_lines = diff.splitlines(keepends=True)
+    out: List[str] = []
+    pos = 0
+    hunks = 0
+    i = 0
+
+    while i < len(diff_lines):
+        match = _HUNK_HEADER.match(diff_lines[i])
+        if not match:
+            i += 1  # 跳过文件头 ('--- a/x', '+++ b/x', 'diff --git' 等)
+            continue
+        hunks += 1
+        old_start, old_len = int(match.group(1)), int(match.group(2) or 1)
+        start = old_start - 1 if old_len > 0 else old_start
+        if start < pos or start > len(src):
+            raise PatchError(f"第 {hunks} 个hunk的起始行 {old_start} 无效或与前一个hunk重叠。")
+        out.extend(src[pos:start])
+        pos = start
+        i += 1
+
+        last_tag = None
+        while i < len(diff_lines):
+            line = diff_lines[i]
+            if line.startswith('@@') or (line.startswith('--- ') and i + 1 < len(diff_lines)
+                                         and diff_lines[i + 1].startswith('+++ ')):
+                break
+            if line.startswith('\\'):
+                # "\ No newline at end of file" 作用于上一行
+                if last_tag in ('+', ' ') and out and out[-1].endswith('\n'):
+                    out[-1] = out[-1].rstrip('\r\n')
+                i += 1
+                continue
+            tag, text = (line[:1], line[1:]) if line.strip('\r\n') else (' ', line)
+            if tag in (' ', '-'):
+                if pos >= len(src) or src[pos].rstrip('\r\n') != text.rstrip('\r\n'):
+                    found = src[pos].rstrip('\r\n') if pos < len(src) else '<EOF>'
+                    raise PatchError(f"第 {hunks} 个hunk在原文第 {pos + 1} 行处上下文不匹配: 期望 {text.rstrip()!r}，实际 {found!r}。")
+                if tag == ' ':
+                    out.append(src[pos])
+                pos += 1
+            elif tag == '+':
+                out.append(text if text.endswith('\n') else text + '\n')
+            else:
+                raise PatchError(f"无法识别的diff行: {line.rstrip()!r}")
+            last_tag = tag
+            i += 1
+
+    if hunks == 0:
+        raise PatchError("diff中没有找到任何hunk (以 '@@ -a,b +c,d @@' 开头)。")
+    out.extend(src[pos:])
+    return ''.join(out)
@@ -0,0 +1,33 @@
+# hive/utils/text_tokenize.py
+
+import re
+from typing import List
+
+# 平假名/片假名、CJK扩展A、CJK统一汉字、韩文音节、CJK兼容汉字
+_CJK_RANGES = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+# 拉丁字母/数字按单词切分；中日韩文字没有空格分词，按字符二元组 (bigram) 切分
+_TOKEN_PATTERN = re.compile(f'[0-9a-z_]+|[{_CJK_RANGES}]+')
+_CJK_PATTERN = re.compile(f'[{_CJK_RANGES}]')
+
+
+def tokenize(text: str, unigrams: bool = False) -> List[str]:
+    """
+    将文本切分为检索用的词项。
+    英文与数字转为小写单词；CJK连续片段切分为重叠的字符二元组，单字片段保留为单字。
+    例: "Hive的工作流" -> ['hive', '的工', '工作', '作流']
+    被检索的文档需要传入unigrams=True，额外产生每个CJK字符的单字词项，
+    这样单字查询 (如"猫") 也能匹配到长片段中的字 ("我的猫很可爱")。
+    """
+    tokens: List[str] = []
+    for run in _TOKEN_PATTERN.findall(text.lower()):
+        if _CJK_PATTERN.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                if unigrams:
+                    tokens.extend(run)
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
@@ -0,0 +1,230 @@
+# hive/utils/tracing.py
+
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from hive.utils.config import config
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的run id与当前span。asyncio任务和LangGraph/LangChain的线程池都会复制上下文，
+# 因此图节点、工具 (Agent) 与LLM回调都能拿到发起它们的请求的身份。
+_current_run_id: ContextVar[Optional[str]] = ContextVar("hive_run_id", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("hive_span", default=None)
+
+
+def new_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_run_id(default: Optional[str] = None) -> Optional[str]:
+    return _current_run_id.get() or default
+
+
+def current_span_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.span_id if span is not None else None
+
+
+class Span:
+    """一次计时的执行步骤。start为墙钟时间 (秒)，耗时用单调时钟测量。"""
+    __slots__ = ("span_id", "run_id", "parent_id", "name", "start", "duration_ms", "status", "attributes", "_started")
+
+    def __init__(self, name: str, run_id: Optional[str], parent_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.span_id = new_id()
+        self.run_id = run_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.attributes = dict(attributes or {})
+        self._started = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self, status: Optional[str] = None, error: Optional[BaseException] = None):
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        elif status:
+            self.status = status
+        recorder.record(self)
+
+    def to_row(self) -> tuple:
+        return (self.span_id, self.run_id, self.parent_id, self.name, self.start, round(self.duration_ms or 0.0, 3),
+                self.status, json.dumps(self.attributes, ensure_ascii=False, default=str))
+
+
+class SpanRecorder:
+    """
+    span的批量写入器。结束的span先进入内存缓冲区，攒满TRACE_BATCH_SIZE条或每隔TRACE_FLUSH_INTERVAL秒
+    由后台线程一次性写入CoreMemory的spans表，避免在请求的热路径上逐条提交SQLite事务。
+    """
+
+    def __init__(self):
+        self._buffer: List[tuple] = []
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._last_prune = 0.0
+
+    def record(self, span: Span):
+        if not config.tracing_enabled or not span.run_id:
+            return
+        with self._lock:
+            self._buffer.append(span.to_row())
+            full = len(self._buffer) >= config.trace_batch_size
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name="span-flusher", daemon=True)
+                self._flusher.start()
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(config.trace_flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            self._maybe_prune()
+
+    def _maybe_prune(self):
+        """按TRACE_RETENTION_DAYS清理过期的span，每隔TRACE_PRUNE_INTERVAL秒最多执行一次，每次删除的行数有上限。"""
+        if config.trace_retention_days <= 0 or time.time() - self._last_prune < config.trace_prune_interval:
+            return
+        self._last_prune = time.time()
+        from hive.core.memory import CoreMemory
+        deleted = CoreMemory().prune_spans(time.time() - config.trace_retention_days * 86400, config.trace_prune_batch_size)
+        if deleted:
+            logger.info("Tracing: 已清理 %d 条过期span", deleted)
+
+    def flush(self) -> int:
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        # 延迟导入：CoreMemory本身会读取当前span，用于关联agent_invocations
+        from hive.core.memory import CoreMemory
+        written = CoreMemory().log_spans(rows)
+        if written is None:
+            logger.warning("Tracing: %d 条span写入失败，已丢弃", len(rows))
+            return 0
+        return written
+
+
+recorder = SpanRecorder()
+# 刷新线程是守护线程，进程退出时把缓冲区中尚未写入的span写完
+atexit.register(recorder.flush)
+
+
+def start_span(name: str, parent_id: Optional[str] = None, **attributes) -> Span:
+    """创建一个不进入上下文的span (用于回调等无法包裹代码块的场景)，需调用end()结束。"""
+    return Span(name, _current_run_id.get(), parent_id or current_span_id(), attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """在当前上下文中开启一个子span；代码块内创建的span、LLM调用与Agent日志都会挂在它下面。"""
+    current = start_span(name, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def start_run(name: str, run_id: Optional[str] = None, **attributes) -> Span:
+    """
+    为一次请求设置run id并开启根span，返回根span。调用方负责在请求结束时end()根span。
+    适合在异步生成器的开头调用：生成器在自己的任务上下文中运行，不需要恢复上下文变量。
+    """
+    run_id = run_id or new_id()
+    _current_run_id.set(run_id)
+    root = Span(name, run_id, None, attributes)
+    _current_span.set(root)
+    return root
+
+
+def build_span_tree(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    把spans表中一次运行的记录组装成树。每个节点附带相对运行开始的偏移 (offset_ms)
+    和扣除子span后的自身耗时 (self_ms)，便于定位慢请求的时间花在了哪里。
+    """
+    if not rows:
+        return []
+    run_start = min(row["start_time"] for row in rows)
+    nodes: Dict[str, Dict[str, Any]] = {}
+    for row in sorted(rows, key=lambda r: r["start_time"]):
+        nodes[row["span_id"]] = {
+            "span_id": row["span_id"],
+            "parent_id": row["parent_id"],
+            "name": row["name"],
+            "start": row["start_time"],
+            "offset_ms": round((row["start_time"] - run_start) * 1000, 3),
+            "duration_ms": row["duration_ms"],
+            "status": row["status"],
+            "attributes": json.loads(row["attributes"]) if row["attributes"] else {},
+            "children": [],
+        }
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"])
+        (parent["children"] if parent is not None else roots).append(node)
+    for node in nodes.values():
+        children_ms = sum(child["duration_ms"] or 0.0 for child in node["children"])
+        node["self_ms"] = round(max(0.0, (node["duration_ms"] or 0.0) - children_ms), 3)
+    return roots
+
+
+class TracingCallback(BaseCallbackHandler):
+    """为每次LLM调用记录一个span，父span为发起调用时的当前span (通常是图节点)。"""
+
+    def __init__(self, tier: str):
+        self.tier = tier
+        self._spans: Dict[UUID, Span] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._spans[run_id] = start_span(f"llm:{self.tier}", tier=self.tier, messages=sum(len(m) for m in messages))
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._spans[run_id] = start_span(f"llm:{self.tier}", tier=self.tier, prompts=len(prompts))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        current = self._spans.pop(run_id, None)
+        if current is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                for key in ("input_tokens", "output_tokens"):
+                    if usage.get(key):
+                        current.attributes[key] = current.attributes.get(key, 0) + usage[key]
+                backend = (getattr(message, "response_metadata", None) or {}).get("router_backend")
+                if backend:
+                    current.set_attribute("router_backend", backend)
+        current.end()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        current = self._spans.pop(run_id, None)
+        if current is not None:
+            current.end(error=error)
@@ -1,22 +1,28 @@
 # main.py
 
-from hive.core.memory import CoreMemory
+import os
+import sys
+import asyncio
+import argparse
 
-def main():
+
+def init():
     """
     Main entry point for the Hive application.
     For v1.0, this script will initialize the core components and
     start the main application loop.
     """
+    from hive.core.memory import CoreMemory
+
     print("🚀 Initializing Hive v1.0...")
-    
+
     try:
         # Initialize the central memory core
         memory = CoreMemory()
         print("✅ CoreMemory initialized successfully.")
-        
+
         # --- Future application logic will go here ---
-        
+
         # Cleanly close the connection on exit
         memory.close()
         print("👋 Hive application finished.")
@@ -24,5 +30,46 @@ def main():
     except Exception as e:
         print(f"🔥 An error occurred during Hive initialization: {e}")
 
+
+def batch(args):
+    """离线批量执行：python main.py batch queries.jsonl -o results.jsonl"""
+    # 批量模式下控制台只显示进度与警告，完整日志仍写入hive.log；必须在导入hive的配置之前设置
+    os.environ.setdefault("LOG_CONSOLE_LEVEL", "WARNING")
+    from hive.utils.logging_config import setup_logging
+    from hive.nexus.batch import BatchRunner, print_summary
+
+    setup_logging()
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    runner = BatchRunner(args.input, output, concurrency=args.concurrency, timeout=args.timeout, mode=args.mode,
+                         retry_failed=args.retry_failed, include_messages=args.include_messages, limit=args.limit)
+    try:
+        summary = asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        print(f"\n⏸️  已中断。已完成的 {runner._finished} 条结果保存在 {output}，重新执行同一命令即可从中断处继续。")
+        return 130
+    print_summary(summary)
+    return 0 if summary["counts"]["error"] + summary["counts"]["timeout"] == 0 else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py", description="Hive 命令行入口")
+    subparsers = parser.add_subparsers(dest="command")
+    p = subparsers.add_parser("batch", help="从JSONL文件批量执行查询，结果逐条写入输出JSONL (支持断点续跑)")
+    p.add_argument("input", help="输入JSONL，每行 {\"id\": ..., \"query\": \"...\"} 或 {\"id\": ..., \"messages\": [...]}")
+    p.add_argument("-o", "--output", help="输出JSONL (默认: <输入文件名>.results.jsonl)，同时作为续跑的检查点")
+    p.add_argument("-c", "--concurrency", type=int, default=4, help="同时执行的条目数 (默认: 4)")
+    p.add_argument("-t", "--timeout", type=float, default=300.0, help="每个条目的截止时间，秒 (默认: 300)")
+    p.add_argument("--mode", choices=["react", "plan"], help="执行模式 (默认: NEXUS_MODE)；条目中的mode字段优先")
+    p.add_argument("--retry-failed", action="store_true", help="续跑时重新执行失败/超时的条目")
+    p.add_argument("--include-messages", action="store_true", help="在结果中附带完整的消息记录")
+    p.add_argument("--limit", type=int, help="本次最多执行的条目数")
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        return batch(args)
+    init()
+    return 0
+
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
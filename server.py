@@ -1,8 +1,8 @@
 # server.py (Now with Centralized Logging)
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Any
 
@@ -10,10 +10,17 @@ from typing import Any
 from hive.utils.config import config
 from hive.utils.logging_config import setup_logging
 # --- 【核心修改】: 更新import路径 ---
-from hive.nexus.executor import nexus_graph
+from hive.nexus.executor import nexus_graph, reflector_policy
+from hive.nexus.planner import plan_graph
+from hive.interaction.alpha_engine import fast_path_stats
+from hive.utils.llm_factory import get_llm_stats
+from hive.utils.response_cache import cache_mode_from_header, set_cache_mode
+from hive.utils import metrics, tracing
+from hive.core.memory import CoreMemory
 # ------------------------------------
 import uvicorn
 import json
+import time
 import logging
 
 # --- 【核心改动】: 在应用的最开始就配置好日志系统 ---
@@ -37,6 +44,7 @@ if config.is_development:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Run-ID"],
     )
 else:
     logger.info(f"CORS策略: [生产模式] 已启用，仅允许来源: {config.frontend_cors_origins}")
@@ -46,6 +54,7 @@ else:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Run-ID"],
     )
 
 # API 端点 (逻辑无变动)
@@ -62,25 +71,59 @@ def safe_serialize(obj: Any) -> Any:
 @app.post("/nexus/stream_events")
 async def stream_nexus_events(request: Request):
     """处理前端请求，并流式返回LangGraph执行过程中的所有事件。"""
+    received_at = time.perf_counter()
+    endpoint = "/nexus/stream_events"
     try:
         body = await request.json()
         graph_input = body.get("input", {})
-        logger.info(f"接收到新的流式请求, 输入内容: {graph_input}")
+        # 图模式默认取NEXUS_MODE，请求体中的mode (react | plan) 可以覆盖
+        mode = (body.get("mode") or config.nexus_mode).lower()
+        graph = plan_graph if mode == "plan" else nexus_graph
+        # Cache-Control: no-cache 强制刷新LLM响应缓存，no-store 完全绕过缓存
+        cache_mode = cache_mode_from_header(request.headers.get("cache-control"))
+        # 客户端可以通过X-Request-ID指定run id，否则由服务端生成；run id通过X-Run-ID响应头返回
+        run_id = request.headers.get("x-request-id") or tracing.new_id()
+        # 完整输入只在显式开启DEBUG (LOG_LEVEL=DEBUG) 时记录，默认只记录大小，避免在热路径上格式化大对象
+        logger.info("接收到新的流式请求 (run_id=%s, mode=%s, 消息数=%d)", run_id, mode, len(graph_input.get("messages", [])) if isinstance(graph_input, dict) else 0)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("流式请求输入内容 (run_id=%s): %s", run_id, graph_input)
 
         async def event_generator():
             logger.debug("--- [SERVER] 启动事件流传输... ---")
-            async for event in nexus_graph.astream_events(graph_input, version="v2"):
-                try:
-                    safe_event = safe_serialize(event)
-                    data_to_send = json.dumps(safe_event)
-                    # 调试时，可以在这里打印事件来追踪流程
-                    # logger.debug(f"发送事件: {data_to_send}")
-                    yield f"data: {data_to_send}\n\n"
-                except Exception as e:
-                    logger.error("序列化事件时发生意外错误!", exc_info=True)
+            # 事件流在独立的任务中迭代，缓存策略与run id只作用于本次请求
+            set_cache_mode(cache_mode)
+            root_span = tracing.start_run("request", run_id=run_id, endpoint=endpoint, mode=mode)
+            metrics.REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+            first_token_seen = False
+            status = "error"
+            try:
+                async for event in graph.astream_events(graph_input, version="v2"):
+                    # 首token延迟 (TTFT): 从接收请求到第一个非空的模型流式输出
+                    if not first_token_seen and event.get("event") == "on_chat_model_stream" \
+                            and getattr(event.get("data", {}).get("chunk"), "content", None):
+                        first_token_seen = True
+                        ttft = time.perf_counter() - received_at
+                        metrics.REQUEST_TTFT.observe(ttft, endpoint=endpoint)
+                        root_span.set_attribute("ttft_ms", round(ttft * 1000, 3))
+                    try:
+                        safe_event = safe_serialize(event)
+                        data_to_send = json.dumps(safe_event)
+                        # 调试时，可以在这里打印事件来追踪流程
+                        # logger.debug(f"发送事件: {data_to_send}")
+                        payload = f"data: {data_to_send}\n\n"
+                        metrics.SSE_EVENTS.inc(endpoint=endpoint)
+                        metrics.SSE_BYTES.inc(len(payload.encode('utf-8')), endpoint=endpoint)
+                        yield payload
+                    except Exception as e:
+                        logger.error("序列化事件时发生意外错误!", exc_info=True)
+                status = "success"
+            finally:
+                root_span.end(status="ok" if status == "success" else "error")
+                metrics.REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+                metrics.REQUEST_DURATION.observe(time.perf_counter() - received_at, endpoint=endpoint, status=status)
             logger.debug("--- [SERVER] 事件流传输完毕。 ---")
         
-        return StreamingResponse(event_generator(), media_type="text/event-stream")
+        return StreamingResponse(event_generator(), media_type="text/event-stream", headers={"X-Run-ID": run_id})
 
     except Exception as e:
         logger.error("流式端点发生严重错误!", exc_info=True)
@@ -89,6 +132,62 @@ async def stream_nexus_events(request: Request):
              yield f"data: {json.dumps(error_event)}\n\n"
         return StreamingResponse(error_stream(), media_type="text/event-stream", status_code=500)
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """以Prometheus文本格式导出节点、工具、LLM与SSE端点的延迟和token指标。"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """返回各LLM层级的在途请求数、排队等待与重试统计，AlphaEngine快速通道的命中率，以及Reflector的精炼方式统计。"""
+    return {**get_llm_stats(), "fast_path": fast_path_stats.snapshot(), "reflector": reflector_policy.snapshot()}
+
+@app.get("/runs/{run_id}/spans")
+def run_spans(run_id: str):
+    """
+    返回一次运行的span树 (请求 → 图节点 → 工具/LLM调用) 以及该运行下的Agent调用记录。
+    同步端点由FastAPI在线程池中执行，刷新缓冲区与SQLite读取不会阻塞事件循环。
+    """
+    # 先把缓冲区中的span写入，保证刚结束的请求也能查到完整链路
+    tracing.recorder.flush()
+    memory = CoreMemory()
+    rows = memory.get_run_spans(run_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"未找到run_id为 '{run_id}' 的追踪记录。")
+    tree = tracing.build_span_tree(rows)
+    return {
+        "run_id": run_id,
+        "span_count": len(rows),
+        "duration_ms": max((root["duration_ms"] or 0.0) for root in tree),
+        "spans": tree,
+        "agent_invocations": memory.get_run_invocations(run_id),
+    }
+
+@app.get("/invocations/export")
+def export_invocations(format: str = "ndjson", columns: str = "", since: str = "", until: str = "",
+                       agent: str = "", status: str = "", after_id: int = 0, watermark: str = ""):
+    """
+    流式导出Agent调用记录 (NDJSON或CSV)，按id分页读取，内存占用与记录总数无关。
+    columns为逗号分隔的列名 (默认不含input_data/output_data)；agent与status可逗号分隔多个值。
+    指定watermark名称时为增量导出：只导出该名称上次完整导出之后新增的记录。
+    """
+    try:
+        chunks = CoreMemory().export_invocations(
+            format.lower(),
+            columns=[c.strip() for c in columns.split(",") if c.strip()] or None,
+            since=since or None,
+            until=until or None,
+            agent=[a.strip() for a in agent.split(",") if a.strip()] or None,
+            status=[s.strip() for s in status.split(",") if s.strip()] or None,
+            after_id=after_id,
+            watermark=watermark or None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # 同步生成器由StreamingResponse在线程池中迭代，数据库读取不会阻塞事件循环
+    media_type = "text/csv; charset=utf-8" if format.lower() == "csv" else "application/x-ndjson"
+    return StreamingResponse(chunks, media_type=media_type)
+
 # 脚本主入口
 if __name__ == "__main__":
     logger.info("--- 启动 Hive Nexus 服务器 ---")